@@ -12,14 +12,22 @@ get articles from db -> content processor -> processed articles -> md writer ->
 
 import json
 import os
-import subprocess
-from datetime import datetime
+from datetime import datetime, timedelta
+from itertools import islice
 
 from src.rss_reader import RSSReader
 from src.md_writer import MDWriter
 from src.content_processor import ContentProcessor
-import src.scraper.PlaywrightRenderedScraper as scraper
+from src.scraper.PlaywrightBrowserPool import BrowserPool
+from src.scraper.ScrapeProfile import register_profile, DEFAULT_PROFILE
+from src.scraper.TieredScraper import TieredScraper
+from src.scraper.ScrapeScheduler import DomainScheduler
+from src.scraper.ScrapeCache import ScrapeCache
+from src.content_extractor import ContentExtractor
+from src.md_converter import MarkdownConverter
 from src.llm_scorer import LLMScorer
+from src.relevance_gate import RelevanceGate, DEFAULT_MODEL_PATH
+from src.database import DBManager
 
 def main():
     
@@ -30,30 +38,59 @@ def main():
     # fetch articles
     r = RSSReader()
     print("Fetching from RSS sources...")
-    _ = r.fetch_all_feeds(save_to_db=True, max_articles_per_feed=100)
-
-    articles = r.db.get_recent_articles()
-    if not articles:
-        print("Unable to fetch any article. Shutting down...")
-        return
-    print(f"Fetched {len(articles)} articles.")
-
-
+    fetch_config = config.get('fetch', {})
+    _ = r.fetch_all_feeds(
+        save_to_db=True,
+        max_articles_per_feed=100,
+        max_workers=fetch_config.get('max_workers', 8),
+        per_host_limit=fetch_config.get('per_host_limit', 2),
+        feed_timeout=fetch_config.get('feed_timeout', 30)
+    )
+    latencies = r.get_feed_latencies()
+    if latencies:
+        slowest_url, slowest = max(latencies.items(), key=lambda x: x[1])
+        print(f"Fetched {len(latencies)} feeds, slowest: {slowest_url} ({slowest:.2f}s)")
 
-    # processing 
+    # processing: stream the articles stored within the age window instead of loading them all,
+    # keep the newest `max_articles` that pass the filters
     p = ContentProcessor()
     processing_config = config.get('processing', {})
-    processed_articles = p.process_articles(
-        articles,
+    max_age_hours = processing_config.get('max_age_hours', 24)
+    # created_at is UTC and never before the publish time, one extra day covers the time zone offset
+    start_date = (datetime.now() - timedelta(hours=max_age_hours, days=1)).strftime('%Y-%m-%d') \
+        if max_age_hours > 0 else None
+    processed_articles = list(islice(p.iter_process_articles(
+        r.db.iter_articles(start_date=start_date),
         remove_duplicates=processing_config.get('remove_duplicates', True),
         include_keywords=processing_config.get('include_keywords'),
         exclude_keywords=processing_config.get('exclude_keywords'),
-        max_age_hours=processing_config.get('max_age_hours', 24),
-        sort_by=processing_config.get('sort_by', 'time')
-    )
+        max_age_hours=max_age_hours
+    ), processing_config.get('max_articles', 50)))
+    processed_articles = p.sort_articles(processed_articles, processing_config.get('sort_by', 'time'))
+    print(f"Processed articles: {len(processed_articles)}")
     if not processed_articles:
         print("No article left based on current processing configuration.")
         return
+
+    # relevance gate: skip scraping and scoring of articles a model trained on past scores expects to rate low
+    gate_config = config.get('gate', {})
+    gate = RelevanceGate.load(gate_config.get('model', DEFAULT_MODEL_PATH))
+    if gate_config.get('enabled', True) and gate.trained:
+        decisions = gate.decide(processed_articles, audit_rate=gate_config.get('audit_rate', 0.1))
+        r.db.save_gate_decisions([
+            (article['hash'], decision['probability'], decision['passed'], decision['audited'])
+            for article, decision in zip(processed_articles, decisions)
+        ])
+        rejected = sum(1 for decision in decisions if not decision['passed'])
+        audited = sum(1 for decision in decisions if decision['audited'])
+        processed_articles = [
+            article for article, decision in zip(processed_articles, decisions)
+            if decision['passed'] or decision['audited']
+        ]
+        print(f"Relevance gate rejected {rejected} articles ({audited} of them scored anyway for the precision report)")
+        if not processed_articles:
+            print("No article passed the relevance gate.")
+            return
     
     # process article title -> legal file name
     def title_to_filename(title):
@@ -83,44 +120,162 @@ def main():
         return filename
     # scraping
     print("Scraping html...")
-    for article in processed_articles:
-        title = title_to_filename(article['title'])
-        html = scraper.fetch_content(article['link'], 20000)['content']
-        if html:
-            with open('data/pages/html/'+title+'.html', 'wt', encoding='utf-8') as f:
-                f.write(html)
-
+    scrape_config = config.get('scrape', {})
+    # custom profiles: {"name": {"base": "throughput", "block_url_patterns": [...], ...}}
+    for name, settings in scrape_config.get('profiles', {}).items():
+        settings = dict(settings)
+        register_profile(name, settings.pop('base', DEFAULT_PROFILE), **settings)
+    # feeds may name a scrape profile ("throughput" / "stealth") in data/feeds.json
+    feed_profiles = {feed['name']: feed.get('scrape_profile') for feed in r.feeds}
+    default_profile = scrape_config.get('profile', DEFAULT_PROFILE)
+    cache_config = scrape_config.get('cache', {})
+    cache = ScrapeCache(
+        cache_dir=cache_config.get('dir', 'data/cache/html'),
+        ttl_seconds=cache_config.get('ttl_hours', 168) * 3600,
+        max_bytes=cache_config.get('max_mb', 200) * 1024 * 1024
+    ) if cache_config.get('enabled', True) else None
+    with BrowserPool(size=scrape_config.get('browsers', 4)) as pool:
+        # plain HTTP first, the browser pool only for pages that fail the content quality check
+        tiered = TieredScraper(
+            browser_pool=pool,
+            http_workers=scrape_config.get('http_workers', 8),
+            http_timeout_ms=scrape_config.get('http_timeout_ms', 10000),
+            scheduler=DomainScheduler(
+                max_workers=scrape_config.get('http_workers', 8),
+                rate_per_domain=scrape_config.get('rate_per_domain', 1.0),
+                burst=scrape_config.get('domain_burst', 3),
+                per_domain_limit=scrape_config.get('per_domain_limit', 2),
+                respect_robots=scrape_config.get('respect_robots', True)
+            ),
+            cache=cache
+        )
+        results = tiered.fetch_contents(
+            [article['link'] for article in processed_articles],
+            timeout_ms=scrape_config.get('timeout_ms', 20000),
+            profiles=[feed_profiles.get(article['source']) or default_profile for article in processed_articles]
+        )
+    for tier, tier_stats in tiered.stats().items():
+        print(f"  {tier}: {tier_stats['wins']} pages ({tier_stats['win_rate']:.0%}), "
+              f"{tier_stats['avg_seconds']:.2f}s per attempt")
+    if cache is not None:
+        cache_stats = cache.stats()
+        print(f"  cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+              f"{cache_stats['entries']} pages ({cache_stats['bytes'] / 1e6:.1f} MB), {cache_stats['evictions']} evicted")
+    blocked = sum(result.get('blocked_requests', 0) for result in results)
+    saved = sum(result.get('bytes_saved_estimate', 0) for result in results)
+    # aborted requests are never downloaded, the saving is priced at a typical size per resource type
+    print(f"Blocked {blocked} requests while scraping, estimated saving ~{saved / 1e6:.1f} MB "
+          f"(typical sizes per resource type, not measured)")
+    scraped = [(article, result['content']) for article, result in zip(processed_articles, results) if result['content']]
 
+    # keep only the article body: nav bars, footers, banners and comments are not worth scoring
+    extract_config = config.get('extract', {})
+    if extract_config.get('enabled', True):
+        print("Extracting main content...")
+        extractor = ContentExtractor(workers=extract_config.get('workers'))
+        bodies = extractor.extract_many([html for _, html in scraped])
+        scraped = [(article, body) for (article, _), body in zip(scraped, bodies)]
+        extract_stats = extractor.stats()
+        print(f"  {extract_stats['input_chars'] / 1e6:.2f}M -> {extract_stats['output_chars'] / 1e6:.2f}M chars of HTML "
+              f"({extract_stats['kept_ratio']:.0%} kept), {extract_stats['seconds']:.2f}s")
 
-    # subprocess: invoke h2m (Go) to convert html to md
+    # HTML -> Markdown, in process; documents converted in earlier runs come from the cache
+    print("Converting html to markdown...")
+    convert_config = config.get('convert', {})
+    converter = MarkdownConverter(
+        workers=convert_config.get('workers'),
+        backend=convert_config.get('backend', 'python'),
+        h2m_binary=convert_config.get('h2m_binary', './h2m/bin/h2m'),
+        ttl_seconds=convert_config.get('cache_ttl_hours', 720) * 3600,
+        max_bytes=convert_config.get('cache_max_mb', 100) * 1024 * 1024
+    )
     try:
-        subprocess.run(
-            ["./h2m/bin/h2m"],
-            check=True
-        )
-    except subprocess.CalledProcessError as e:
-        print(f"Failed at invoking h2m: {e}: {e.stderr}")
+        markdowns = converter.convert_many([html for _, html in scraped])
+    finally:
+        converter.close()
+    os.makedirs('data/pages/md', exist_ok=True)
+    # md file name -> article, to store the score of each article for the relevance gate
+    doc_articles = {}
+    for (article, _), markdown in zip(scraped, markdowns):
+        if not markdown:
+            continue
+        doc_name = title_to_filename(article['title']) + '.md'
+        doc_articles[doc_name] = article
+        with open('data/pages/md/' + doc_name, 'wt', encoding='utf-8') as f:
+            f.write(markdown)
+    convert_stats = converter.stats()
+    md_chars = sum(len(markdown) for markdown in markdowns)
+    print(f"  {convert_stats['converted']} converted, {convert_stats['cached']} unchanged, {convert_stats['failed']} failed, "
+          f"{md_chars / 1e6:.2f}M chars of markdown, {convert_stats['seconds']:.2f}s")
 
 
 
     # LLM Scoring
     print("Scoring...")
-    s = LLMScorer()
+    llm_config = config.get('llm', {})
+    s = LLMScorer(
+        max_doc_tokens=llm_config.get('max_doc_tokens', 24000),
+        chunk_workers=llm_config.get('chunk_workers', 4),
+        timeout=llm_config.get('timeout', 120),
+        max_retries=llm_config.get('max_retries', 4),
+        json_mode=llm_config.get('json_mode', True),
+        cache=DBManager() if llm_config.get('cache', True) else None
+    )
     md_dir = "data/pages/md/"
     json_dir = "data/pages/json/"
+    os.makedirs(json_dir, exist_ok=True)
 
     with os.scandir(md_dir) as entries:
-        for entry in entries:
-            doc_path = md_dir+entry.name
-            out_path = json_dir + entry.name[:-3] +".json"
-        
-            output = s.score(doc_path)
-
-            with open(out_path, "w+", encoding='utf-8') as f:
-
-                # get valid json
-                # since LLM returns a md code block like ```json ... ```
-                f.write(output[8:-3])
+        doc_names = [entry.name for entry in entries if entry.name.endswith('.md')]
+    if llm_config.get('offline', False):
+        # provider batch API: cheaper, answers within 24h; an unfinished job is picked up by the next run.
+        # The job keeps its own copy of the markdown, so data/pages/md may be cleaned up below meanwhile.
+        print("  submitting to the batch API, waiting for the answers...")
+        outputs = s.score_offline(
+            [md_dir + name for name in doc_names],
+            json_dir=json_dir,
+            job_dir=llm_config.get('batch_dir', 'data/batch'),
+            poll_interval=llm_config.get('batch_poll_s', 60),
+            max_wait_s=llm_config.get('batch_max_wait_s'),
+            concurrency=llm_config.get('concurrency', 8),
+            fallback_deadline_s=llm_config.get('deadline_s')
+        )
+    else:
+        outputs = s.score_many(
+            [md_dir + name for name in doc_names],
+            concurrency=llm_config.get('concurrency', 8),
+            deadline_s=llm_config.get('deadline_s'),
+            batch_tokens=llm_config.get('batch_tokens'),
+            max_batch_docs=llm_config.get('max_batch_docs', 8)
+        )
+    article_scores = []
+    for name in doc_names:
+        output = outputs[md_dir + name]
+        if output is None:
+            continue
+        # already validated JSON, see LLMScorer.score
+        with open(json_dir + name[:-3] + ".json", "w+", encoding='utf-8') as f:
+            f.write(output)
+        if name in doc_articles:
+            rate = json.loads(output).get("RATE")
+            # answers without RATE are articles without technical value
+            score = MDWriter.calculate_score(rate)[0] if isinstance(rate, dict) else 0
+            article_scores.append((doc_articles[name]['hash'], score))
+    r.db.save_article_scores(article_scores)
+    total_tokens = sum(usage['total_tokens'] for usage in s.usage.values())
+    chunked = sum(1 for usage in s.usage.values() if usage['chunks'] > 1)
+    repairs = sum(usage['repairs'] for usage in s.usage.values())
+    batched = sum(1 for usage in s.usage.values() if usage['batched'])
+    print(f"  {len(s.usage)} documents scored ({chunked} chunked, {batched} in {len(s.batch_usage)} batches), "
+          f"{total_tokens} tokens used, {repairs} answers repaired, {len(s.failures)} failed")
+    prompt_cache_stats = s.prompt_cache_stats()
+    if prompt_cache_stats['calls']:
+        print(f"  provider prompt cache: {prompt_cache_stats['cached_prompt_tokens']} of "
+              f"{prompt_cache_stats['prompt_tokens']} prompt tokens cached ({prompt_cache_stats['cached_share']:.0%})")
+    if s.cache is not None:
+        llm_cache_stats = s.cache_stats()
+        print(f"  LLM cache: {llm_cache_stats['hits']} hits, {llm_cache_stats['misses']} misses "
+              f"({llm_cache_stats['hit_rate']:.0%})")
 
     def remove_files_in_folder(folder_path):
         """移除指定文件夹下的所有文件"""
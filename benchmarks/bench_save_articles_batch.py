@@ -0,0 +1,78 @@
+"""
+Benchmark: DBManager.save_articles_batch (single transaction, executemany)
+against the per-article save_article path it replaced.
+
+Usage:
+    python benchmarks/bench_save_articles_batch.py [--count 100000] [--legacy-count 2000]
+
+The per-article path costs an existence lookup and a commit per article, so
+it is timed on a smaller sample (--legacy-count) and extrapolated to --count.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.database import DBManager
+
+
+def synthetic_articles(count: int, offset: int = 0):
+    return [
+        {
+            'title': f'Synthetic article {i}',
+            'link': f'https://example.com/articles/{i}',
+            'source': f'Source {i % 50}',
+            'category': f'category-{i % 8}',
+            'summary': f'Summary of synthetic article {i}. ' * 4,
+            'published': '2024-01-15T10:00:00Z',
+            'feed_title': f'Source {i % 50}',
+            'feed_link': f'https://example.com/feeds/{i % 50}'
+        }
+        for i in range(offset, offset + count)
+    ]
+
+
+def bench_batch(db: DBManager, articles):
+    start = time.perf_counter()
+    new_count = db.save_articles_batch(articles)
+    return time.perf_counter() - start, new_count
+
+
+def bench_legacy(db: DBManager, articles):
+    start = time.perf_counter()
+    new_count = sum(1 for article in articles if db.save_article(article))
+    return time.perf_counter() - start, new_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=100_000)
+    parser.add_argument('--legacy-count', type=int, default=2_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        articles = synthetic_articles(args.count)
+
+        db = DBManager(os.path.join(tmp, 'batch.db'))
+        batch_time, batch_new = bench_batch(db, articles)
+        print(f"batch : {batch_new} new / {args.count} in {batch_time:.2f}s "
+              f"({args.count / batch_time:,.0f} articles/s)")
+
+        # Re-ingesting the same articles must insert nothing
+        rerun_time, rerun_new = bench_batch(db, articles)
+        print(f"rerun : {rerun_new} new / {args.count} in {rerun_time:.2f}s (all duplicates)")
+
+        legacy_db = DBManager(os.path.join(tmp, 'legacy.db'))
+        legacy_time, legacy_new = bench_legacy(legacy_db, articles[:args.legacy_count])
+        legacy_rate = args.legacy_count / legacy_time
+        print(f"legacy: {legacy_new} new / {args.legacy_count} in {legacy_time:.2f}s "
+              f"({legacy_rate:,.0f} articles/s, ~{args.count / legacy_rate:.1f}s for {args.count})")
+
+        print(f"speedup: {(args.count / batch_time) / legacy_rate:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
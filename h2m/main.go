@@ -1,46 +1,316 @@
 package main
 
+// h2m converts HTML to Markdown.
+//
+// Modes:
+//
+//	h2m                       convert every file of data/pages/html into data/pages/md (the original behaviour)
+//	h2m -manifest files.json  convert the files listed in a JSON manifest ("-" reads it from stdin):
+//	                          [{"input": "a.html", "output": "a.md"}, ...]
+//	h2m -stream               long-lived worker: length-prefixed documents on stdin, results on stdout
+//
+// In every mode the files are converted by a pool of -workers goroutines, and a failing file is reported
+// instead of stopping the batch. Directory and manifest mode print one JSON result per file on stdout:
+//
+//	{"input": "a.html", "output": "a.md", "ok": true}
+//	{"input": "b.html", "output": "b.md", "ok": false, "error": "..."}
+//
+// and exit with status 1 if any file failed.
+//
+// Stream protocol (all integers are unsigned 32 bit big endian):
+//
+//	request:  length, then `length` bytes of HTML
+//	response: status (0 ok, 1 error), length, then `length` bytes of Markdown or of the error message
+//
+// Responses come back in request order, so a client can pipeline requests. Closing stdin ends the worker.
+
 import (
+	"bufio"
+	"encoding/binary"
+	"encoding/json"
+	"flag"
+	"fmt"
+	"io"
 	"log"
 	"os"
+	"path/filepath"
+	"runtime"
+	"strings"
+	"sync"
 
 	htmltomarkdown "github.com/JohannesKaufmann/html-to-markdown/v2"
 )
 
+const (
+	htmlDir = "data/pages/html"
+	mdDir   = "data/pages/md"
+
+	// upper bound of one stream frame, guards against a corrupted length prefix
+	maxFrameSize = 64 << 20
+)
+
+// Job is one entry of the manifest.
+type Job struct {
+	Input  string `json:"input"`
+	Output string `json:"output"`
+}
+
+// Result is reported for every Job.
+type Result struct {
+	Input  string `json:"input"`
+	Output string `json:"output"`
+	OK     bool   `json:"ok"`
+	Error  string `json:"error,omitempty"`
+}
+
 func main() {
+	manifest := flag.String("manifest", "", "JSON manifest of {input, output} pairs, - for stdin")
+	stream := flag.Bool("stream", false, "serve length-prefixed documents on stdin/stdout")
+	workers := flag.Int("workers", runtime.NumCPU(), "number of concurrent conversions")
+	flag.Parse()
+
+	if *workers < 1 {
+		*workers = 1
+	}
+
+	if *stream {
+		if err := serveStream(os.Stdin, os.Stdout, *workers); err != nil {
+			log.Fatalf("Stream failed: %v", err)
+		}
+		return
+	}
+
+	var jobs []Job
+	var err error
+	if *manifest != "" {
+		jobs, err = readManifest(*manifest)
+	} else {
+		jobs, err = directoryJobs(htmlDir, mdDir)
+	}
+	if err != nil {
+		log.Fatalf("Cannot list files to convert: %v", err)
+	}
+
+	if failed := runBatch(jobs, *workers, os.Stdout); failed > 0 {
+		log.Printf("%d of %d files failed", failed, len(jobs))
+		os.Exit(1)
+	}
+}
+
+func readManifest(path string) ([]Job, error) {
+	var data []byte
+	var err error
+	if path == "-" {
+		data, err = io.ReadAll(os.Stdin)
+	} else {
+		data, err = os.ReadFile(path)
+	}
+	if err != nil {
+		return nil, err
+	}
+
+	var jobs []Job
+	if err := json.Unmarshal(data, &jobs); err != nil {
+		return nil, fmt.Errorf("invalid manifest: %w", err)
+	}
+	return jobs, nil
+}
+
+func directoryJobs(inDir, outDir string) ([]Job, error) {
+	entries, err := os.ReadDir(inDir)
+	if err != nil {
+		return nil, err
+	}
+
+	var jobs []Job
+	for _, v := range entries {
+		if v.IsDir() || !strings.HasSuffix(v.Name(), ".html") {
+			continue
+		}
+		title := strings.TrimSuffix(v.Name(), ".html")
+		jobs = append(jobs, Job{
+			Input:  filepath.Join(inDir, v.Name()),
+			Output: filepath.Join(outDir, title+".md"),
+		})
+	}
+	return jobs, nil
+}
+
+// runBatch converts all jobs with a pool of workers, writes one JSON result per job and returns the number of failures.
+func runBatch(jobs []Job, workers int, out io.Writer) int {
+	queue := make(chan Job)
+	results := make(chan Result)
+
+	var wg sync.WaitGroup
+	for i := 0; i < workers; i++ {
+		wg.Add(1)
+		go func() {
+			defer wg.Done()
+			for job := range queue {
+				results <- convertFile(job)
+			}
+		}()
+	}
+	go func() {
+		for _, job := range jobs {
+			queue <- job
+		}
+		close(queue)
+	}()
+	go func() {
+		wg.Wait()
+		close(results)
+	}()
 
-	f, err := os.Open("data/pages/html")
+	encoder := json.NewEncoder(out)
+	failed := 0
+	for result := range results {
+		if !result.OK {
+			failed++
+		}
+		if err := encoder.Encode(result); err != nil {
+			log.Printf("Cannot write result: %v", err)
+		}
+	}
+	return failed
+}
+
+func convertFile(job Job) Result {
+	result := Result{Input: job.Input, Output: job.Output}
+
+	// 1. Read html
+	htmlBytes, err := os.ReadFile(job.Input)
 	if err != nil {
-		log.Fatalf("Error when opening file: %v", err)
+		result.Error = fmt.Sprintf("failed to read html file: %v", err)
+		return result
 	}
-	defer f.Close()
-	dirEntries, err := f.ReadDir(0)
+
+	// 2. HTML → Markdown
+	markdown, err := convert(htmlBytes)
 	if err != nil {
-		log.Fatalf("Cannot read directory entries: %v", err)
+		result.Error = fmt.Sprintf("failed to convert: %v", err)
+		return result
 	}
 
-	for _, v := range dirEntries {
+	// 3. Write to .md
+	if err := os.WriteFile(job.Output, []byte(markdown), 0644); err != nil {
+		result.Error = fmt.Sprintf("failed to write markdown: %v", err)
+		return result
+	}
 
-		title := v.Name()[:len(v.Name())-5]
+	result.OK = true
+	return result
+}
 
-		// 1. Read html
-		htmlBytes, err := os.ReadFile("data/pages/html/" + title + ".html")
-		if err != nil {
-			log.Fatalf("Failed to read html file: %v", err)
+// convert never panics: a document that crashes the converter becomes an error result.
+func convert(htmlBytes []byte) (markdown string, err error) {
+	defer func() {
+		if r := recover(); r != nil {
+			err = fmt.Errorf("converter panic: %v", r)
 		}
+	}()
+	return htmltomarkdown.ConvertString(string(htmlBytes))
+}
+
+type streamResult struct {
+	markdown string
+	err      error
+}
 
-		// 2. HTML → Markdown
-		markdown, err := htmltomarkdown.ConvertString(string(htmlBytes))
-		if err != nil {
-			log.Fatalf("Failed to convert: %v", err)
+// serveStream converts documents from r with a pool of workers and writes the results to w in request order.
+func serveStream(r io.Reader, w io.Writer, workers int) error {
+	reader := bufio.NewReader(r)
+	writer := bufio.NewWriter(w)
+
+	type streamJob struct {
+		html   []byte
+		result chan streamResult
+	}
+	queue := make(chan streamJob)
+	// results in request order; the buffer bounds how far reading may run ahead of writing
+	pending := make(chan chan streamResult, workers*4)
+
+	var wg sync.WaitGroup
+	for i := 0; i < workers; i++ {
+		wg.Add(1)
+		go func() {
+			defer wg.Done()
+			for job := range queue {
+				markdown, err := convert(job.html)
+				job.result <- streamResult{markdown, err}
+			}
+		}()
+	}
+
+	readErr := make(chan error, 1)
+	go func() {
+		defer close(queue)
+		defer close(pending)
+		for {
+			html, err := readFrame(reader)
+			if err == io.EOF {
+				readErr <- nil
+				return
+			}
+			if err != nil {
+				readErr <- err
+				return
+			}
+			job := streamJob{html: html, result: make(chan streamResult, 1)}
+			pending <- job.result
+			queue <- job
 		}
+	}()
 
-		// 3. Write to .md
-		if err := os.WriteFile("data/pages/md/"+title+".md", []byte(markdown), 0644); err != nil {
-			log.Fatalf("Failed to write to markdown: %v", err)
+	var writeErr error
+	for result := range pending {
+		res := <-result
+		if writeErr != nil {
+			continue
+		}
+		if res.err != nil {
+			writeErr = writeFrame(writer, 1, []byte(res.err.Error()))
+		} else {
+			writeErr = writeFrame(writer, 0, []byte(res.markdown))
 		}
+		// flush when nothing else is ready, so a waiting client gets its answer right away
+		if writeErr == nil && len(pending) == 0 {
+			writeErr = writer.Flush()
+		}
+	}
+	wg.Wait()
 
-		log.Println("Conversion from html to md done, file saved as:", "data/pages/md/"+title+".md")
+	if writeErr != nil {
+		return writeErr
 	}
+	if err := writer.Flush(); err != nil {
+		return err
+	}
+	return <-readErr
+}
+
+func readFrame(r io.Reader) ([]byte, error) {
+	var length uint32
+	if err := binary.Read(r, binary.BigEndian, &length); err != nil {
+		return nil, err
+	}
+	if length > maxFrameSize {
+		return nil, fmt.Errorf("frame of %d bytes exceeds the limit of %d", length, maxFrameSize)
+	}
+	data := make([]byte, length)
+	if _, err := io.ReadFull(r, data); err != nil {
+		return nil, fmt.Errorf("truncated frame: %w", err)
+	}
+	return data, nil
+}
 
+func writeFrame(w io.Writer, status byte, data []byte) error {
+	header := make([]byte, 5)
+	header[0] = status
+	binary.BigEndian.PutUint32(header[1:], uint32(len(data)))
+	if _, err := w.Write(header); err != nil {
+		return err
+	}
+	_, err := w.Write(data)
+	return err
 }
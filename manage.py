@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+
+"""
+RSS Collection - maintenance commands
+
+usage:
+    python manage.py stats            show article statistics
+    python manage.py rebuild-stats    recount the article_stats counters from the articles table
+    python manage.py cleanup          delete old articles in batches and give the space back
+    python manage.py enable-incremental-vacuum
+                                      one-time VACUUM so that cleanup can shrink an existing database
+    python manage.py llm-cache-stats  show entries and hit rate of the LLM answer cache
+    python manage.py llm-cache-invalidate --stale
+                                      delete cached LLM answers (--stale: those of older prompts)
+    python manage.py gate-train       train the relevance gate on the scores of past runs
+    python manage.py gate-report      precision of the relevance gate against the full scorer
+    python manage.py llm-batch-collect
+                                      wait for the pending offline scoring batch and write its answers
+    python manage.py digest --from 2025-01-01 --to 2025-03-31
+                                      write a digest of every article stored in a date range
+"""
+
+import argparse
+import json
+
+from src.database import DBManager
+from src.md_writer import MDWriter
+from src.llm_scorer import LLMScorer, prompt_hash, load_batch_state, DEFAULT_BATCH_DIR
+from src.relevance_gate import RelevanceGate, evaluate, DEFAULT_MODEL_PATH
+
+
+def cmd_stats(db: DBManager, args):
+    print(json.dumps(db.get_article_stats(), ensure_ascii=False, indent=2))
+
+
+def cmd_rebuild_stats(db: DBManager, args):
+    if db.rebuild_article_stats():
+        print("Article statistics rebuilt.")
+        cmd_stats(db, args)
+    else:
+        print("Failed to rebuild article statistics, see logs/rss-collector.log")
+
+
+def cmd_cleanup(db: DBManager, args):
+    deleted = db.cleanup_old_articles(args.days, batch_size=args.batch_size, pause=args.pause)
+    print(f"Deleted {deleted} articles older than {args.days} days.")
+    if db.last_cleanup_report:
+        print(json.dumps(db.last_cleanup_report, indent=2))
+
+
+def cmd_enable_incremental_vacuum(db: DBManager, args):
+    print(f"auto_vacuum: {db.get_auto_vacuum_mode()}")
+    if db.get_auto_vacuum_mode() != 'incremental':
+        db.enable_incremental_vacuum()
+        print(f"auto_vacuum: {db.get_auto_vacuum_mode()}")
+
+
+def cmd_llm_cache_stats(db: DBManager, args):
+    stats = db.get_llm_cache_stats()
+    stats['current_prompt_hash'] = prompt_hash()
+    print(json.dumps(stats, ensure_ascii=False, indent=2))
+
+
+def cmd_llm_cache_invalidate(db: DBManager, args):
+    filters = {
+        'model': args.model,
+        'prompt_hash': args.prompt_hash,
+        'keep_prompt_hash': prompt_hash() if args.stale else None,
+        'older_than_days': args.older_than_days,
+    }
+    if not args.all and all(value is None for value in filters.values()):
+        print("Give a filter (--model, --prompt-hash, --stale, --older-than-days) or --all.")
+        return
+    deleted = db.invalidate_llm_cache(**filters)
+    print(f"Deleted {deleted} cached LLM answers.")
+
+
+def cmd_gate_train(db: DBManager, args):
+    try:
+        gate = RelevanceGate.train(
+            db.get_article_scores(args.days),
+            relevant_score=args.relevant_score,
+            min_recall=args.min_recall
+        )
+    except ValueError as e:
+        print(f"Cannot train the relevance gate: {e}")
+        return
+    gate.save(args.model)
+    print(f"Relevance gate saved to {args.model} (threshold {gate.threshold:.3f}), holdout metrics:")
+    print(json.dumps(gate.metrics, indent=2))
+
+
+def cmd_gate_report(db: DBManager, args):
+    gate = RelevanceGate.load(args.model)
+    report = evaluate(db.get_article_scores(args.days), relevant_score=gate.relevant_score)
+    report['training_metrics'] = gate.metrics
+    print(json.dumps(report, indent=2))
+
+
+def cmd_llm_batch_collect(db: DBManager, args):
+    state = load_batch_state(args.dir)
+    if state is None:
+        print(f"No pending batch job in {args.dir}.")
+        return
+    scorer = LLMScorer(model=state['model'], cache=db)
+    results = scorer.score_offline([], json_dir=args.json_dir, job_dir=args.dir,
+                                   poll_interval=args.poll, max_wait_s=args.max_wait,
+                                   fallback_deadline_s=args.fallback_deadline)
+    if not results:
+        print("The batch is not done yet, run again later.")
+        return
+    written = sum(1 for output in results.values() if output is not None)
+    print(f"Wrote {written} of {len(results)} answers to {args.json_dir}.")
+
+
+def cmd_digest(db: DBManager, args):
+    # articles are streamed from the database, so long ranges fit in memory
+    MDWriter(output_dir=args.output_dir, db=db).write_digest_for_date_range(
+        args.start_date, args.end_date, chunk_size=args.chunk_size
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RSS Collection maintenance commands")
+    parser.add_argument('--db', default="data/rss_collector.db", help="path of the SQLite database")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('stats', help="show article statistics").set_defaults(func=cmd_stats)
+    subparsers.add_parser('rebuild-stats', help="recount article statistics").set_defaults(func=cmd_rebuild_stats)
+
+    cleanup = subparsers.add_parser('cleanup', help="delete old articles")
+    cleanup.add_argument('--days', type=int, default=30, help="delete articles older than this many days")
+    cleanup.add_argument('--batch-size', type=int, default=1000, help="rows deleted per transaction")
+    cleanup.add_argument('--pause', type=float, default=0.05, help="seconds to sleep between batches")
+    cleanup.set_defaults(func=cmd_cleanup)
+
+    subparsers.add_parser(
+        'enable-incremental-vacuum', help="switch an existing database to auto_vacuum=INCREMENTAL"
+    ).set_defaults(func=cmd_enable_incremental_vacuum)
+
+    subparsers.add_parser(
+        'llm-cache-stats', help="show entries and hit rate of the LLM answer cache"
+    ).set_defaults(func=cmd_llm_cache_stats)
+
+    invalidate = subparsers.add_parser('llm-cache-invalidate', help="delete cached LLM answers")
+    invalidate.add_argument('--model', help="only answers of this model")
+    invalidate.add_argument('--prompt-hash', help="only answers of this prompt version")
+    invalidate.add_argument('--stale', action='store_true', help="only answers of prompts other than the current one")
+    invalidate.add_argument('--older-than-days', type=int, help="only answers cached more than this many days ago")
+    invalidate.add_argument('--all', action='store_true', help="delete every cached answer")
+    invalidate.set_defaults(func=cmd_llm_cache_invalidate)
+
+    gate_train = subparsers.add_parser('gate-train', help="train the relevance gate on past scores")
+    gate_train.add_argument('--model', default=DEFAULT_MODEL_PATH, help="where to save the model")
+    gate_train.add_argument('--days', type=int, help="only articles scored within this many days")
+    gate_train.add_argument('--relevant-score', type=int, default=50,
+                            help="digest score from which an article is relevant")
+    gate_train.add_argument('--min-recall', type=float, default=0.95,
+                            help="share of relevant articles the gate must keep")
+    gate_train.set_defaults(func=cmd_gate_train)
+
+    gate_report = subparsers.add_parser('gate-report', help="precision of the relevance gate against the full scorer")
+    gate_report.add_argument('--model', default=DEFAULT_MODEL_PATH, help="path of the model")
+    gate_report.add_argument('--days', type=int, help="only articles gated within this many days")
+    gate_report.set_defaults(func=cmd_gate_report)
+
+    collect = subparsers.add_parser('llm-batch-collect', help="collect the pending offline scoring batch")
+    collect.add_argument('--dir', default=DEFAULT_BATCH_DIR, help="job directory of the batch")
+    collect.add_argument('--json-dir', default='data/pages/json/', help="where to write the answers")
+    collect.add_argument('--poll', type=float, default=60, help="seconds between status checks")
+    collect.add_argument('--max-wait', type=float, help="seconds to wait, default until the batch is done")
+    collect.add_argument('--fallback-deadline', type=float,
+                         help="seconds the online scoring of unanswered documents may take")
+    collect.set_defaults(func=cmd_llm_batch_collect)
+
+    digest = subparsers.add_parser('digest', help="write a digest of the articles stored in a date range")
+    digest.add_argument('--from', dest='start_date', required=True, help="first day, YYYY-MM-DD")
+    digest.add_argument('--to', dest='end_date', required=True, help="last day, YYYY-MM-DD")
+    digest.add_argument('--output-dir', default="./data/output", help="where to write the digest")
+    digest.add_argument('--chunk-size', type=int, default=500, help="articles read per query")
+    digest.set_defaults(func=cmd_digest)
+
+    args = parser.parse_args()
+    args.func(DBManager(args.db), args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Main-content extraction.
+
+A rendered page carries navigation, footers, cookie banners, share buttons and comment threads around the
+article, and all of it used to end up in the Markdown sent to the LLM. extract_main_content keeps only the
+article body, in the spirit of Readability:
+1. drop tags that never hold article text, and elements whose class/id look like boilerplate
+2. score the parents of every paragraph by the amount of text, commas and class/id hints, lowered by
+   the share of link text
+3. keep the best scoring element plus siblings that score close to it
+
+When nothing scores well enough (e.g. a page that is mostly a list of links) the cleaned body is kept
+instead, so extraction never loses a page.
+
+ContentExtractor runs the extraction over many documents and reports the input vs output size.
+"""
+import logging
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from bs4 import BeautifulSoup, Tag
+
+UNLIKELY_TAGS = [
+    'script', 'style', 'noscript', 'template', 'iframe', 'svg', 'canvas', 'form', 'button',
+    'input', 'select', 'textarea', 'nav', 'footer', 'aside', 'dialog',
+]
+NEGATIVE_PATTERN = re.compile(
+    r'comment|cookie|consent|banner|header|footer|sidebar|share|social|related|promo|sponsor|advert|\bad-|\bads\b'
+    r'|newsletter|subscribe|popup|modal|menu|breadcrumb|masthead|widget|combx|disqus|signup',
+    re.IGNORECASE
+)
+POSITIVE_PATTERN = re.compile(r'article|body|content|entry|main|post|story|text|blog', re.IGNORECASE)
+PARAGRAPH_TAGS = ['p', 'pre', 'td', 'blockquote', 'li']
+
+MIN_PARAGRAPH_CHARS = 25
+MIN_CONTENT_CHARS = 250
+
+
+def _class_weight(element: Tag) -> int:
+    weight = 0
+    for value in (' '.join(element.get('class') or []), element.get('id') or ''):
+        if not value:
+            continue
+        if NEGATIVE_PATTERN.search(value):
+            weight -= 25
+        if POSITIVE_PATTERN.search(value):
+            weight += 25
+    return weight
+
+
+def _link_density(element: Tag) -> float:
+    text_length = len(element.get_text(strip=True))
+    if not text_length:
+        return 0.0
+    link_length = sum(len(a.get_text(strip=True)) for a in element.find_all('a'))
+    return link_length / text_length
+
+
+def _remove_boilerplate(soup: BeautifulSoup):
+    for element in soup.find_all(UNLIKELY_TAGS):
+        element.decompose()
+
+    # boilerplate containers; keep the ones that also look like content, e.g. class="post-footer-content"
+    for element in soup.find_all(True):
+        if element.decomposed or element.name in ('html', 'body', 'article', 'main'):
+            continue
+        value = ' '.join(element.get('class') or []) + ' ' + (element.get('id') or '')
+        if NEGATIVE_PATTERN.search(value) and not POSITIVE_PATTERN.search(value):
+            element.decompose()
+
+
+def _best_candidate(body: Tag) -> Optional[Tag]:
+    scores: Dict[int, float] = {}
+    elements: Dict[int, Tag] = {}
+
+    for paragraph in body.find_all(PARAGRAPH_TAGS):
+        text = paragraph.get_text(' ', strip=True)
+        if len(text) < MIN_PARAGRAPH_CHARS:
+            continue
+        score = 1 + text.count(',') + min(len(text) // 100, 3)
+
+        for level, ancestor in enumerate((paragraph.parent, paragraph.parent.parent if paragraph.parent else None)):
+            if not isinstance(ancestor, Tag):
+                break
+            key = id(ancestor)
+            if key not in scores:
+                elements[key] = ancestor
+                scores[key] = _class_weight(ancestor) + (5 if ancestor.name in ('article', 'main') else 0)
+            scores[key] += score if level == 0 else score / 2
+
+    if not scores:
+        return None
+    for key in scores:
+        scores[key] *= 1 - _link_density(elements[key])
+    best = max(scores, key=scores.get)
+
+    # siblings that score close to the best candidate are part of the article too (e.g. split <div>s)
+    candidate = elements[best]
+    threshold = max(10.0, scores[best] * 0.2)
+    parent = candidate.parent
+    if not isinstance(parent, Tag):
+        return candidate
+    kept = [
+        sibling for sibling in parent.find_all(True, recursive=False)
+        if sibling is candidate or scores.get(id(sibling), 0) >= threshold
+    ]
+    if len(kept) == 1:
+        return candidate
+    wrapper = BeautifulSoup('<div></div>', 'html.parser').div
+    for sibling in kept:
+        wrapper.append(sibling.extract())
+    return wrapper
+
+
+def extract_main_content(html: str) -> str:
+    """
+    Keep the article body of an HTML document.
+    :return: HTML of the article body, headed by the page title when the body has no <h1>.
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    title = soup.title.get_text(strip=True) if soup.title else ''
+
+    _remove_boilerplate(soup)
+    body = soup.body or soup
+    content = _best_candidate(body)
+    if content is None or len(content.get_text(strip=True)) < MIN_CONTENT_CHARS:
+        content = body
+
+    result = str(content)
+    if title and not content.find('h1'):
+        result = f'<h1>{title}</h1>\n{result}'
+    return result
+
+
+def _safe_extract(html: str) -> str:
+    """
+    Helper: extract_main_content for the process pool, the whole document on error
+    """
+    try:
+        return extract_main_content(html)
+    except Exception as e:
+        logging.getLogger(__name__).error(f"Cannot extract main content: {type(e).__name__}: {e}")
+        return html
+
+
+class ContentExtractor:
+    """Strip boilerplate from many documents and keep count of what was removed"""
+
+    def __init__(self, workers: Optional[int] = None):
+        """
+        :param workers: Processes of extract_many, None for one per core, 1 to extract in this process.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.logger = logging.getLogger(__name__)
+        self._stats = {'documents': 0, 'input_chars': 0, 'output_chars': 0, 'seconds': 0.0}
+
+    def extract(self, html: str) -> str:
+        return self.extract_many([html], workers=1)[0]
+
+    def extract_many(self, htmls: List[str], workers: Optional[int] = None) -> List[str]:
+        """
+        :return: The article body of every document, in the same order.
+        """
+        start = time.monotonic()
+        workers = min(workers or self.workers, len(htmls))
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(_safe_extract, htmls, chunksize=4))
+        else:
+            results = [_safe_extract(html) for html in htmls]
+
+        input_chars = sum(len(html) for html in htmls)
+        output_chars = sum(len(result) for result in results)
+        self._stats['documents'] += len(htmls)
+        self._stats['input_chars'] += input_chars
+        self._stats['output_chars'] += output_chars
+        self._stats['seconds'] += time.monotonic() - start
+        self.logger.info(f"Extracted main content of {len(htmls)} documents: {input_chars} -> {output_chars} chars")
+        return results
+
+    def stats(self) -> Dict:
+        """
+        Documents processed, characters in and out, the share of characters kept and the time spent.
+        """
+        stats = dict(self._stats)
+        stats['kept_ratio'] = round(stats['output_chars'] / stats['input_chars'], 3) if stats['input_chars'] else 0.0
+        stats['seconds'] = round(stats['seconds'], 3)
+        return stats
@@ -1,5 +1,5 @@
 import hashlib
-from typing import List, Dict
+from typing import List, Dict, Iterable, Iterator
 from datetime import datetime
 
 class ContentProcessor:
@@ -33,6 +33,25 @@ class ContentProcessor:
         print(f"{len(unique_articles)}/{len(articles)} articles after duplicates removal.")
         return unique_articles
     
+    def matches_keywords(self, article: Dict, include_keywords: List[str] = None,
+                         exclude_keywords: List[str] = None) -> bool:
+        """
+        Keyword-based filtering of a single article
+        """
+        title = article['title'].lower()
+        summary = (article.get('summary') or '').lower()
+        content = f"{title} {summary}"
+
+        # exclude
+        if exclude_keywords:
+            if any(keyword.lower() in content for keyword in exclude_keywords):
+                return False
+
+        # include
+        if include_keywords:
+            return any(keyword.lower() in content for keyword in include_keywords)
+        return True
+
     def filter_by_keywords(self, articles: List[Dict], include_keywords: List[str] = None, 
                           exclude_keywords: List[str] = None) -> List[Dict]:
         """
@@ -41,27 +60,35 @@ class ContentProcessor:
         if not include_keywords and not exclude_keywords:
             return articles
         
-        filtered_articles = []
-        
-        for article in articles:
-            title = article['title'].lower()
-            summary = article.get('summary', '').lower()
-            content = f"{title} {summary}"
-            
-            # exclude
-            if exclude_keywords:
-                if any(keyword.lower() in content for keyword in exclude_keywords):
-                    continue
-            
-            # include
-            if include_keywords:
-                if any(keyword.lower() in content for keyword in include_keywords):
-                    filtered_articles.append(article)
-            else:
-                filtered_articles.append(article)
+        filtered_articles = [
+            article for article in articles
+            if self.matches_keywords(article, include_keywords, exclude_keywords)
+        ]
         
         print(f"{len(filtered_articles)}/{len(articles)} articles after keyword-based filtering")
         return filtered_articles
+
+    def is_recent(self, article: Dict, hours: int = 24, now: datetime = None) -> bool:
+        """
+        Recency check of a single article
+        """
+        if hours <= 0:
+            return True
+
+        published = article.get('published', '')
+        if not published:
+            # keep those without published date
+            return True
+
+        try:
+            from dateutil import parser
+            publish_time = parser.parse(published)
+            time_diff = (now or datetime.now()) - publish_time
+
+            return time_diff.total_seconds() <= hours * 3600
+        except:
+            # keep articles when parse error
+            return True
     
     def filter_by_recency(self, articles: List[Dict], hours: int = 24) -> List[Dict]:
         """
@@ -70,26 +97,8 @@ class ContentProcessor:
         if hours <= 0:
             return articles
         
-        recent_articles = []
         now = datetime.now()
-        
-        for article in articles:
-            published = article.get('published', '')
-            if not published:
-                # keep those without published date
-                recent_articles.append(article)
-                continue
-            
-            try:
-                from dateutil import parser
-                publish_time = parser.parse(published)
-                time_diff = now - publish_time
-                
-                if time_diff.total_seconds() <= hours * 3600:
-                    recent_articles.append(article)
-            except:
-                # keep articles when parse error
-                recent_articles.append(article)
+        recent_articles = [article for article in articles if self.is_recent(article, hours, now)]
         
         print(f"Within ({hours} hours): {len(recent_articles)}/{len(articles)} articles")
         return recent_articles
@@ -137,6 +146,34 @@ class ContentProcessor:
         print(f"Done: {len(processed)} articles")
         return processed
 
+    def iter_process_articles(self, articles: Iterable[Dict],
+                              remove_duplicates: bool = True,
+                              include_keywords: List[str] = None,
+                              exclude_keywords: List[str] = None,
+                              max_age_hours: int = 24) -> Iterator[Dict]:
+        """
+        Streaming version of process_articles for large inputs such as DBManager.iter_articles().
+        Applies the same filters lazily, one article at a time; only the hashes of seen articles are kept.
+        Sorting needs the whole list and is not done here.
+        """
+        seen_hashes = set()
+        now = datetime.now()
+
+        for article in articles:
+            if remove_duplicates:
+                article_hash = self.calculate_article_hash(article)
+                if article_hash in seen_hashes:
+                    continue
+                seen_hashes.add(article_hash)
+
+            if not self.matches_keywords(article, include_keywords, exclude_keywords):
+                continue
+
+            if not self.is_recent(article, max_age_hours, now):
+                continue
+
+            yield article
+
 # Simple unit test
 if __name__ == "__main__":
     processor = ContentProcessor()
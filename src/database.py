@@ -1,24 +1,77 @@
+import os
 import sqlite3
 import hashlib
-from typing import List, Dict
+import threading
+import time
+from datetime import date, timedelta
+from typing import List, Dict, Iterator
 
 import logging
 from src.utils.logger_config import setup_logging
 
+# Connection tuning
+MMAP_SIZE = 256 * 1024 * 1024   # bytes of the database file mapped into memory
+STATEMENT_CACHE_SIZE = 256      # prepared statements kept per connection
+BUSY_TIMEOUT = 30.0             # seconds to wait for a lock held by another connection
+
+# Columns that may be requested from the article iterators
+ARTICLE_COLUMNS = (
+    'id', 'hash', 'title', 'link', 'source', 'category', 'content_hash', 'published',
+    'summary', 'feed_title', 'feed_link', 'created_at', 'updated_at'
+)
+
+# One long-lived connection per (thread, database file), shared by every DBManager of that thread
+_local = threading.local()
+
+
 class DBManager:
     def __init__(self, db_path: str = "data/rss_collector.db"):
         self.db_path = db_path
 
         setup_logging()
         self.logger = logging.getLogger(__name__)
+
+        # summary of the last cleanup_old_articles run
+        self.last_cleanup_report: Dict = {}
         
         self.init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Get the calling thread's connection, opening and tuning it on first use.
+        Use as `with self._connect() as conn:` - the block is a transaction, the connection stays open.
+        """
+        connections = getattr(_local, 'connections', None)
+        if connections is None:
+            connections = _local.connections = {}
+
+        key = os.path.abspath(self.db_path)
+        conn = connections.get(key)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT, cached_statements=STATEMENT_CACHE_SIZE)
+            # Only takes effect on a new, empty database (so it must come before journal_mode);
+            # see enable_incremental_vacuum for existing ones
+            conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            # WAL lets readers (digest generation) run while the writer (ingest) commits
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(f'PRAGMA mmap_size={MMAP_SIZE}')
+            conn.execute('PRAGMA temp_store=MEMORY')
+            connections[key] = conn
+        return conn
+
+    def close(self):
+        """Close the calling thread's connection to this database"""
+        connections = getattr(_local, 'connections', {})
+        conn = connections.pop(os.path.abspath(self.db_path), None)
+        if conn is not None:
+            conn.close()
         
 
     def init_database(self):
         """Initialize database tables"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
 
                 # Create articles table
@@ -46,19 +99,115 @@ class DBManager:
                         feed_url TEXT PRIMARY KEY,
                         last_processed TIMESTAMP,
                         article_count INTEGER DEFAULT 0,
-                        last_error TEXT
+                        last_error TEXT,
+                        etag TEXT,
+                        last_modified TEXT
                     )
                 ''')
 
+                # Databases created before conditional GET support lack the validator columns
+                cursor.execute('PRAGMA table_info(feed_status)')
+                feed_status_columns = {row[1] for row in cursor.fetchall()}
+                for column in ('etag', 'last_modified'):
+                    if column not in feed_status_columns:
+                        cursor.execute(f'ALTER TABLE feed_status ADD COLUMN {column} TEXT')
+
                 # Create indexes for better performance
                 cursor.execute('CREATE INDEX IF NOT EXISTS idx_articles_hash ON articles(hash)')
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_articles_source ON articles(source)')
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_articles_category ON articles(category)')
                 cursor.execute('CREATE INDEX IF NOT EXISTS idx_articles_created ON articles(created_at)')
+                # (category|source, created_at) serve filtered "newest first" reads and range scans without a
+                # sort step, and cover the per-category / per-source counts.
+                # They also answer lookups by category / source alone, which replaces the old single-column indexes.
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_articles_category_created ON articles(category, created_at)')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_articles_source_created ON articles(source, created_at)')
+                cursor.execute('DROP INDEX IF EXISTS idx_articles_category')
+                cursor.execute('DROP INDEX IF EXISTS idx_articles_source')
+
+                # Materialized counters for get_article_stats, kept current by the triggers below.
+                # dimension is 'total' (key ''), 'category' or 'source'
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'article_stats'")
+                stats_table_exists = cursor.fetchone() is not None
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS article_stats (
+                        dimension TEXT NOT NULL,
+                        key TEXT NOT NULL,
+                        count INTEGER NOT NULL DEFAULT 0,
+                        PRIMARY KEY (dimension, key)
+                    ) WITHOUT ROWID
+                ''')
+                cursor.execute('''
+                    CREATE TRIGGER IF NOT EXISTS trg_article_stats_insert AFTER INSERT ON articles
+                    BEGIN
+                        INSERT INTO article_stats (dimension, key, count)
+                        VALUES ('total', '', 1), ('category', NEW.category, 1), ('source', NEW.source, 1)
+                        ON CONFLICT(dimension, key) DO UPDATE SET count = count + 1;
+                    END
+                ''')
+                cursor.execute('''
+                    CREATE TRIGGER IF NOT EXISTS trg_article_stats_delete AFTER DELETE ON articles
+                    BEGIN
+                        UPDATE article_stats SET count = count - 1
+                        WHERE (dimension = 'total' AND key = '')
+                           OR (dimension = 'category' AND key = OLD.category)
+                           OR (dimension = 'source' AND key = OLD.source);
+                        DELETE FROM article_stats
+                        WHERE count <= 0 AND dimension != 'total'
+                          AND ((dimension = 'category' AND key = OLD.category)
+                            OR (dimension = 'source' AND key = OLD.source));
+                    END
+                ''')
+                cursor.execute('''
+                    CREATE TRIGGER IF NOT EXISTS trg_article_stats_update AFTER UPDATE OF category, source ON articles
+                    BEGIN
+                        UPDATE article_stats SET count = count - 1
+                        WHERE (dimension = 'category' AND key = OLD.category)
+                           OR (dimension = 'source' AND key = OLD.source);
+                        DELETE FROM article_stats
+                        WHERE count <= 0 AND dimension != 'total';
+                        INSERT INTO article_stats (dimension, key, count)
+                        VALUES ('category', NEW.category, 1), ('source', NEW.source, 1)
+                        ON CONFLICT(dimension, key) DO UPDATE SET count = count + 1;
+                    END
+                ''')
+
+                # LLM answers, so that an unchanged document is not scored again with the same prompt and model.
+                # Every row was a miss once, so SUM(hits) / (SUM(hits) + COUNT(*)) is the lifetime hit rate.
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS llm_cache (
+                        content_hash TEXT NOT NULL,
+                        prompt_hash TEXT NOT NULL,
+                        model TEXT NOT NULL,
+                        output TEXT NOT NULL,
+                        prompt_tokens INTEGER DEFAULT 0,
+                        completion_tokens INTEGER DEFAULT 0,
+                        hits INTEGER DEFAULT 0,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        last_hit_at TIMESTAMP,
+                        PRIMARY KEY (content_hash, prompt_hash, model)
+                    ) WITHOUT ROWID
+                ''')
+
+                # Relevance gate decisions and the digest score the full scorer gave later, the gate's training
+                # data and the ground truth of its precision. score stays NULL for articles that were not scored.
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS article_scores (
+                        article_hash TEXT PRIMARY KEY,
+                        gate_probability REAL,
+                        gate_passed INTEGER,
+                        audited INTEGER DEFAULT 0,
+                        score INTEGER,
+                        gated_at TIMESTAMP,
+                        scored_at TIMESTAMP
+                    )
+                ''')
 
                 conn.commit()
                 self.logger.info("Database initialized successfully")
 
+            # Existing databases get their counters filled once
+            if not stats_table_exists:
+                self.rebuild_article_stats()
+
         except sqlite3.Error as e:
             self.logger.error(f"Database initialization failed: {e}")
             raise
@@ -76,7 +225,7 @@ class DBManager:
     def article_exists(self, article_hash: str) -> bool:
         """Check if article already exists in database"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute('SELECT 1 FROM articles WHERE hash = ?', (article_hash,))
                 return cursor.fetchone() is not None
@@ -94,7 +243,7 @@ class DBManager:
             return False
 
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
 
                 cursor.execute('''
@@ -123,11 +272,45 @@ class DBManager:
             return False
 
     def save_articles_batch(self, articles: List[Dict]) -> int:
-        """Save multiple articles to database, return count of new articles"""
-        new_count = 0
-        for article in articles:
-            if self.save_article(article):
-                new_count += 1
+        """
+        Save multiple articles to database in a single transaction, return count of new articles.
+        Existing articles (same hash) are skipped by the unique constraint.
+        """
+        if not articles:
+            return 0
+
+        rows = [
+            (
+                self.calculate_article_hash(article),
+                article['title'],
+                article['link'],
+                article['source'],
+                article['category'],
+                self.calculate_content_hash(article),
+                article.get('published', ''),
+                article.get('summary', ''),
+                article.get('feed_title', ''),
+                article.get('feed_link', '')
+            )
+            for article in articles
+        ]
+
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                # rowcount of executemany is the sum over all rows, ignored conflicts add 0
+                cursor.executemany('''
+                    INSERT INTO articles
+                    (hash, title, link, source, category, content_hash, published, summary, feed_title, feed_link)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(hash) DO NOTHING
+                ''', rows)
+                new_count = cursor.rowcount
+                conn.commit()
+
+        except sqlite3.Error as e:
+            self.logger.error(f"Error saving articles batch: {e}")
+            return 0
 
         self.logger.info(f"Saved {new_count} new articles from {len(articles)} processed")
         return new_count
@@ -135,9 +318,9 @@ class DBManager:
     def get_recent_articles(self, limit: int = 50, category: str | None = None) -> List[Dict]:
         """Get recent articles from database"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self._connect() as conn:
                 cursor = conn.cursor()
+                cursor.row_factory = sqlite3.Row
 
                 if category:
                     cursor.execute('''
@@ -161,44 +344,389 @@ class DBManager:
             return []
 
     def get_articles_by_date_range(self, start_date: str, end_date: str) -> List[Dict]:
-        """Get articles within date range"""
+        """
+        Get articles within date range (YYYY-MM-DD, inclusive).
+        Compares the raw created_at text so idx_articles_created can be used; see iter_articles for large ranges.
+        """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            conditions, params = self._date_conditions(start_date, end_date)
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+            with self._connect() as conn:
                 cursor = conn.cursor()
+                cursor.row_factory = sqlite3.Row
 
-                cursor.execute('''
+                cursor.execute(f'''
                     SELECT * FROM articles
-                    WHERE DATE(created_at) BETWEEN ? AND ?
+                    {where}
                     ORDER BY created_at DESC
-                ''', (start_date, end_date))
+                ''', params)
 
                 rows = cursor.fetchall()
                 return [dict(row) for row in rows]
 
-        except sqlite3.Error as e:
+        except (sqlite3.Error, ValueError) as e:
             self.logger.error(f"Error fetching articles by date range: {e}")
             return []
 
-    def get_article_stats(self) -> Dict:
-        """Get database statistics"""
+    @staticmethod
+    def _date_conditions(start_date: str | None, end_date: str | None) -> tuple:
+        """
+        Helper: turn inclusive YYYY-MM-DD dates into index-friendly conditions on the raw created_at text.
+        Returns (conditions, params); a None date leaves that side unbounded.
+        Raises ValueError on a malformed date.
+        """
+        conditions, params = [], []
+        if start_date:
+            conditions.append('created_at >= ?')
+            params.append(date.fromisoformat(start_date).isoformat())
+        if end_date:
+            conditions.append('created_at < ?')
+            params.append((date.fromisoformat(end_date) + timedelta(days=1)).isoformat())
+        return conditions, params
+
+    def iter_article_chunks(self, start_date: str | None = None, end_date: str | None = None,
+                            category: str | None = None, chunk_size: int = 500,
+                            columns: List[str] | None = None) -> Iterator[List[Dict]]:
+        """
+        Iterate over articles newest first, one list of at most `chunk_size` rows per query.
+        Uses keyset pagination on (created_at, id), so memory stays constant however large the range is
+        and no read transaction is held open between chunks.
+        start_date / end_date: inclusive YYYY-MM-DD bounds on created_at
+        columns: subset of ARTICLE_COLUMNS to load (default all)
+        """
+        columns = list(columns or ARTICLE_COLUMNS)
+        unknown = set(columns) - set(ARTICLE_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown article columns: {sorted(unknown)}")
+        # keyset columns are always needed
+        select_columns = columns + [c for c in ('id', 'created_at') if c not in columns]
+
+        try:
+            conditions, params = self._date_conditions(start_date, end_date)
+        except ValueError as e:
+            self.logger.error(f"Error iterating articles: {e}")
+            return
+        if category:
+            conditions.append('category = ?')
+            params.append(category)
+
+        last_created, last_id = None, None
+        while True:
+            page_conditions, page_params = list(conditions), list(params)
+            if last_id is not None:
+                page_conditions.append('created_at <= ? AND (created_at < ? OR id < ?)')
+                page_params += [last_created, last_created, last_id]
+
+            where = f"WHERE {' AND '.join(page_conditions)}" if page_conditions else ''
+            try:
+                cursor = self._connect().cursor()
+                cursor.row_factory = sqlite3.Row
+                cursor.execute(f'''
+                    SELECT {', '.join(select_columns)} FROM articles
+                    {where}
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT ?
+                ''', page_params + [chunk_size])
+                rows = cursor.fetchall()
+            except sqlite3.Error as e:
+                self.logger.error(f"Error iterating articles: {e}")
+                return
+
+            if not rows:
+                return
+
+            last_created, last_id = rows[-1]['created_at'], rows[-1]['id']
+            yield [{column: row[column] for column in columns} for row in rows]
+
+            if len(rows) < chunk_size:
+                return
+
+    def iter_articles(self, start_date: str | None = None, end_date: str | None = None,
+                      category: str | None = None, chunk_size: int = 500,
+                      columns: List[str] | None = None) -> Iterator[Dict]:
+        """Iterate over articles one by one, see iter_article_chunks"""
+        for chunk in self.iter_article_chunks(start_date, end_date, category, chunk_size, columns):
+            yield from chunk
+
+    def count_articles_by_category(self, start_date: str | None = None, end_date: str | None = None) -> Dict:
+        """Count articles per category within an inclusive YYYY-MM-DD range on created_at"""
+        try:
+            conditions, params = self._date_conditions(start_date, end_date)
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    SELECT category, COUNT(*) FROM articles
+                    {where}
+                    GROUP BY category
+                ''', params)
+                return dict(cursor.fetchall())
+
+        except (sqlite3.Error, ValueError) as e:
+            self.logger.error(f"Error counting articles by category: {e}")
+            return {}
+
+    def get_feed_validators(self, feed_url: str) -> Dict:
+        """Get the stored ETag / Last-Modified of a feed for conditional GET"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    'SELECT etag, last_modified FROM feed_status WHERE feed_url = ?',
+                    (feed_url,)
+                )
+                row = cursor.fetchone()
+                if not row:
+                    return {}
+                return {'etag': row[0], 'last_modified': row[1]}
+
+        except sqlite3.Error as e:
+            self.logger.error(f"Error fetching feed validators: {e}")
+            return {}
+
+    def update_feed_status(self, feed_url: str, etag: str | None = None, last_modified: str | None = None,
+                           article_count: int = 0, last_error: str | None = None) -> bool:
+        """Record the result of a feed fetch together with its cache validators"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    INSERT INTO feed_status (feed_url, last_processed, article_count, last_error, etag, last_modified)
+                    VALUES (?, CURRENT_TIMESTAMP, ?, ?, ?, ?)
+                    ON CONFLICT(feed_url) DO UPDATE SET
+                        last_processed = excluded.last_processed,
+                        article_count = excluded.article_count,
+                        last_error = excluded.last_error,
+                        etag = excluded.etag,
+                        last_modified = excluded.last_modified
+                ''', (feed_url, article_count, last_error, etag, last_modified))
+                conn.commit()
+                return True
+
+        except sqlite3.Error as e:
+            self.logger.error(f"Error updating feed status: {e}")
+            return False
+
+    def get_llm_result(self, content_hash: str, prompt_hash: str, model: str) -> str | None:
+        """Get a cached LLM answer, None when there is none; the caller counts it with record_llm_hit once it is used"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT output FROM llm_cache
+                    WHERE content_hash = ? AND prompt_hash = ? AND model = ?
+                ''', (content_hash, prompt_hash, model))
+                row = cursor.fetchone()
+                return row[0] if row else None
+
+        except sqlite3.Error as e:
+            self.logger.error(f"Error reading LLM cache: {e}")
+            return None
+
+    def record_llm_hit(self, content_hash: str, prompt_hash: str, model: str) -> bool:
+        """Count a use of a cached LLM answer"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    UPDATE llm_cache SET hits = hits + 1, last_hit_at = CURRENT_TIMESTAMP
+                    WHERE content_hash = ? AND prompt_hash = ? AND model = ?
+                ''', (content_hash, prompt_hash, model))
+                conn.commit()
+                return cursor.rowcount > 0
+
+        except sqlite3.Error as e:
+            self.logger.error(f"Error updating LLM cache hits: {e}")
+            return False
+
+    def save_llm_result(self, content_hash: str, prompt_hash: str, model: str, output: str,
+                        prompt_tokens: int = 0, completion_tokens: int = 0) -> bool:
+        """Store an LLM answer, replacing an older one for the same key"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    INSERT INTO llm_cache (content_hash, prompt_hash, model, output, prompt_tokens, completion_tokens)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(content_hash, prompt_hash, model) DO UPDATE SET
+                        output = excluded.output,
+                        prompt_tokens = excluded.prompt_tokens,
+                        completion_tokens = excluded.completion_tokens,
+                        created_at = CURRENT_TIMESTAMP
+                ''', (content_hash, prompt_hash, model, output, prompt_tokens, completion_tokens))
+                conn.commit()
+                return True
+
+        except sqlite3.Error as e:
+            self.logger.error(f"Error writing LLM cache: {e}")
+            return False
+
+    def invalidate_llm_cache(self, model: str | None = None, prompt_hash: str | None = None,
+                             keep_prompt_hash: str | None = None, older_than_days: int | None = None) -> int:
+        """
+        Delete cached LLM answers matching all given filters; no filter deletes everything.
+        :param keep_prompt_hash: Delete answers of every other prompt, e.g. the current one to drop stale answers.
+        :return: Number of answers deleted.
+        """
+        conditions, params = [], []
+        if model is not None:
+            conditions.append('model = ?')
+            params.append(model)
+        if prompt_hash is not None:
+            conditions.append('prompt_hash = ?')
+            params.append(prompt_hash)
+        if keep_prompt_hash is not None:
+            conditions.append('prompt_hash != ?')
+            params.append(keep_prompt_hash)
+        if older_than_days is not None:
+            conditions.append("created_at < datetime('now', ?)")
+            params.append(f'-{older_than_days} days')
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'DELETE FROM llm_cache {where}', params)
+                conn.commit()
+                self.logger.info(f"Invalidated {cursor.rowcount} cached LLM answers")
+                return cursor.rowcount
+
+        except sqlite3.Error as e:
+            self.logger.error(f"Error invalidating LLM cache: {e}")
+            return 0
+
+    def get_llm_cache_stats(self) -> Dict:
+        """Get entries, hits, lifetime hit rate and tokens saved of the LLM cache, overall and per (model, prompt)"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT model, prompt_hash, COUNT(*), COALESCE(SUM(hits), 0),
+                           COALESCE(SUM(hits * (prompt_tokens + completion_tokens)), 0)
+                    FROM llm_cache GROUP BY model, prompt_hash
+                ''')
+                groups = []
+                entries = hits = tokens = 0
+                for model, prompt_hash, count, group_hits, group_tokens in cursor.fetchall():
+                    groups.append({
+                        'model': model,
+                        'prompt_hash': prompt_hash,
+                        'entries': count,
+                        'hits': group_hits,
+                        'hit_rate': round(group_hits / (group_hits + count), 3),
+                    })
+                    entries += count
+                    hits += group_hits
+                    # every hit saved the tokens the answer cost when it was scored
+                    tokens += group_tokens
+
+                return {
+                    'entries': entries,
+                    'hits': hits,
+                    'hit_rate': round(hits / (hits + entries), 3) if entries else 0.0,
+                    'tokens_saved': tokens,
+                    'by_model_prompt': groups,
+                }
+
+        except sqlite3.Error as e:
+            self.logger.error(f"Error getting LLM cache statistics: {e}")
+            return {}
+
+    def save_gate_decisions(self, decisions: List[tuple]) -> bool:
+        """
+        Store relevance gate decisions.
+        :param decisions: (article_hash, probability, passed, audited) tuples.
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.executemany('''
+                    INSERT INTO article_scores (article_hash, gate_probability, gate_passed, audited, gated_at)
+                    VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT(article_hash) DO UPDATE SET
+                        gate_probability = excluded.gate_probability,
+                        gate_passed = excluded.gate_passed,
+                        audited = excluded.audited,
+                        gated_at = excluded.gated_at
+                ''', [(h, p, int(passed), int(audited)) for h, p, passed, audited in decisions])
+                conn.commit()
+                return True
+
+        except sqlite3.Error as e:
+            self.logger.error(f"Error saving gate decisions: {e}")
+            return False
+
+    def save_article_scores(self, scores: List[tuple]) -> bool:
+        """
+        Store the digest scores of scored articles.
+        :param scores: (article_hash, score) tuples.
+        """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
+                cursor.executemany('''
+                    INSERT INTO article_scores (article_hash, score, scored_at)
+                    VALUES (?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT(article_hash) DO UPDATE SET
+                        score = excluded.score,
+                        scored_at = excluded.scored_at
+                ''', scores)
+                conn.commit()
+                return True
 
-                # Total articles
-                cursor.execute('SELECT COUNT(*) FROM articles')
-                total_articles = cursor.fetchone()[0]
+        except sqlite3.Error as e:
+            self.logger.error(f"Error saving article scores: {e}")
+            return False
 
-                # Articles by category
-                cursor.execute('SELECT category, COUNT(*) FROM articles GROUP BY category')
-                by_category = dict(cursor.fetchall())
+    def get_article_scores(self, days: int | None = None) -> List[Dict]:
+        """
+        Get gate decisions and scores together with the title and summary of their article.
+        :param days: Only articles gated or scored within this many days, None for all.
+        """
+        where = ''
+        params = []
+        if days is not None:
+            where = "WHERE COALESCE(s.scored_at, s.gated_at) >= datetime('now', ?)"
+            params.append(f'-{days} days')
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = sqlite3.Row
+                cursor.execute(f'''
+                    SELECT s.article_hash, a.title, a.summary, s.gate_probability, s.gate_passed, s.audited, s.score
+                    FROM article_scores s JOIN articles a ON a.hash = s.article_hash
+                    {where}
+                    ORDER BY s.article_hash
+                ''', params)
+                return [dict(row) for row in cursor.fetchall()]
 
-                # Articles by source
-                cursor.execute('SELECT source, COUNT(*) FROM articles GROUP BY source')
-                by_source = dict(cursor.fetchall())
+        except sqlite3.Error as e:
+            self.logger.error(f"Error fetching article scores: {e}")
+            return []
 
-                # Latest article date
+    def get_article_stats(self) -> Dict:
+        """
+        Get database statistics.
+        Counts come from the article_stats table, so the cost depends on the number of categories and sources,
+        not on the number of articles.
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute('SELECT dimension, key, count FROM article_stats')
+                total_articles = 0
+                by_category = {}
+                by_source = {}
+                for dimension, key, count in cursor.fetchall():
+                    if dimension == 'total':
+                        total_articles = count
+                    elif dimension == 'category':
+                        by_category[key] = count
+                    elif dimension == 'source':
+                        by_source[key] = count
+
+                # Latest article date, a single seek on idx_articles_created
                 cursor.execute('SELECT MAX(created_at) FROM articles')
                 latest_date = cursor.fetchone()[0]
 
@@ -213,28 +741,114 @@ class DBManager:
             self.logger.error(f"Error getting statistics: {e}")
             return {}
 
-    def cleanup_old_articles(self, days_old: int = 30) -> int:
-        """Remove articles older than specified days, return count deleted"""
+    def rebuild_article_stats(self) -> bool:
+        """Recount article_stats from the articles table, for when the counters have drifted"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
-
+                cursor.execute('DELETE FROM article_stats')
                 cursor.execute('''
-                    DELETE FROM articles
-                    WHERE created_at < datetime('now', '-' || ? || ' days')
-                ''', (days_old,))
-
-                deleted_count = cursor.rowcount
+                    INSERT INTO article_stats (dimension, key, count)
+                    SELECT 'total', '', COUNT(*) FROM articles
+                ''')
+                cursor.execute('''
+                    INSERT INTO article_stats (dimension, key, count)
+                    SELECT 'category', category, COUNT(*) FROM articles GROUP BY category
+                ''')
+                cursor.execute('''
+                    INSERT INTO article_stats (dimension, key, count)
+                    SELECT 'source', source, COUNT(*) FROM articles GROUP BY source
+                ''')
                 conn.commit()
+                self.logger.info("Article statistics rebuilt")
+                return True
+
+        except sqlite3.Error as e:
+            self.logger.error(f"Error rebuilding statistics: {e}")
+            return False
 
-                if deleted_count > 0:
-                    self.logger.info(f"Cleaned up {deleted_count} articles older than {days_old} days")
+    def cleanup_old_articles(self, days_old: int = 30, batch_size: int = 1000, pause: float = 0.05) -> int:
+        """
+        Remove articles older than specified days, return count deleted.
+        Deletes in batches of `batch_size` rows, each in its own short transaction, sleeping `pause` seconds
+        in between so that other connections can take the write lock. Freed pages are then returned to the
+        file system with an incremental vacuum. The run is summarized in self.last_cleanup_report.
+        """
+        start = time.monotonic()
+        deleted_count = 0
+        batches = 0
 
-                return deleted_count
+        try:
+            conn = self._connect()
+            page_count_before = conn.execute('PRAGMA page_count').fetchone()[0]
+            cutoff = conn.execute("SELECT datetime('now', '-' || ? || ' days')", (days_old,)).fetchone()[0]
+
+            while True:
+                with conn:
+                    cursor = conn.cursor()
+                    cursor.execute('''
+                        DELETE FROM articles
+                        WHERE id IN (
+                            SELECT id FROM articles
+                            WHERE created_at < ?
+                            LIMIT ?
+                        )
+                    ''', (cutoff, batch_size))
+                    batch_count = cursor.rowcount
+
+                deleted_count += batch_count
+                batches += 1
+                if batch_count < batch_size:
+                    break
+                time.sleep(pause)
+
+            if self.get_auto_vacuum_mode() == 'incremental':
+                # sqlite3 steps a row-less PRAGMA only once (one page); executescript runs it to completion
+                conn.executescript('PRAGMA incremental_vacuum;')
+            elif deleted_count > 0:
+                self.logger.info("auto_vacuum is not INCREMENTAL, freed pages are kept for reuse; "
+                                 "run enable_incremental_vacuum() once to return them to the file system")
+            page_count_after = conn.execute('PRAGMA page_count').fetchone()[0]
 
         except sqlite3.Error as e:
             self.logger.error(f"Error cleaning up old articles: {e}")
-            return 0
+            return deleted_count
+
+        elapsed = time.monotonic() - start
+        self.last_cleanup_report = {
+            'deleted': deleted_count,
+            'batches': batches,
+            'seconds': round(elapsed, 3),
+            'rows_per_second': round(deleted_count / elapsed, 1) if elapsed > 0 else 0.0,
+            'pages_freed': page_count_before - page_count_after
+        }
+
+        if deleted_count > 0:
+            self.logger.info(f"Cleaned up {deleted_count} articles older than {days_old} days: "
+                             f"{self.last_cleanup_report}")
+
+        return deleted_count
+
+    def get_auto_vacuum_mode(self) -> str:
+        """Get the auto_vacuum mode of the database: 'none', 'full' or 'incremental'"""
+        mode = self._connect().execute('PRAGMA auto_vacuum').fetchone()[0]
+        return {0: 'none', 1: 'full', 2: 'incremental'}.get(mode, str(mode))
+
+    def enable_incremental_vacuum(self) -> bool:
+        """
+        Switch an existing database to auto_vacuum=INCREMENTAL.
+        Needs a full VACUUM, which rewrites the whole file - run it once, off-line.
+        """
+        try:
+            conn = self._connect()
+            conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            conn.execute('VACUUM')
+            self.logger.info(f"auto_vacuum is now {self.get_auto_vacuum_mode()}")
+            return self.get_auto_vacuum_mode() == 'incremental'
+
+        except sqlite3.Error as e:
+            self.logger.error(f"Error enabling incremental vacuum: {e}")
+            return False
 
 # Simple unit test
 if __name__ == "__main__":
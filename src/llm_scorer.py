@@ -1,34 +1,1052 @@
 import os
+import re
+import json
+import hashlib
+import time
+import random
+import shutil
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Optional
+
+import openai
 from openai import OpenAI
 
 import src.prompt
 
+# Token budget of the document part of one request. The prompt and the answer need room in the context
+# window too; ANALYSIS_PROMPT is ~3k tokens and EVENT_TEXT may be long.
+DEFAULT_MAX_DOC_TOKENS = 24000
+
+# RATE keys that describe the whole document rather than its strongest part, averaged over chunks
+AVERAGED_RATES = {"内容准确率"}
+LIST_FIELDS = ("TIME", "LOCATION", "PEOPLE", "ORGANIZATION")
+FIRST_VALUE_FIELDS = ("UUID", "INFORMANT", "PUB_TIME")
+BEST_CHUNK_FIELDS = ("EVENT_TITLE", "EVENT_BRIEF", "IMPACT", "TIPS")
+
+# Output format of ANALYSIS_PROMPT
+RATE_KEYS = ("技术创新", "系统架构", "安全技术", "开发效率", "性能优化", "行业影响", "其它技术价值",
+             "内容准确率", "实践指导价值", "潜在发展影响")
+REQUIRED_TEXT_FIELDS = ("EVENT_TITLE", "EVENT_BRIEF", "EVENT_TEXT")
+OPTIONAL_TEXT_FIELDS = ("INFORMANT", "IMPACT", "TIPS")
+
+REPAIR_PROMPT = '''下面是一个应为JSON对象的回答，但它存在以下问题：
+{errors}
+
+请只修正这些问题，保留其余内容不变，只输出修正后的完整JSON对象，不要输出任何其它文字。
+字段要求：EVENT_TITLE、EVENT_BRIEF、EVENT_TEXT 为非空字符串；TIME、LOCATION、PEOPLE、ORGANIZATION 为列表；
+RATE 为对象，包含 {rate_keys}，每项为0-10的数字。
+
+回答：
+{output}
+'''
+
+BATCH_PROMPT = '''以下是{count}篇互不相关的文档，每篇以 Document ID 开头。请按系统提示中的规则分别处理每一篇文档。
+只输出一个JSON对象：键为 Document ID，值为该文档按输出要求生成的JSON对象（无技术价值的文档同样只输出UUID）。
+必须包含全部 Document ID：{doc_ids}。不要输出任何其它文字。
+
+{documents}'''
+
+# Documents packed into one request at most, see LLMScorer.score_many
+DEFAULT_MAX_BATCH_DOCS = 8
+
+# Offline scoring through the provider's batch API, see LLMScorer.score_offline
+DEFAULT_BATCH_DIR = 'data/batch'
+BATCH_FINAL_STATUSES = {'completed', 'failed', 'expired', 'cancelled'}
+
+# HTTP status codes worth another attempt
+RETRYABLE_STATUS = {408, 409, 429}
+
+_CJK = re.compile(r'[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]')
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count without a tokenizer: ~1 token per CJK character, ~4 characters per token otherwise.
+    Errs on the high side, which is the safe side for a budget.
+    """
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def split_into_chunks(text: str, max_tokens: int) -> List[str]:
+    """
+    Split a Markdown document into chunks of at most max_tokens (estimated), at paragraph boundaries where
+    possible, then at line boundaries, then anywhere.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+
+    pieces = []
+    for paragraph in text.split('\n\n'):
+        if estimate_tokens(paragraph) <= max_tokens:
+            pieces.append(paragraph)
+            continue
+        for line in paragraph.split('\n'):
+            while estimate_tokens(line) > max_tokens:
+                # a character is at most one token, so this prefix fits
+                pieces.append(line[:max_tokens])
+                line = line[max_tokens:]
+            pieces.append(line)
+
+    chunks, current, current_tokens = [], [], 0
+    for piece in pieces:
+        tokens = estimate_tokens(piece) + 1
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append('\n\n'.join(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += tokens
+    if current:
+        chunks.append('\n\n'.join(current))
+    return chunks
+
+
+def extract_json(output: str) -> Optional[Dict]:
+    """
+    The JSON object of a model answer, tolerating what models wrap around it:
+    a ```json / ``` fence or none, text before and after the object, and trailing commas.
+    Decoding starts after the opening fence and stops at the end of the object, not at the next ```,
+    which may be a code snippet inside a string value.
+    :return: The object, None when no JSON object can be read.
+    """
+    if not output:
+        return None
+    text = output.strip()
+    fence = re.search(r'```(?:json)?\s*', text)
+    if fence and '{' in text[fence.end():]:
+        text = text[fence.end():]
+
+    decoder = json.JSONDecoder()
+    start = text.find('{')
+    while start >= 0:
+        for candidate in (text[start:], re.sub(r',\s*([}\]])', r'\1', text[start:])):
+            try:
+                data, _ = decoder.raw_decode(candidate)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(data, dict):
+                return data
+        start = text.find('{', start + 1)
+    return None
+
+
+def validate_result(data: Dict) -> List[str]:
+    """
+    Check an answer against the output format of ANALYSIS_PROMPT, normalising it in place:
+    missing list / text fields get empty values and numeric strings in RATE become numbers.
+    An answer with only UUID (no technical value) is valid as is.
+    :return: The problems found, empty when the answer is valid.
+    """
+    if "UUID" in data and set(data) <= {"UUID"}:
+        return []
+
+    errors = []
+    for field in REQUIRED_TEXT_FIELDS:
+        if not isinstance(data.get(field), str) or not data[field].strip():
+            errors.append(f'{field} must be a non-empty string')
+    for field in OPTIONAL_TEXT_FIELDS:
+        if data.get(field) is None:
+            data[field] = ""
+        elif not isinstance(data[field], str):
+            errors.append(f'{field} must be a string')
+    if data.get("PUB_TIME") is not None and not isinstance(data["PUB_TIME"], str):
+        errors.append('PUB_TIME must be a string or null')
+    for field in LIST_FIELDS:
+        if data.get(field) is None:
+            data[field] = []
+        elif not isinstance(data[field], list):
+            errors.append(f'{field} must be a list')
+
+    rate = data.get("RATE")
+    if not isinstance(rate, dict):
+        errors.append(f'RATE must be an object with the keys {", ".join(RATE_KEYS)}')
+        return errors
+    for key in RATE_KEYS:
+        value = rate.get(key)
+        if isinstance(value, str):
+            try:
+                value = rate[key] = float(value) if '.' in value else int(value)
+            except ValueError:
+                pass
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            errors.append(f'RATE.{key} must be a number from 0 to 10')
+        elif not 0 <= value <= 10:
+            errors.append(f'RATE.{key} is {value}, must be from 0 to 10')
+    return errors
+
+
+def _rate_max(result: Dict) -> float:
+    rates = [value for value in result.get("RATE", {}).values() if isinstance(value, (int, float))]
+    return max(rates, default=0)
+
+
+def merge_results(results: List[Dict]) -> Dict:
+    """
+    Reduce the answers for the chunks of one document to one answer.
+    - RATE: the highest score per category over the chunks, except AVERAGED_RATES which are averaged
+    - EVENT_TEXT: the chunk texts in document order
+    - TIME / LOCATION / PEOPLE / ORGANIZATION: union, in order of appearance
+    - title, brief, impact and tips: from the chunk with the highest score
+    Chunks judged without technical value (no RATE) are left out; if all are, the first answer is returned.
+    """
+    rated = [result for result in results if isinstance(result.get("RATE"), dict)]
+    if not rated:
+        return results[0] if results else {}
+
+    merged = {}
+    for field in FIRST_VALUE_FIELDS:
+        merged[field] = next((result[field] for result in results if result.get(field)), None)
+
+    for field in LIST_FIELDS:
+        values = []
+        for result in rated:
+            for value in result.get(field) or []:
+                if value not in values:
+                    values.append(value)
+        merged[field] = values
+
+    best = max(rated, key=_rate_max)
+    for field in BEST_CHUNK_FIELDS:
+        merged[field] = best.get(field, "")
+
+    merged["EVENT_TEXT"] = "\n\n".join(result["EVENT_TEXT"] for result in rated if result.get("EVENT_TEXT"))
+
+    rate = {}
+    for key in rated[0]["RATE"]:
+        values = [result["RATE"][key] for result in rated
+                  if isinstance(result["RATE"].get(key), (int, float))]
+        if not values:
+            continue
+        rate[key] = round(sum(values) / len(values)) if key in AVERAGED_RATES else max(values)
+    merged["RATE"] = rate
+    return merged
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Rate limits, server errors, timeouts and dropped connections are retried; other errors are not.
+    """
+    if isinstance(error, openai.APIConnectionError):  # includes APITimeoutError
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS or error.status_code >= 500
+    return False
+
+
+def rejects_json_mode(error: Exception) -> bool:
+    """
+    A 400 about response_format, as opposed to one about the context length or another parameter.
+    """
+    text = f'{error} {getattr(error, "body", "")}'.lower()
+    return any(marker in text for marker in ('response_format', 'json_object', 'json mode'))
+
+
+def prompt_hash() -> str:
+    """
+    Identifies the prompt of cached answers; changes whenever ANALYSIS_PROMPT is edited.
+    """
+    return hashlib.sha256(src.prompt.ANALYSIS_PROMPT.encode('utf-8')).hexdigest()
+
+
+def cached_prompt_tokens(counts) -> int:
+    """
+    Prompt tokens the provider served from its prompt cache, as reported in the usage of a response
+    (object, or dict in batch output files): prompt_cache_hit_tokens (DeepSeek) or
+    prompt_tokens_details.cached_tokens (OpenAI). 0 when not reported.
+    """
+    def field(obj, name):
+        return obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+
+    hit_tokens = field(counts, 'prompt_cache_hit_tokens')
+    if isinstance(hit_tokens, int):
+        return hit_tokens
+    cached = field(field(counts, 'prompt_tokens_details'), 'cached_tokens')
+    return cached if isinstance(cached, int) else 0
+
+
+def document_prompts(chunks: List[str]) -> List[str]:
+    """
+    User messages of a document split by split_into_chunks. The rubric goes out as the system message
+    (see LLMScorer._messages), the user message is only the document.
+    """
+    if len(chunks) == 1:
+        return [f"Document Content:\n{chunks[0]}"]
+    return [
+        f"Document Content (part {i + 1} of {len(chunks)} of a long document):\n{chunk}"
+        for i, chunk in enumerate(chunks)
+    ]
+
+
+def load_batch_state(job_dir: str = DEFAULT_BATCH_DIR) -> Optional[Dict]:
+    """
+    The offline scoring job pending in job_dir (see LLMScorer.score_offline), None when there is none.
+    """
+    try:
+        with open(os.path.join(job_dir, 'state.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
 class LLMScorer():
-    def __init__(self):
-        self.client = OpenAI(
-            api_key = os.environ.get('DEEPSEEK_API_KEY'),
-            base_url="https://api.deepseek.com"
+    def __init__(self, client=None, model: str = "deepseek-chat",
+                 max_doc_tokens: int = DEFAULT_MAX_DOC_TOKENS, chunk_workers: int = 4,
+                 api_key: Optional[str] = None, base_url: str = "https://api.deepseek.com",
+                 timeout: float = 120.0, max_retries: int = 4,
+                 backoff_base: float = 1.0, backoff_max: float = 30.0, cache=None, json_mode: bool = True):
+        """
+        :param client: OpenAI compatible client, None for a client of api_key / base_url.
+        :param max_doc_tokens: Documents above this estimate are split into chunks and scored map-reduce.
+        :param chunk_workers: Chunks of one document scored at the same time.
+        :param api_key: None for the DEEPSEEK_API_KEY environment variable.
+        :param timeout: Seconds one request may take.
+        :param max_retries: Further attempts after a retryable error (429, 5xx, timeout, connection).
+        :param backoff_base: Seconds before the first retry, doubled on every further retry (with jitter).
+        :param backoff_max: Upper bound of one backoff.
+        :param cache: DBManager whose llm_cache table keeps answers by (document hash, prompt hash, model),
+            None to always call the model.
+        :param json_mode: Ask for response_format json_object; turned off if the provider rejects it.
+        """
+        # retries are done here, with backoff that respects the batch deadline
+        self.client = client or OpenAI(
+            api_key = api_key or os.environ.get('DEEPSEEK_API_KEY'),
+            base_url=base_url,
+            max_retries=0
         )
+        self.model = model
+        self.max_doc_tokens = max_doc_tokens
+        self.chunk_workers = max(1, chunk_workers)
+        self.timeout = timeout
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.cache = cache
+        self.json_mode = json_mode
+        self.prompt_hash = prompt_hash()
+        self.logger = logging.getLogger(__name__)
+        self._usage_lock = threading.Lock()
+        self._cache_counts = {'hits': 0, 'misses': 0}
+        # bounds the requests in flight while score_many runs: chunks, repairs and batches of every document
+        # share it, so `concurrency` holds however the documents fan out
+        self._request_slots: Optional[threading.Semaphore] = None
 
-    def score(self, doc_path):
+        # doc_path -> {'chunks', 'doc_tokens_estimate', 'prompt_tokens', 'cached_prompt_tokens', 'completion_tokens',
+        #              'total_tokens', 'requests', 'retries', 'repairs', 'cached', 'calls'}
+        # calls: one {'prompt_tokens', 'cached_prompt_tokens', 'completion_tokens', 'seconds'} per completion
+        self.usage: Dict[str, Dict] = {}
+        # doc_path -> reason, for documents score_many could not score
+        self.failures: Dict[str, str] = {}
+        # usage of the multi-document requests, with 'documents' and 'answered'; their tokens are also
+        # shared out to the usage of each document by size
+        self.batch_usage: List[Dict] = []
+
+    def score_many(self, doc_paths: List[str], concurrency: int = 8, deadline_s: Optional[float] = None,
+                   batch_tokens: Optional[int] = None,
+                   max_batch_docs: int = DEFAULT_MAX_BATCH_DOCS) -> Dict[str, Optional[str]]:
+        """
+        Score many documents at the same time.
+        :param concurrency: Requests in flight at the same time, chunks of long documents included.
+        :param deadline_s: Seconds the whole batch may take, None for no limit. Documents not done by then
+            are given up: queued ones are not started, running ones stop retrying and their requests time out.
+        :param batch_tokens: Pack short documents into one request up to this many document tokens
+            (estimated), see score_batch. None scores every document on its own.
+        :param max_batch_docs: Documents in one request at most.
+        :return: doc_path -> answer (JSON text), None for documents that failed (the reason is in self.failures)
+            or had no content or no valid answer.
+        """
+        deadline = time.monotonic() + deadline_s if deadline_s is not None else None
+        results: Dict[str, Optional[str]] = {}
+        if batch_tokens:
+            units = self._plan_batches(doc_paths, batch_tokens, max_batch_docs)
+        else:
+            units = [[path] for path in doc_paths]
+
+        self._request_slots = threading.Semaphore(max(1, concurrency))
+        executor = ThreadPoolExecutor(max_workers=max(1, concurrency))
+        try:
+            futures = {executor.submit(self._score_unit, unit, deadline): unit for unit in units}
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            wait(futures, timeout=timeout)
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+            self._request_slots = None
+
+        for future, unit in futures.items():
+            if future.cancelled():
+                for path in unit:
+                    results[path] = None
+                    self.failures[path] = 'deadline exceeded before start'
+                continue
+            try:
+                unit_results = future.result()
+            except Exception as e:
+                unit_results = {}
+                for path in unit:
+                    self.failures[path] = f'{type(e).__name__}: {e}'
+                    self.logger.error(f"Cannot score {path}: {self.failures[path]}")
+            for path in unit:
+                results[path] = unit_results.get(path)
+                if results[path] is None and path not in self.failures:
+                    self.failures[path] = 'empty document or no valid answer'
+        return results
+
+    def score_batch(self, doc_paths: List[str], deadline: Optional[float] = None) -> Dict[str, Optional[str]]:
+        """
+        Score several short documents with one request: they share one copy of the rubric and one round trip.
+        The answer is a JSON object keyed by document id; documents missing from it or with an invalid
+        answer are scored again on their own. Cached documents are not sent.
+        :return: doc_path -> answer (JSON text) or None, like score.
+        """
+        results: Dict[str, Optional[str]] = {}
+        # document id -> (doc_path, content, usage, content_hash)
+        pending: Dict[str, tuple] = {}
+        for path in doc_paths:
+            with open(path, 'r', encoding='utf-8') as f:
+                doc_content = f.read()
+            if not doc_content:
+                results[path] = None
+                continue
+            usage = self._start_usage(path, doc_content, 1)
+            content_hash, cached = self._cached_output(doc_content, usage)
+            if cached is not None:
+                results[path] = cached
+                continue
+            pending[f'doc-{len(pending) + 1}'] = (path, doc_content, usage, content_hash)
+
+        fallback = list(pending)
+        if len(pending) > 1:
+            answers = self._complete_batch(pending, deadline)
+            fallback = []
+            for doc_id, (path, doc_content, usage, content_hash) in pending.items():
+                answer = answers.get(doc_id)
+                if not isinstance(answer, dict) or validate_result(answer):
+                    fallback.append(doc_id)
+                    continue
+                usage['batched'] = True
+                results[path] = self._store_output(answer, usage, content_hash)
+            if fallback:
+                self.logger.warning(f"{len(fallback)} of {len(pending)} documents missing or invalid in the batch "
+                                    f"answer, scoring them on their own")
+
+        for doc_id in fallback:
+            path, doc_content, usage, content_hash = pending[doc_id]
+            try:
+                results[path] = self._score_document(path, doc_content, usage, content_hash, deadline)
+            except Exception as e:
+                results[path] = None
+                self.failures[path] = f'{type(e).__name__}: {e}'
+                self.logger.error(f"Cannot score {path}: {self.failures[path]}")
+        return results
+
+    def score_offline(self, doc_paths: List[str], json_dir: str = 'data/pages/json/',
+                      job_dir: str = DEFAULT_BATCH_DIR, poll_interval: float = 60.0,
+                      max_wait_s: Optional[float] = None, fallback_online: bool = True, concurrency: int = 8,
+                      fallback_deadline_s: Optional[float] = None) -> Dict[str, Optional[str]]:
+        """
+        Score documents through the provider's batch API (OpenAI compatible /v1/files and /v1/batches):
+        cheaper and outside the rate limits, but the answers may take up to 24 hours. Every answer is written
+        to json_dir as <document name>.json when the batch is collected.
+
+        The job, with a copy of every document, is kept in job_dir from before the upload until its answers are
+        written, so a run that is interrupted, or that stops waiting after max_wait_s, picks the same batch up on
+        the next call instead of submitting it again, even when the documents themselves are gone by then.
+        Documents of a new call are only submitted once the earlier job is collected.
+        :param poll_interval: Seconds between status checks of the batch.
+        :param max_wait_s: Seconds to wait for the batch, None to wait until it is done.
+        :param fallback_online: Score documents without a valid answer in the batch with normal requests,
+            through score_many.
+        :param concurrency: Requests in flight of the online fallback.
+        :param fallback_deadline_s: Seconds the online fallback may take, None for no limit.
+        :return: doc_path -> answer (JSON text), None for documents not scored (yet). Answers of a resumed
+            job are included too.
+        """
+        deadline = time.monotonic() + max_wait_s if max_wait_s is not None else None
+        fallback = {'enabled': fallback_online, 'concurrency': concurrency, 'deadline_s': fallback_deadline_s}
+        results: Dict[str, Optional[str]] = {}
+
+        state = load_batch_state(job_dir)
+        if state is not None:
+            self.logger.info(f"Resuming batch job {state.get('batch_id') or '(not submitted)'} "
+                             f"of {len(state['documents'])} documents")
+            results.update(self._run_batch_job(state, json_dir, job_dir, poll_interval, deadline, fallback))
+
+        remaining = [path for path in doc_paths if path not in results]
+        if remaining and load_batch_state(job_dir) is None:
+            state, cached = self._prepare_batch_job(remaining, json_dir, job_dir)
+            results.update(cached)
+            if state is not None:
+                results.update(self._run_batch_job(state, json_dir, job_dir, poll_interval, deadline, fallback))
+
+        for path in doc_paths:
+            results.setdefault(path, None)
+        return results
+
+    def score(self, doc_path, deadline: Optional[float] = None) -> Optional[str]:
+        """
+        :param deadline: time.monotonic() value after which no request or retry is started.
+        :return: The answer as JSON text, validated against the output format of ANALYSIS_PROMPT;
+            None for an empty document or an answer that could not be repaired.
+        """
 
         # read doc
         with open(doc_path, 'r', encoding='utf-8') as f:
             doc_content = f.read()
 
         if not doc_content:
-            return "NO DOC"
+            return None
+
+        usage = self._start_usage(doc_path, doc_content, len(split_into_chunks(doc_content, self.max_doc_tokens)))
+        content_hash, output = self._cached_output(doc_content, usage)
+        if output is not None:
+            return output
+        return self._score_document(doc_path, doc_content, usage, content_hash, deadline)
 
-        full_prompt = f"{src.prompt.ANALYSIS_PROMPT}\n\n Document Content:\n{doc_content}"
+    def _start_usage(self, doc_path: str, doc_content: str, chunks: int) -> Dict:
+        """
+        Helper: a new usage record of doc_path
+        """
+        usage = {
+            'chunks': chunks,
+            'doc_tokens_estimate': estimate_tokens(doc_content),
+            'prompt_tokens': 0,
+            'cached_prompt_tokens': 0,
+            'completion_tokens': 0,
+            'total_tokens': 0,
+            'requests': 0,
+            'retries': 0,
+            'repairs': 0,
+            'cached': False,
+            'batched': False,
+            'offline': False,
+            'calls': [],
+        }
+        with self._usage_lock:
+            self.usage[doc_path] = usage
+        return usage
 
-        response = self.client.chat.completions.create(
-            model="deepseek-chat",
-            messages = [
-                {"role": "user", "content": full_prompt}
-            ]
+    def _cached_output(self, doc_content: str, usage: Dict) -> tuple:
+        """
+        Helper: look the document up in the answer cache
+        :return: (content hash, cached answer or None); the hash is None without a cache.
+        """
+        if self.cache is None:
+            return None, None
+        content_hash = hashlib.sha256(doc_content.encode('utf-8')).hexdigest()
+        cached = self.cache.get_llm_result(content_hash, self.prompt_hash, self.model)
+        result = extract_json(cached) if cached is not None else None
+        valid = result is not None and not validate_result(result)
+        with self._usage_lock:
+            self._cache_counts['hits' if valid else 'misses'] += 1
+        if not valid:
+            # an invalid entry is scored again and overwritten, it does not count as a hit
+            return content_hash, None
+        self.cache.record_llm_hit(content_hash, self.prompt_hash, self.model)
+        usage['cached'] = True
+        return content_hash, json.dumps(result, ensure_ascii=False, indent=2)
+
+    def _score_document(self, doc_path: str, doc_content: str, usage: Dict, content_hash: Optional[str],
+                        deadline: Optional[float]) -> Optional[str]:
+        """
+        Helper: score one document that was not cached, and cache the answer
+        """
+        chunks = split_into_chunks(doc_content, self.max_doc_tokens)
+        result = self._score_chunks(doc_path, doc_content, chunks, usage, deadline)
+        if result is None:
+            return None
+        return self._store_output(result, usage, content_hash)
+
+    def _store_output(self, result: Dict, usage: Dict, content_hash: Optional[str], model: Optional[str] = None,
+                      prompt_hash: Optional[str] = None) -> str:
+        """
+        Helper: a validated answer as JSON text, saved to the cache when there is one
+        :param model: Model and prompt hash the answer was made with, when not the current ones (batch jobs).
+        """
+        output = json.dumps(result, ensure_ascii=False, indent=2)
+        if self.cache is not None and content_hash is not None:
+            self.cache.save_llm_result(content_hash, prompt_hash or self.prompt_hash, model or self.model, output,
+                                       usage['prompt_tokens'], usage['completion_tokens'])
+        return output
+
+    def _plan_batches(self, doc_paths: List[str], batch_tokens: int, max_batch_docs: int) -> List[List[str]]:
+        """
+        Helper: pack short documents, in order, into groups of at most batch_tokens (estimated) and
+        max_batch_docs documents. A document above half the budget is scored on its own.
+        """
+        limit = min(batch_tokens // 2, self.max_doc_tokens)
+        units, batch, batch_size = [], [], 0
+        for path in doc_paths:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    tokens = estimate_tokens(f.read())
+            except OSError:
+                tokens = None
+            if tokens is None or tokens > limit:
+                units.append([path])
+                continue
+            if batch and (batch_size + tokens > batch_tokens or len(batch) >= max_batch_docs):
+                units.append(batch)
+                batch, batch_size = [], 0
+            batch.append(path)
+            batch_size += tokens
+        if batch:
+            units.append(batch)
+        return units
+
+    def _score_unit(self, doc_paths: List[str], deadline: Optional[float]) -> Dict[str, Optional[str]]:
+        """
+        Helper: one task of score_many, a single document or a batch
+        """
+        if len(doc_paths) == 1:
+            return {doc_paths[0]: self.score(doc_paths[0], deadline)}
+        return self.score_batch(doc_paths, deadline)
+
+    def _complete_batch(self, pending: Dict[str, tuple], deadline: Optional[float]) -> Dict:
+        """
+        Helper: the multi-document request of score_batch. Its tokens are shared out to the documents by size.
+        :return: The answer object (document id -> answer), empty when the request failed or was unreadable.
+        """
+        documents = '\n\n'.join(
+            f"Document ID: {doc_id}\nDocument Content:\n{doc_content}"
+            for doc_id, (_, doc_content, _, _) in pending.items()
         )
+        prompt = BATCH_PROMPT.format(count=len(pending), doc_ids=', '.join(pending), documents=documents)
+        batch_usage = self._start_batch_usage(len(pending))
+        try:
+            answers = extract_json(self._complete(prompt, batch_usage, deadline)) or {}
+        except Exception as e:
+            self.logger.warning(f"Batch request of {len(pending)} documents failed ({type(e).__name__}: {e})")
+            answers = {}
+        batch_usage['answered'] = sum(1 for doc_id in pending if isinstance(answers.get(doc_id), dict))
+
+        sizes = {doc_id: estimate_tokens(doc_content) for doc_id, (_, doc_content, _, _) in pending.items()}
+        total = sum(sizes.values()) or 1
+        with self._usage_lock:
+            for doc_id, (_, _, usage, _) in pending.items():
+                share = sizes[doc_id] / total
+                for key in ('prompt_tokens', 'cached_prompt_tokens', 'completion_tokens', 'total_tokens'):
+                    usage[key] += round(batch_usage[key] * share)
+        return answers
+
+    def _prepare_batch_job(self, doc_paths: List[str], json_dir: str, job_dir: str) -> tuple:
+        """
+        Helper: write the requests of score_offline to job_dir/requests.jsonl, a copy of every document to
+        job_dir/documents/ (the input of the online fallback) and the job to job_dir/state.json.
+        Cached documents are written to json_dir right away instead.
+        :return: (job state or None when there is nothing to submit, doc_path -> answer of cached documents)
+        """
+        os.makedirs(os.path.join(job_dir, 'documents'), exist_ok=True)
+        results: Dict[str, Optional[str]] = {}
+        documents: Dict[str, Dict] = {}
+        requests: Dict[str, List] = {}
+        response_format = {'response_format': {'type': 'json_object'}} if self.json_mode else {}
+
+        with open(os.path.join(job_dir, 'requests.jsonl'), 'w', encoding='utf-8') as f:
+            for path in doc_paths:
+                with open(path, 'r', encoding='utf-8') as doc:
+                    doc_content = doc.read()
+                if not doc_content:
+                    results[path] = None
+                    continue
+                chunks = split_into_chunks(doc_content, self.max_doc_tokens)
+                usage = self._start_usage(path, doc_content, len(chunks))
+                content_hash, cached = self._cached_output(doc_content, usage)
+                if cached is not None:
+                    self._write_answer(path, cached, json_dir)
+                    results[path] = cached
+                    continue
+
+                input_path = os.path.join(job_dir, 'documents', f'doc-{len(documents) + 1}.md')
+                with open(input_path, 'w', encoding='utf-8') as copy:
+                    copy.write(doc_content)
+                documents[path] = {
+                    'input': input_path,
+                    'content_hash': content_hash,
+                    'parts': len(chunks),
+                    'doc_tokens_estimate': usage['doc_tokens_estimate'],
+                }
+                for part, prompt in enumerate(document_prompts(chunks)):
+                    custom_id = f'doc-{len(documents)}-part-{part + 1}'
+                    requests[custom_id] = [path, part]
+                    f.write(json.dumps({
+                        'custom_id': custom_id,
+                        'method': 'POST',
+                        'url': '/v1/chat/completions',
+                        'body': {'model': self.model, 'messages': self._messages(prompt), **response_format},
+                    }, ensure_ascii=False) + '\n')
+
+        if not documents:
+            self._remove_batch_job(job_dir)
+            return None, results
+        state = {
+            'model': self.model,
+            'prompt_hash': self.prompt_hash,
+            'documents': documents,
+            'requests': requests,
+            'input_file_id': None,
+            'batch_id': None,
+        }
+        self._save_batch_state(job_dir, state)
+        self.logger.info(f"Prepared batch job of {len(requests)} requests for {len(documents)} documents")
+        return state, results
+
+    def _run_batch_job(self, state: Dict, json_dir: str, job_dir: str, poll_interval: float,
+                       deadline: Optional[float], fallback: Dict) -> Dict[str, Optional[str]]:
+        """
+        Helper: upload, submit, wait for and collect a prepared job; each step is saved in the state first.
+        :return: doc_path -> answer, empty when the batch is not done by the deadline (the job is kept).
+        """
+        if state['input_file_id'] is None:
+            with open(os.path.join(job_dir, 'requests.jsonl'), 'rb') as f:
+                state['input_file_id'] = self.client.files.create(file=f, purpose='batch').id
+            self._save_batch_state(job_dir, state)
+        if state['batch_id'] is None:
+            batch = self.client.batches.create(
+                input_file_id=state['input_file_id'],
+                endpoint='/v1/chat/completions',
+                completion_window='24h'
+            )
+            state['batch_id'] = batch.id
+            self._save_batch_state(job_dir, state)
+            self.logger.info(f"Submitted batch {batch.id}")
+
+        while True:
+            batch = self.client.batches.retrieve(state['batch_id'])
+            if batch.status in BATCH_FINAL_STATUSES:
+                break
+            if deadline is not None and time.monotonic() + poll_interval > deadline:
+                self.logger.info(f"Batch {batch.id} is {batch.status}, run again to collect it")
+                return {}
+            time.sleep(poll_interval)
+
+        if batch.status != 'completed':
+            self.logger.warning(f"Batch {batch.id} ended as {batch.status}")
+        # custom_id -> chat completion body; failed requests are only in the error file and stay missing
+        bodies = {}
+        if getattr(batch, 'output_file_id', None):
+            for line in self.client.files.content(batch.output_file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                response = record.get('response') or {}
+                if response.get('status_code') == 200:
+                    bodies[record['custom_id']] = response.get('body') or {}
+
+        results = self._collect_batch_answers(state, bodies, json_dir, fallback)
+        self._remove_batch_job(job_dir)
+        return results
+
+    @staticmethod
+    def _remove_batch_job(job_dir: str):
+        for name in ('state.json', 'requests.jsonl'):
+            try:
+                os.remove(os.path.join(job_dir, name))
+            except FileNotFoundError:
+                pass
+        shutil.rmtree(os.path.join(job_dir, 'documents'), ignore_errors=True)
+
+    def _collect_batch_answers(self, state: Dict, bodies: Dict[str, Dict], json_dir: str,
+                               fallback: Dict) -> Dict[str, Optional[str]]:
+        """
+        Helper: validate and merge the answers of every document of a batch job, score the unanswered ones
+        online, and write them to json_dir. Batch answers are cached under the model and prompt of the job.
+        """
+        # doc_path -> valid answers of its parts
+        answers: Dict[str, List[Dict]] = {path: [] for path in state['documents']}
+        for custom_id, (path, _) in state['requests'].items():
+            usage = self.usage.get(path)
+            if usage is None:
+                document = state['documents'][path]
+                usage = self._start_usage(path, '', document['parts'])
+                usage['doc_tokens_estimate'] = document['doc_tokens_estimate']
+            usage['offline'] = True
+
+            body = bodies.get(custom_id)
+            if body is None:
+                continue
+            counts = body.get('usage') or {}
+            prompt_tokens = counts.get('prompt_tokens', 0)
+            completion_tokens = counts.get('completion_tokens', 0)
+            usage['requests'] += 1
+            usage['prompt_tokens'] += prompt_tokens
+            usage['cached_prompt_tokens'] += cached_prompt_tokens(counts)
+            usage['completion_tokens'] += completion_tokens
+            usage['total_tokens'] += prompt_tokens + completion_tokens
+
+            choices = body.get('choices') or [{}]
+            result = extract_json((choices[0].get('message') or {}).get('content'))
+            if result is not None and not validate_result(result):
+                answers[path].append(result)
+
+        results: Dict[str, Optional[str]] = {}
+        # copy of the document -> doc_path, for the online fallback
+        unanswered: Dict[str, str] = {}
+        for path, document in state['documents'].items():
+            parsed = answers[path]
+            if not parsed:
+                unanswered[document['input']] = path
+                continue
+            result = parsed[0] if document['parts'] == 1 else merge_results(parsed)
+            results[path] = self._store_output(result, self.usage[path], document['content_hash'],
+                                               state['model'], state['prompt_hash'])
+        self.logger.info(f"Collected batch {state['batch_id']}: {len(results)} of {len(answers)} documents answered")
+
+        if unanswered and fallback['enabled']:
+            outputs = self.score_many(list(unanswered), concurrency=fallback['concurrency'],
+                                      deadline_s=fallback['deadline_s'])
+            for input_path, path in unanswered.items():
+                results[path] = outputs[input_path]
+                self._merge_usage(self.usage[path], self.usage.pop(input_path, None))
+                if input_path in self.failures:
+                    self.failures[path] = self.failures.pop(input_path)
+        else:
+            for path in unanswered.values():
+                results[path] = None
+                self.failures[path] = 'no valid answer in the batch'
+
+        for path, output in results.items():
+            if output is not None:
+                self._write_answer(path, output, json_dir)
+        return results
+
+    @staticmethod
+    def _merge_usage(usage: Dict, other: Optional[Dict]):
+        """
+        Helper: add the usage of the online fallback of a document to its batch usage
+        """
+        if other is None:
+            return
+        for key in ('prompt_tokens', 'cached_prompt_tokens', 'completion_tokens', 'total_tokens', 'requests',
+                    'retries', 'repairs'):
+            usage[key] += other[key]
+        usage['calls'].extend(other['calls'])
+        usage['cached'] = usage['cached'] or other['cached']
+
+    @staticmethod
+    def _write_answer(doc_path: str, output: str, json_dir: str):
+        os.makedirs(json_dir, exist_ok=True)
+        name = os.path.splitext(os.path.basename(doc_path))[0]
+        with open(os.path.join(json_dir, name + '.json'), 'w', encoding='utf-8') as f:
+            f.write(output)
+
+    @staticmethod
+    def _save_batch_state(job_dir: str, state: Dict):
+        """
+        Helper: replace job_dir/state.json atomically, an interrupted write must not lose the batch id
+        """
+        path = os.path.join(job_dir, 'state.json')
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        os.replace(path + '.tmp', path)
+
+    def _start_batch_usage(self, documents: int) -> Dict:
+        """
+        Helper: a new usage record of a multi-document request
+        """
+        usage = {
+            'documents': documents,
+            'answered': 0,
+            'prompt_tokens': 0,
+            'cached_prompt_tokens': 0,
+            'completion_tokens': 0,
+            'total_tokens': 0,
+            'requests': 0,
+            'retries': 0,
+            'calls': [],
+        }
+        with self._usage_lock:
+            self.batch_usage.append(usage)
+        return usage
+
+    def cache_stats(self) -> Dict:
+        """
+        Cache hits and misses of this scorer, and the hit rate.
+        """
+        with self._usage_lock:
+            stats = dict(self._cache_counts)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        return stats
+
+    def prompt_cache_stats(self) -> Dict:
+        """
+        Provider prompt cache use over all completions of this scorer: prompt tokens, the share served from
+        the cache, and the mean latency of completions with and without a cache hit.
+        """
+        with self._usage_lock:
+            calls = [call for usage in list(self.usage.values()) + self.batch_usage for call in usage['calls']]
+        prompt_tokens = sum(call['prompt_tokens'] for call in calls)
+        cached_tokens = sum(call['cached_prompt_tokens'] for call in calls)
+        hits = [call['seconds'] for call in calls if call['cached_prompt_tokens']]
+        misses = [call['seconds'] for call in calls if not call['cached_prompt_tokens']]
+        return {
+            'calls': len(calls),
+            'prompt_tokens': prompt_tokens,
+            'cached_prompt_tokens': cached_tokens,
+            'cached_share': round(cached_tokens / prompt_tokens, 3) if prompt_tokens else 0.0,
+            'avg_seconds_cache_hit': round(sum(hits) / len(hits), 3) if hits else None,
+            'avg_seconds_cache_miss': round(sum(misses) / len(misses), 3) if misses else None,
+        }
+
+    def _score_chunks(self, doc_path: str, doc_content: str, chunks: List[str], usage: Dict,
+                      deadline: Optional[float]) -> Optional[Dict]:
+        """
+        Helper: one call for a short document, map-reduce over the chunks of a long one
+        """
+        prompts = document_prompts(chunks)
+        if len(chunks) == 1:
+            return self._complete_structured(prompts[0], usage, deadline)
+
+        # map: score every chunk on its own
+        with ThreadPoolExecutor(max_workers=min(self.chunk_workers, len(chunks))) as executor:
+            results = list(executor.map(lambda prompt: self._complete_structured(prompt, usage, deadline), prompts))
+
+        # reduce: merge the partial answers into one
+        parsed = [result for result in results if result is not None]
+        self.logger.info(f"Scored {doc_path} in {len(chunks)} chunks, {len(parsed)} valid answers, "
+                         f"{usage['total_tokens']} tokens")
+        if not parsed:
+            return None
+        return merge_results(parsed)
+
+    def _complete_structured(self, prompt: str, usage: Dict, deadline: Optional[float]) -> Optional[Dict]:
+        """
+        Helper: a completion read as a validated answer. An answer that fails validation is sent back once
+        with the list of problems - much cheaper than scoring the document again.
+        :return: The answer, None when it could not be repaired.
+        """
+        output = self._complete(prompt, usage, deadline)
+        result = extract_json(output)
+        errors = validate_result(result) if result is not None else ['the answer is not a JSON object']
+        if not errors:
+            return result
+        if not output or not output.strip():
+            self.logger.error("LLM returned an empty answer")
+            return None
+
+        self.logger.warning(f"Invalid LLM answer, asking for a repair: {'; '.join(errors)}")
+        with self._usage_lock:
+            usage['repairs'] += 1
+        repair_prompt = REPAIR_PROMPT.format(
+            errors='\n'.join(f'- {error}' for error in errors),
+            rate_keys='、'.join(RATE_KEYS),
+            output=output
+        )
+        result = extract_json(self._complete(repair_prompt, usage, deadline))
+        if result is not None and not validate_result(result):
+            return result
+
+        self.logger.error(f"LLM answer still invalid after repair: {'; '.join(errors)}")
+        return None
+
+    @staticmethod
+    def _messages(prompt: str) -> List[Dict]:
+        """
+        Helper: ANALYSIS_PROMPT as the system message, byte-identical on every request, and `prompt` as the
+        user message after it: providers cache the longest common prefix of requests, so the ~3k tokens of
+        rubric are billed and processed as cache hits after the first request.
+        """
+        return [
+            {"role": "system", "content": src.prompt.ANALYSIS_PROMPT.strip()},
+            {"role": "user", "content": prompt}
+        ]
+
+    def _complete(self, prompt: str, usage: Dict, deadline: Optional[float] = None) -> str:
+        """
+        Helper: one chat completion with retries, its token usage added to `usage`
+        """
+        attempt = 0
+        slots = self._request_slots
+        while True:
+            # wait for a request slot of score_many, but not past the deadline; backoff sleeps hold no slot
+            if slots is not None:
+                wait_s = None if deadline is None else max(0.0, deadline - time.monotonic())
+                if not slots.acquire(timeout=wait_s):
+                    raise DeadlineExceeded('batch deadline exceeded')
+            json_mode = self.json_mode
+            try:
+                try:
+                    timeout = self.timeout
+                    if deadline is not None:
+                        timeout = min(timeout, deadline - time.monotonic())
+                        if timeout <= 0:
+                            raise DeadlineExceeded('batch deadline exceeded')
+
+                    with self._usage_lock:
+                        usage['requests'] += 1
+                    start = time.monotonic()
+                    response = self.client.chat.completions.create(
+                        model=self.model,
+                        messages=self._messages(prompt),
+                        timeout=timeout,
+                        **({'response_format': {'type': 'json_object'}} if json_mode else {})
+                    )
+                finally:
+                    if slots is not None:
+                        slots.release()
+                break
+            except openai.BadRequestError as e:
+                if not json_mode or not rejects_json_mode(e):
+                    raise
+                # the provider does not support JSON mode: go on without it, the answer is validated anyway
+                with self._usage_lock:
+                    if self.json_mode:
+                        self.json_mode = False
+                        self.logger.warning(f"JSON mode rejected, continuing without it: {e}")
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt, e)
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    raise
+                self.logger.warning(f"LLM request failed ({type(e).__name__}), retry {attempt + 1} in {delay:.1f}s")
+                with self._usage_lock:
+                    usage['retries'] += 1
+                time.sleep(delay)
+                attempt += 1
+
+        seconds = time.monotonic() - start
+        output = response.choices[0].message.content
+        counts = getattr(response, 'usage', None)
+        prompt_tokens = getattr(counts, 'prompt_tokens', None) or estimate_tokens(src.prompt.ANALYSIS_PROMPT + prompt)
+        completion_tokens = getattr(counts, 'completion_tokens', None) or estimate_tokens(output or '')
+        cached_tokens = cached_prompt_tokens(counts)
+        # chunks of one document complete on several threads
+        with self._usage_lock:
+            usage['prompt_tokens'] += prompt_tokens
+            usage['cached_prompt_tokens'] += cached_tokens
+            usage['completion_tokens'] += completion_tokens
+            usage['total_tokens'] += prompt_tokens + completion_tokens
+            usage['calls'].append({
+                'prompt_tokens': prompt_tokens,
+                'cached_prompt_tokens': cached_tokens,
+                'completion_tokens': completion_tokens,
+                'seconds': round(seconds, 3),
+            })
+        return output
 
-        return response.choices[0].message.content
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """
+        Helper: exponential backoff with jitter; a Retry-After header of the server takes precedence
+        """
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        try:
+            if retry_after is not None:
+                return min(float(retry_after), self.backoff_max)
+        except ValueError:
+            pass
+        delay = min(self.backoff_base * 2 ** attempt, self.backoff_max)
+        return delay * random.uniform(0.5, 1.0)
 
 if __name__ == "__main__":
     s = LLMScorer()
@@ -36,4 +1054,5 @@ if __name__ == "__main__":
     output = s.score("./data/pages/md/Python_is_not_a_great_language_for_data_science.md")
 
     with open("temp.txt", "w", encoding='utf-8') as f:
-        f.write(output)
\ No newline at end of file
+        f.write(output or '')
+    print(s.usage)
@@ -0,0 +1,369 @@
+"""
+HTML -> Markdown conversion stage.
+
+The scraped HTML used to be written to data/pages/html and converted by the h2m binary, which sweeps the
+whole directory on every run. MarkdownConverter converts documents as they come from the scraper instead:
+- html_to_markdown: the conversion itself, BeautifulSoup based, no extra dependency
+- results are cached under `cache_dir`, keyed by the SHA-256 of the converter version, backend and HTML, so a
+  document that was converted before and has not changed is read back instead of converted again; the cache
+  is a DiskCache like ScrapeCache's: entries expire after `ttl_seconds` and the least recently used ones are
+  removed past `max_bytes`
+- convert_many spreads the documents that are not cached over a process pool, since parsing is CPU bound
+
+backend='h2m' sends the documents to a long-lived `h2m -stream` process instead (H2MWorker), which converts
+them on its own goroutine pool with the Go converter the pipeline used before.
+
+A document that fails to convert becomes an empty string and is not cached; the error is logged.
+"""
+import hashlib
+import logging
+import os
+import re
+import struct
+import subprocess
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from bs4 import BeautifulSoup, NavigableString, Comment
+
+from src.utils.disk_cache import DiskCache
+
+# bump when the output of html_to_markdown changes, so cached results are not reused
+CONVERTER_VERSION = 1
+
+DEFAULT_CACHE_DIR = 'data/cache/md'
+DEFAULT_CACHE_TTL_SECONDS = 30 * 24 * 3600
+DEFAULT_CACHE_MAX_BYTES = 100 * 1024 * 1024
+DEFAULT_H2M_BINARY = './h2m/bin/h2m'
+
+DROPPED_TAGS = {
+    'script', 'style', 'noscript', 'head', 'template', 'iframe', 'svg', 'canvas',
+    'form', 'button', 'input', 'select', 'textarea', 'object', 'embed',
+}
+BLOCK_TAGS = {
+    'p', 'div', 'section', 'article', 'main', 'header', 'footer', 'aside', 'nav', 'figure',
+    'figcaption', 'details', 'summary', 'dl', 'dt', 'dd', 'address', 'body', 'html',
+}
+INLINE_WRAPPERS = {
+    'strong': '**', 'b': '**',
+    'em': '*', 'i': '*',
+    'del': '~~', 's': '~~', 'strike': '~~',
+}
+
+
+def html_to_markdown(html: str) -> str:
+    """
+    Convert an HTML document to Markdown.
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    code_blocks: List[str] = []
+    markdown = _render_children(soup, code_blocks)
+
+    # tidy blank lines; code blocks are still placeholders here, so their whitespace is left alone
+    markdown = re.sub(r'[ \t]+\n', '\n', markdown)
+    markdown = re.sub(r'\n[ \t]+\n', '\n\n', markdown)
+    markdown = re.sub(r'\n{3,}', '\n\n', markdown).strip()
+
+    for i, block in enumerate(code_blocks):
+        markdown = markdown.replace(f'\x00{i}\x00', block)
+    return markdown + '\n'
+
+
+def _render_children(node, code_blocks: List[str]) -> str:
+    return ''.join(_render(child, code_blocks) for child in node.children)
+
+
+def _inline(node, code_blocks: List[str]) -> str:
+    """
+    Helper: render the children of node on one line
+    """
+    return re.sub(r'\s+', ' ', _render_children(node, code_blocks)).strip()
+
+
+def _render(node, code_blocks: List[str]) -> str:
+    if isinstance(node, Comment):
+        return ''
+    if isinstance(node, NavigableString):
+        return re.sub(r'\s+', ' ', str(node))
+
+    name = node.name
+    if name in DROPPED_TAGS:
+        return ''
+
+    if name in ('h1', 'h2', 'h3', 'h4', 'h5', 'h6'):
+        text = _inline(node, code_blocks)
+        return f'\n\n{"#" * int(name[1])} {text}\n\n' if text else ''
+
+    if name in BLOCK_TAGS:
+        return f'\n\n{_render_children(node, code_blocks).strip()}\n\n'
+
+    if name == 'br':
+        return '\n'
+
+    if name == 'hr':
+        return '\n\n* * *\n\n'
+
+    if name in INLINE_WRAPPERS:
+        text = _render_children(node, code_blocks).strip()
+        marker = INLINE_WRAPPERS[name]
+        return f'{marker}{text}{marker}' if text else ''
+
+    if name == 'code':
+        text = node.get_text()
+        fence = '``' if '`' in text else '`'
+        return f'{fence}{text}{fence}' if text else ''
+
+    if name == 'a':
+        text = _inline(node, code_blocks)
+        href = node.get('href', '')
+        if not text or not href or href.startswith('javascript:'):
+            return text
+        title = node.get('title')
+        return f'[{text}]({href} "{title}")' if title else f'[{text}]({href})'
+
+    if name == 'img':
+        src = node.get('src', '')
+        return f'![{node.get("alt", "")}]({src})' if src else ''
+
+    if name == 'pre':
+        code = node.find('code')
+        classes = (code or node).get('class') or []
+        language = next((c[len('language-'):] for c in classes if c.startswith('language-')), '')
+        text = node.get_text().strip('\n')
+        code_blocks.append(f'```{language}\n{text}\n```')
+        return f'\n\n\x00{len(code_blocks) - 1}\x00\n\n'
+
+    if name == 'blockquote':
+        text = re.sub(r'\n{3,}', '\n\n', _render_children(node, code_blocks)).strip()
+        return '\n\n' + '\n'.join(f'> {line}' if line else '>' for line in text.split('\n')) + '\n\n'
+
+    if name in ('ul', 'ol'):
+        return _render_list(node, code_blocks)
+
+    if name == 'table':
+        return _render_table(node, code_blocks)
+
+    return _render_children(node, code_blocks)
+
+
+def _render_list(node, code_blocks: List[str]) -> str:
+    ordered = node.name == 'ol'
+    start = int(node.get('start', 1)) if str(node.get('start', 1)).isdigit() else 1
+
+    items = []
+    for i, item in enumerate(node.find_all('li', recursive=False)):
+        marker = f'{start + i}. ' if ordered else '- '
+        text = re.sub(r'\n{2,}', '\n', _render_children(item, code_blocks)).strip()
+        lines = text.split('\n')
+        indent = ' ' * len(marker)
+        items.append(marker + lines[0] + ''.join(f'\n{indent}{line}' if line else '\n' for line in lines[1:]))
+    return '\n\n' + '\n'.join(items) + '\n\n'
+
+
+def _render_table(node, code_blocks: List[str]) -> str:
+    rows = []
+    for row in node.find_all('tr'):
+        cells = [_inline(cell, code_blocks).replace('|', '\\|') for cell in row.find_all(['th', 'td'], recursive=False)]
+        if cells:
+            rows.append(cells)
+    if not rows:
+        return ''
+
+    width = max(len(row) for row in rows)
+    lines = []
+    for i, row in enumerate(rows):
+        row = row + [''] * (width - len(row))
+        lines.append('| ' + ' | '.join(row) + ' |')
+        if i == 0:
+            lines.append('|' + ' --- |' * width)
+    return '\n\n' + '\n'.join(lines) + '\n\n'
+
+
+def _safe_convert(html: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Helper: html_to_markdown for the process pool, an error becomes a result
+    :return: (markdown, None) or (None, error)
+    """
+    try:
+        return html_to_markdown(html), None
+    except Exception as e:
+        return None, f'{type(e).__name__}: {e}'
+
+
+class H2MWorker:
+    """
+    A `h2m -stream` process. Documents are sent as length-prefixed frames on its stdin and the
+    results read back in the same order (see h2m/main.go for the protocol).
+    """
+
+    def __init__(self, binary: str = DEFAULT_H2M_BINARY, workers: Optional[int] = None):
+        self.binary = binary
+        self.workers = workers
+        self._process: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def start(self):
+        if self._process is not None and self._process.poll() is None:
+            return
+        args = [self.binary, '-stream']
+        if self.workers:
+            args += ['-workers', str(self.workers)]
+        self._process = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def close(self):
+        if self._process is None:
+            return
+        try:
+            self._process.stdin.close()
+            self._process.wait(timeout=10)
+        except (OSError, subprocess.TimeoutExpired):
+            self._process.kill()
+        self._process = None
+
+    def convert_many(self, htmls: List[str]) -> List[Tuple[Optional[str], Optional[str]]]:
+        """
+        :return: (markdown, None) or (None, error) per document, in the same order.
+        """
+        with self._lock:
+            self.start()
+            process = self._process
+
+            # write from a thread: the process answers while we are still sending, and full pipes would block both sides
+            def send():
+                try:
+                    for html in htmls:
+                        data = html.encode('utf-8')
+                        process.stdin.write(struct.pack('>I', len(data)) + data)
+                    process.stdin.flush()
+                except OSError:
+                    pass
+
+            sender = threading.Thread(target=send, daemon=True)
+            sender.start()
+            try:
+                results = [self._read_result(process.stdout) for _ in htmls]
+            except Exception:
+                self.close()
+                raise
+            finally:
+                sender.join()
+            return results
+
+    @staticmethod
+    def _read_result(stdout) -> Tuple[Optional[str], Optional[str]]:
+        header = stdout.read(5)
+        if len(header) < 5:
+            raise RuntimeError('h2m exited before answering')
+        status, length = struct.unpack('>BI', header)
+        data = stdout.read(length)
+        if len(data) < length:
+            raise RuntimeError('h2m exited before answering')
+        text = data.decode('utf-8', errors='replace')
+        return (text, None) if status == 0 else (None, text)
+
+
+class MarkdownConverter:
+    """Convert scraped HTML to Markdown, reusing earlier results for unchanged documents"""
+
+    def __init__(self, cache_dir: Optional[str] = DEFAULT_CACHE_DIR, workers: Optional[int] = None,
+                 backend: str = 'python', h2m_binary: str = DEFAULT_H2M_BINARY,
+                 ttl_seconds: float = DEFAULT_CACHE_TTL_SECONDS, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        """
+        :param cache_dir: Where converted documents are kept, None to disable the cache.
+        :param workers: Processes (python) or goroutines (h2m) of convert_many, None for one per core.
+        :param backend: 'python' for html_to_markdown, 'h2m' for the Go converter.
+        :param h2m_binary: Path of the h2m binary for the h2m backend.
+        :param ttl_seconds: Cached documents older than this are converted again.
+        :param max_bytes: Size of the cache, least recently used documents are removed past it.
+        """
+        if backend not in ('python', 'h2m'):
+            raise ValueError(f"Unknown converter backend: {backend}")
+        self.cache_dir = cache_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.logger = logging.getLogger(__name__)
+        self._stats = {'converted': 0, 'cached': 0, 'failed': 0, 'seconds': 0.0}
+        self._h2m = H2MWorker(h2m_binary, workers) if backend == 'h2m' else None
+        self._cache = DiskCache(cache_dir, '.md', ttl_seconds, max_bytes) if cache_dir else None
+
+    def convert(self, html: str) -> str:
+        """
+        Convert one document in this process.
+        """
+        return self.convert_many([html], workers=1)[0]
+
+    def convert_many(self, htmls: List[str], workers: Optional[int] = None) -> List[str]:
+        """
+        Convert many documents; the ones not in the cache are converted in parallel.
+        :param workers: Override of the number of processes for this call.
+        :return: One Markdown document per input, in the same order.
+        """
+        start = time.monotonic()
+        keys = [self.key(html, self.backend) for html in htmls]
+        results: List[Optional[str]] = [self._cache.get(key) if self._cache else None for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+
+        workers = min(workers or self.workers, len(missing))
+        if not missing:
+            converted = []
+        elif self._h2m is not None:
+            converted = self._h2m.convert_many([htmls[i] for i in missing])
+        elif workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                converted = list(executor.map(_safe_convert, [htmls[i] for i in missing], chunksize=4))
+        else:
+            converted = [_safe_convert(htmls[i]) for i in missing]
+
+        failed = 0
+        for i, (markdown, error) in zip(missing, converted):
+            if error is not None:
+                self.logger.error(f"Cannot convert document {i}: {error}")
+                failed += 1
+                results[i] = ''
+                continue
+            results[i] = markdown
+            if self._cache is not None:
+                self._cache.put(keys[i], markdown)
+
+        self._stats['converted'] += len(missing) - failed
+        self._stats['failed'] += failed
+        self._stats['cached'] += len(htmls) - len(missing)
+        self._stats['seconds'] += time.monotonic() - start
+        self.logger.info(f"Converted {len(missing) - failed} documents, {len(htmls) - len(missing)} unchanged, "
+                         f"{failed} failed")
+        return results
+
+    def close(self):
+        """
+        Stop the h2m process of the h2m backend.
+        """
+        if self._h2m is not None:
+            self._h2m.close()
+
+    def stats(self) -> Dict:
+        """
+        Documents converted, served from the cache and failed, cache evictions and size, and the time spent
+        in convert_many.
+        """
+        stats = dict(self._stats)
+        stats['seconds'] = round(stats['seconds'], 3)
+        cache_stats = self._cache.stats() if self._cache else {}
+        for name in ('evictions', 'entries', 'bytes'):
+            stats[name] = cache_stats.get(name, 0)
+        return stats
+
+    @staticmethod
+    def key(html: str, backend: str = 'python') -> str:
+        # the backends do not produce the same Markdown, so they do not share entries
+        return hashlib.sha256(f'{CONVERTER_VERSION}:{backend}:{html}'.encode('utf-8')).hexdigest()
@@ -5,10 +5,10 @@ from typing import List, Dict
 from src.database import DBManager
 
 class MDWriter:
-    def __init__(self, output_dir: str = "./data/output"):
+    def __init__(self, output_dir: str = "./data/output", db: DBManager | None = None):
         self.output_dir = output_dir
         self.ensure_output_dir()
-        self.db = DBManager()
+        self.db = db or DBManager()
     
     def ensure_output_dir(self):
         """
@@ -117,9 +117,76 @@ class MDWriter:
 
     def generate_digest_from_db(self, limit: int = 50, category: str | None = None) -> str:
         """Generate digest from database articles"""
-        articles = w.db.get_recent_articles(limit, category)
+        articles = self.db.get_recent_articles(limit, category)
         return self.write_to_markdown(articles)
+
+    def write_digest_for_date_range(self, start_date: str, end_date: str, filename: str = None,
+                                    chunk_size: int = 500) -> str:
+        """
+        Write a digest of every article created between start_date and end_date (YYYY-MM-DD, inclusive).
+        Same layout as write_to_markdown, but articles are streamed from the database category by category
+        and written as they arrive, so months of history are handled in constant memory.
+        """
+        if not filename:
+            filename = self.generate_filename()
+
+        filepath = os.path.join(self.output_dir, filename)
+
+        counts = self.db.count_articles_by_category(start_date, end_date)
+        total = sum(counts.values())
+
+        with open(filepath, 'w', encoding='utf-8') as f:
+            f.write("# RSS Digest\n\n")
+            f.write(f"**Date and Time**: {datetime.now().strftime('%Y-%m-%d %H:%M')}  \n")
+            f.write(f"**Date Range**: {start_date} - {end_date}  \n")
+            f.write(f"**Article Count**: {total}  \n\n")
+
+            for category, count in counts.items():
+                f.write(f"## {category.upper()} ({count} article(s))\n\n")
+                for article in self.db.iter_articles(start_date, end_date, category=category,
+                                                     chunk_size=chunk_size):
+                    f.write(self.format_article(article))
+
+            # Statistics
+            f.write("## Statistics\n\n")
+            f.write(f"- In total: {total} article(s)\n")
+            for category, count in counts.items():
+                f.write(f"- {category}: {count} article(s)\n")
+
+        print(f"Feeds list generated: {filepath}")
+        return filepath
     
+    @staticmethod
+    def calculate_score(rate: Dict):
+        """
+        Digest score of a RATE object, normalized to [0, 100]
+        :return: (score, category with the highest rating)
+        """
+        # 计算Score
+        # 获取分类rating（不包括内容准确率、实践指导价值和潜在发展影响）
+        excluded_ratings = {"内容准确率", "实践指导价值", "潜在发展影响"}
+
+        # 找出分类rating的最大值
+        category_max_rating = 0
+        max_category = ""
+
+        for category, rating in rate.items():
+            if category not in excluded_ratings:
+                if rating > category_max_rating:
+                    category_max_rating = rating
+                    max_category = category
+
+        # 计算总Score
+        accuracy_rate = rate.get("内容准确率", 0)
+        practical_value = rate.get("实践指导价值", 0)
+        potential_impact = rate.get("潜在发展影响", 0)
+
+        total_score = accuracy_rate + practical_value + potential_impact + category_max_rating
+
+        # normalize to [0, 100]
+        total_score = round(total_score / 40 * 100)
+        return total_score, max_category
+
     def json_to_markdown(self, json_file_path: str):
 
         try:
@@ -135,29 +202,7 @@ class MDWriter:
             event_text = data.get("EVENT_TEXT", "")
             rate = data.get("RATE", {})
             
-            # 计算Score
-            # 获取分类rating（不包括内容准确率、实践指导价值和潜在发展影响）
-            excluded_ratings = {"内容准确率", "实践指导价值", "潜在发展影响"}
-            
-            # 找出分类rating的最大值
-            category_max_rating = 0
-            max_category = ""
-            
-            for category, rating in rate.items():
-                if category not in excluded_ratings:
-                    if rating > category_max_rating:
-                        category_max_rating = rating
-                        max_category = category
-            
-            # 计算总Score
-            accuracy_rate = rate.get("内容准确率", 0)
-            practical_value = rate.get("实践指导价值", 0)
-            potential_impact = rate.get("潜在发展影响", 0)
-            
-            total_score = accuracy_rate + practical_value + potential_impact + category_max_rating
-            
-            # normalize to [0, 100]
-            total_score = round(total_score / 40 * 100)
+            total_score, max_category = self.calculate_score(rate)
             
             # 构建Markdown文本
             markdown_text = f"""## {title} [{total_score}]
@@ -0,0 +1,299 @@
+"""
+Relevance gate.
+
+Every article that passes the keyword filter is scraped, extracted, converted and sent to the LLM, although
+most of them end up at the bottom of the digest. RelevanceGate is a cheap local model that looks only at the
+title and summary of an article, before it is scraped, and lets through the ones the full scorer is likely
+to rate highly:
+- features:  hashed words, word pairs and CJK character pairs of title and summary (no vocabulary to keep)
+- model:     logistic regression, trained on the digest scores of past runs (the article_scores table)
+- threshold: the lowest probability that still keeps `min_recall` of the relevant articles of a holdout set
+
+An untrained gate (no model file yet) lets every article through, so the pipeline collects training data
+before the gate is used.
+
+Rejected articles are never scored, so the gate cannot be checked on them directly. With `audit_rate` a
+random share of them is scored anyway; evaluate() uses those to estimate how many relevant articles the gate
+drops, next to its precision on the articles it let through.
+"""
+import json
+import logging
+import math
+import os
+import random
+import re
+import zlib
+from typing import Dict, List, Optional
+
+DEFAULT_MODEL_PATH = 'data/models/relevance_gate.json'
+DEFAULT_RELEVANT_SCORE = 50
+DEFAULT_MIN_RECALL = 0.95
+FEATURE_BITS = 18
+MIN_EXAMPLES = 50
+MIN_EXAMPLES_PER_CLASS = 5
+
+_TAG = re.compile(r'<[^>]+>')
+_WORD = re.compile(r'[a-z0-9][a-z0-9+#]*')
+_CJK_RUN = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff]+')
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Words of latin text, character pairs of CJK text (no word boundaries there).
+    """
+    text = _TAG.sub(' ', text or '').lower()
+    tokens = _WORD.findall(text)
+    for run in _CJK_RUN.findall(text):
+        tokens.extend(run[i:i + 2] for i in range(max(len(run) - 1, 1)))
+    return tokens
+
+
+def extract_features(title: str, summary: str, bits: int = FEATURE_BITS) -> Dict[int, float]:
+    """
+    Hashed, L2-normalised binary features of an article. Title words are counted separately from summary
+    words, they say more about the article.
+    :return: feature index -> value
+    """
+    title_tokens = tokenize(title)
+    summary_tokens = tokenize(summary)
+    names = {'t:' + token for token in title_tokens}
+    names.update('s:' + token for token in summary_tokens)
+    names.update(f'p:{a} {b}' for a, b in zip(title_tokens, title_tokens[1:]))
+    names.update(f'p:{a} {b}' for a, b in zip(summary_tokens, summary_tokens[1:]))
+
+    mask = (1 << bits) - 1
+    indices = {zlib.crc32(name.encode('utf-8')) & mask for name in names}
+    if not indices:
+        return {}
+    value = 1 / math.sqrt(len(indices))
+    return {index: value for index in indices}
+
+
+def _sigmoid(z: float) -> float:
+    if z < -30:
+        return 0.0
+    if z > 30:
+        return 1.0
+    return 1 / (1 + math.exp(-z))
+
+
+def _rates(labels: List[bool], predictions: List[bool]) -> Dict:
+    """
+    Helper: precision / recall / pass rate of predictions against labels
+    """
+    tp = sum(1 for label, passed in zip(labels, predictions) if label and passed)
+    passed = sum(predictions)
+    relevant = sum(labels)
+    return {
+        'examples': len(labels),
+        'precision': round(tp / passed, 3) if passed else 0.0,
+        'recall': round(tp / relevant, 3) if relevant else 0.0,
+        'pass_rate': round(passed / len(labels), 3) if labels else 0.0,
+    }
+
+
+class RelevanceGate:
+    """Hashed-feature logistic regression over title and summary"""
+
+    def __init__(self, weights: Optional[Dict[int, float]] = None, bias: float = 0.0, threshold: float = 0.0,
+                 bits: int = FEATURE_BITS, relevant_score: int = DEFAULT_RELEVANT_SCORE,
+                 metrics: Optional[Dict] = None):
+        """
+        :param threshold: Articles with a lower probability are rejected.
+        :param relevant_score: Digest score from which an article counts as relevant.
+        :param metrics: Holdout precision / recall of the training run, kept with the model.
+        """
+        self.weights = weights or {}
+        self.bias = bias
+        self.threshold = threshold
+        self.bits = bits
+        self.relevant_score = relevant_score
+        self.metrics = metrics or {}
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def trained(self) -> bool:
+        return bool(self.weights)
+
+    def predict(self, article: Dict) -> float:
+        """
+        :return: Probability that the full scorer rates the article relevant.
+        """
+        return self._probability(extract_features(article.get('title', ''), article.get('summary', ''), self.bits))
+
+    def decide(self, articles: List[Dict], audit_rate: float = 0.0, rng: Optional[random.Random] = None) -> List[Dict]:
+        """
+        :param audit_rate: Share of rejected articles to score anyway, to measure what the gate drops.
+        :return: {'probability', 'passed', 'audited'} per article, in the same order. An untrained gate
+                 passes everything with probability None.
+        """
+        if not self.trained:
+            return [{'probability': None, 'passed': True, 'audited': False} for _ in articles]
+
+        rng = rng or random.Random()
+        decisions = []
+        for article in articles:
+            probability = self.predict(article)
+            passed = probability >= self.threshold
+            decisions.append({
+                'probability': round(probability, 4),
+                'passed': passed,
+                'audited': not passed and rng.random() < audit_rate,
+            })
+        rejected = sum(1 for decision in decisions if not decision['passed'])
+        self.logger.info(f"Relevance gate rejected {rejected} of {len(articles)} articles")
+        return decisions
+
+    @classmethod
+    def train(cls, examples: List[Dict], relevant_score: int = DEFAULT_RELEVANT_SCORE,
+              min_recall: float = DEFAULT_MIN_RECALL, holdout: float = 0.2, epochs: int = 20,
+              learning_rate: float = 0.5, l2: float = 1e-4, bits: int = FEATURE_BITS,
+              seed: int = 0) -> 'RelevanceGate':
+        """
+        Fit a gate on scored articles.
+        :param examples: Dicts with title, summary and score (the digest score of the full scorer).
+        :param min_recall: Share of relevant holdout articles the threshold must keep.
+        :param holdout: Share of examples kept out of training to choose the threshold and measure the gate.
+        :raise ValueError: Too few examples, or too few of either class.
+        """
+        examples = [example for example in examples if example.get('score') is not None]
+        labels = [example['score'] >= relevant_score for example in examples]
+        positives = sum(labels)
+        if len(examples) < MIN_EXAMPLES or min(positives, len(labels) - positives) < MIN_EXAMPLES_PER_CLASS:
+            raise ValueError(f"Need at least {MIN_EXAMPLES} scored articles with {MIN_EXAMPLES_PER_CLASS} of each "
+                             f"class, have {len(examples)} ({positives} relevant)")
+
+        rows = [extract_features(example.get('title', ''), example.get('summary', ''), bits)
+                for example in examples]
+        order = list(range(len(rows)))
+        random.Random(seed).shuffle(order)
+        split = max(int(len(order) * holdout), 1)
+        test, fit = order[:split], order[split:]
+
+        gate = cls(bits=bits, relevant_score=relevant_score)
+        gate._fit([rows[i] for i in fit], [labels[i] for i in fit], epochs, learning_rate, l2, seed)
+        probabilities = [gate._probability(rows[i]) for i in test]
+        test_labels = [labels[i] for i in test]
+        threshold = cls._recall_threshold(probabilities, test_labels, min_recall)
+        metrics = _rates(test_labels, [p >= threshold for p in probabilities])
+
+        # final model on every example, with the threshold and metrics of the holdout run
+        gate = cls(bits=bits, relevant_score=relevant_score, threshold=threshold, metrics=metrics)
+        gate._fit(rows, labels, epochs, learning_rate, l2, seed)
+        gate.metrics['trained_on'] = len(examples)
+        gate.metrics['min_recall'] = min_recall
+        return gate
+
+    def _fit(self, rows: List[Dict[int, float]], labels: List[bool], epochs: int, learning_rate: float,
+             l2: float, seed: int):
+        """
+        Helper: stochastic gradient descent on the log loss, classes weighted to the same total
+        """
+        positives = sum(labels) or 1
+        negatives = (len(labels) - sum(labels)) or 1
+        class_weight = {True: len(labels) / (2 * positives), False: len(labels) / (2 * negatives)}
+        weights: Dict[int, float] = {}
+        bias = 0.0
+        order = list(range(len(rows)))
+        rng = random.Random(seed)
+
+        for epoch in range(epochs):
+            rng.shuffle(order)
+            step = learning_rate / (1 + epoch)
+            for i in order:
+                features, label = rows[i], labels[i]
+                z = bias + sum(weights.get(j, 0.0) * v for j, v in features.items())
+                gradient = (_sigmoid(z) - label) * class_weight[label]
+                bias -= step * gradient
+                for j, v in features.items():
+                    w = weights.get(j, 0.0)
+                    weights[j] = w - step * (gradient * v + l2 * w)
+
+        self.weights = {j: w for j, w in weights.items() if abs(w) > 1e-6}
+        self.bias = bias
+
+    def _probability(self, features: Dict[int, float]) -> float:
+        return _sigmoid(self.bias + sum(self.weights.get(i, 0.0) * v for i, v in features.items()))
+
+    @staticmethod
+    def _recall_threshold(probabilities: List[float], labels: List[bool], min_recall: float) -> float:
+        """
+        Helper: the highest threshold that keeps min_recall of the relevant articles
+        """
+        relevant = sorted(p for p, label in zip(probabilities, labels) if label)
+        if not relevant:
+            return 0.0
+        # everything from this index on is kept
+        index = min(int(len(relevant) * (1 - min_recall)), len(relevant) - 1)
+        return relevant[index]
+
+    def save(self, path: str = DEFAULT_MODEL_PATH):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        data = {
+            'bits': self.bits,
+            'bias': self.bias,
+            'threshold': self.threshold,
+            'relevant_score': self.relevant_score,
+            'metrics': self.metrics,
+            'weights': {str(i): round(w, 6) for i, w in self.weights.items()},
+        }
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_MODEL_PATH) -> 'RelevanceGate':
+        """
+        :return: The saved gate, an untrained one when there is no model file.
+        """
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return cls()
+        return cls(
+            weights={int(i): w for i, w in data.get('weights', {}).items()},
+            bias=data.get('bias', 0.0),
+            threshold=data.get('threshold', 0.0),
+            bits=data.get('bits', FEATURE_BITS),
+            relevant_score=data.get('relevant_score', DEFAULT_RELEVANT_SCORE),
+            metrics=data.get('metrics'),
+        )
+
+
+def evaluate(rows: List[Dict], relevant_score: int = DEFAULT_RELEVANT_SCORE) -> Dict:
+    """
+    Precision of the gate against the full scorer, from the article_scores table (DBManager.get_article_scores).
+    - precision:         share of passed articles the scorer rated relevant
+    - audit_miss_rate:   share of audited rejects the scorer rated relevant
+    - estimated_recall:  relevant articles passed / (passed + estimated relevant among all rejects)
+    - llm_calls_saved:   rejected articles that were not scored
+    """
+    gated = [row for row in rows if row.get('gate_probability') is not None]
+    passed = [row for row in gated if row['gate_passed']]
+    rejected = [row for row in gated if not row['gate_passed']]
+    passed_scored = [row for row in passed if row.get('score') is not None]
+    audited_scored = [row for row in rejected if row.get('audited') and row.get('score') is not None]
+
+    relevant_passed = sum(1 for row in passed_scored if row['score'] >= relevant_score)
+    relevant_audited = sum(1 for row in audited_scored if row['score'] >= relevant_score)
+    precision = relevant_passed / len(passed_scored) if passed_scored else None
+    miss_rate = relevant_audited / len(audited_scored) if audited_scored else None
+
+    recall = None
+    if precision is not None and miss_rate is not None:
+        kept = precision * len(passed)
+        missed = miss_rate * len(rejected)
+        recall = kept / (kept + missed) if kept + missed else None
+
+    return {
+        'gated': len(gated),
+        'passed': len(passed),
+        'rejected': len(rejected),
+        'audited': len(audited_scored),
+        'precision': round(precision, 3) if precision is not None else None,
+        'audit_miss_rate': round(miss_rate, 3) if miss_rate is not None else None,
+        'estimated_recall': round(recall, 3) if recall is not None else None,
+        'llm_calls_saved': sum(1 for row in rejected if not row.get('audited')),
+    }
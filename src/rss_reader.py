@@ -1,47 +1,102 @@
 import feedparser
 import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlparse
+
+import requests
 from typing import List, Dict
 from src.database import DBManager
 
 import logging
 from src.utils.logger_config import setup_logging
 
+DEFAULT_FEED_TIMEOUT = 30.0  # seconds, whole download of a single feed
+# seconds to connect / to wait for each read, capped by the feed timeout; without a read timeout a stalled
+# server would hold the fetch past its deadline, which is only checked between chunks
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 10.0
+FEED_READ_SIZE = 16 * 1024  # most bytes taken per read of the body; a read returns whatever has arrived
+
+
 class RSSReader:
-    def __init__(self, feeds_file: str = "data/feeds.json"):
+    def __init__(self, feeds_file: str = "data/feeds.json", db: DBManager | None = None):
         self.feeds_file = feeds_file
 
         setup_logging()
         self.logger = logging.getLogger(__name__)
 
-        self.db = DBManager()
+        self.db = db or DBManager()
         self.feeds = self.load_feeds()
+
+        # feed url -> seconds spent on the last fetch
+        self.feed_latencies: Dict[str, float] = {}
+        self._latency_lock = threading.Lock()
     
     def load_feeds(self) -> List[Dict]:
         """
         Load RSS sources from a JSON file
         """
         try:
-            with open('data/feeds.json', 'r', encoding='utf-8') as f:
+            with open(self.feeds_file, 'r', encoding='utf-8') as f:
                 data = json.load(f)
                 feeds = data.get('feeds', [])
                 self.logger.info(f"Loaded {len(feeds)} RSS feeds")
                 return feeds
         except FileNotFoundError:
-            self.logger.error("Error: data/feeds.json not found")
+            self.logger.error(f"Error: {self.feeds_file} not found")
             return []
         except json.JSONDecodeError:
             self.logger.error("Invalid JSON format in feeds file")
             return []
     
     # @retry(max_retries=2, delay=1.0)
-    def fetch_feed(self, feed_url: str) -> Dict:
+    def fetch_feed(self, feed_url: str, timeout: float = DEFAULT_FEED_TIMEOUT,
+                   validators: Dict | None = None, connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                   read_timeout: float = DEFAULT_READ_TIMEOUT) -> Dict:
         """
-        Fetch from a single RSS source
+        Fetch from a single RSS source.
+        The whole download must finish within `timeout` seconds: connecting is bounded by connect_timeout, and
+        every read of the body by read_timeout or the time left, whichever is shorter, so neither a stalled nor
+        a slowly trickling server can hold the fetch past its deadline.
+        validators: {'etag': ..., 'last_modified': ...} from the previous fetch, sent as a conditional GET.
+            On 304 Not Modified the feed is not parsed and {'not_modified': True, ...} is returned.
         """
         try:
             self.logger.info(f"Fetching: {feed_url}")
-            
-            d = feedparser.parse(feed_url)
+
+            validators = validators or {}
+            request_headers = {'User-Agent': feedparser.USER_AGENT}
+            if validators.get('etag'):
+                request_headers['If-None-Match'] = validators['etag']
+            if validators.get('last_modified'):
+                request_headers['If-Modified-Since'] = validators['last_modified']
+
+            deadline = time.monotonic() + timeout
+            with requests.get(
+                feed_url,
+                headers=request_headers,
+                timeout=(min(connect_timeout, timeout), min(read_timeout, timeout)),
+                stream=True
+            ) as response:
+                if response.status_code == 304:
+                    self.logger.info(f"Not modified: {feed_url}")
+                    return {
+                        'title': '',
+                        'entries': [],
+                        'not_modified': True,
+                        'etag': validators.get('etag'),
+                        'last_modified': validators.get('last_modified')
+                    }
+
+                response.raise_for_status()
+                chunks = self._read_body(response, deadline, read_timeout, timeout)
+                # the body is already decoded, feedparser must not try to decompress it again
+                headers = {k.lower(): v for k, v in response.headers.items()
+                           if k.lower() not in ('content-encoding', 'content-length')}
+
+            d = feedparser.parse(b''.join(chunks), response_headers=headers)
             
             if d.bozo:  # Check for parsing errors
                 self.logger.warning(f"Parse error: {feed_url}")
@@ -51,22 +106,122 @@ class RSSReader:
                 'title': d.feed.get('title', 'untitled'),
 
                 # may slice to determine how many entries to fetch
-                'entries': d.entries[:]
+                'entries': d.entries[:],
+                'not_modified': False,
+                'etag': headers.get('etag'),
+                'last_modified': headers.get('last-modified')
             }
         except Exception as e:
             self.logger.error(f"Error fetching {feed_url}: {e}")
             return None
-    
-    def fetch_all_feeds(self, max_articles_per_feed: int = 10, save_to_db: bool = True) -> List[Dict]:
+
+    @staticmethod
+    def _read_body(response: requests.Response, deadline: float, read_timeout: float, timeout: float) -> List[bytes]:
         """
-        Fetch from all RSS sources
+        Helper: read a streamed response body, aborting once the deadline passes.
+        Before each read the socket timeout is set to the time left, so a single read cannot outlast the deadline.
+        """
+        raw = response.raw
+        # read1 returns as soon as some bytes are there, read waits for the full size (urllib3 < 2)
+        read = getattr(raw, 'read1', None) or raw.read
+        sock = RSSReader._response_socket(raw)
+
+        chunks = []
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"deadline of {timeout}s exceeded")
+            if sock is not None:
+                try:
+                    sock.settimeout(min(read_timeout, remaining))
+                except OSError:
+                    # the body is complete and urllib3 has let go of the socket, the next read returns b''
+                    sock = None
+            chunk = read(FEED_READ_SIZE, decode_content=True)
+            if not chunk:
+                return chunks
+            chunks.append(chunk)
+
+    @staticmethod
+    def _response_socket(raw):
+        """
+        Helper: the socket a urllib3 response body is read from, None when it cannot be reached.
+        urllib3 2 detaches the socket from the connection once the body streams, so look behind the
+        http.client file object as well. Without a socket every read is still bounded by the read timeout.
+        """
+        sock = getattr(getattr(raw, 'connection', None), 'sock', None)
+        if sock is None:
+            file = getattr(getattr(raw, '_fp', None), 'fp', None)
+            sock = getattr(getattr(file, 'raw', None), '_sock', None)
+        return sock if hasattr(sock, 'settimeout') else None
+
+    def _timed_fetch(self, feed_url: str, timeout: float, validators: Dict | None = None) -> Dict:
+        """
+        Helper: fetch a feed and record the latency
+        """
+        start = time.monotonic()
+        result = self.fetch_feed(feed_url, timeout, validators)
+        latency = time.monotonic() - start
+
+        with self._latency_lock:
+            self.feed_latencies[feed_url] = latency
+        self.logger.info(f"Fetched {feed_url} in {latency:.2f}s ({'ok' if result else 'failed'})")
+        return result
+
+    def fetch_all_feeds(self, max_articles_per_feed: int = 10, save_to_db: bool = True,
+                        max_workers: int = 8, per_host_limit: int = 2,
+                        feed_timeout: float = DEFAULT_FEED_TIMEOUT,
+                        conditional_get: bool = True) -> List[Dict]:
+        """
+        Fetch from all RSS sources concurrently.
+        max_workers:     number of feeds fetched at the same time (1 = sequential)
+        per_host_limit:  max concurrent requests to a single host
+        feed_timeout:    deadline in seconds for each feed
+        conditional_get: send the ETag / Last-Modified stored in feed_status and skip unchanged feeds.
+            Only used together with save_to_db, otherwise unchanged feeds would never reach the database.
         """
         all_articles = []
         successful_feeds = 0
+        not_modified_feeds = 0
+        self.feed_latencies = {}
+
+        use_validators = conditional_get and save_to_db
+        validators = {
+            feed['url']: self.db.get_feed_validators(feed['url']) if use_validators else {}
+            for feed in self.feeds
+        }
+
+        # a feed is only handed to the pool when its host is below per_host_limit, so no worker sits
+        # waiting for a busy host while feeds of other hosts are pending
+        max_workers, per_host_limit = max(1, max_workers), max(1, per_host_limit)
+        results = [None] * len(self.feeds)
+        pending = list(range(len(self.feeds)))
+        host_active: Dict[str, int] = {}
+        running = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while pending or running:
+                for i in list(pending):
+                    if len(running) >= max_workers:
+                        break
+                    url = self.feeds[i]['url']
+                    host = urlparse(url).hostname or ''
+                    if host_active.get(host, 0) >= per_host_limit:
+                        continue
+                    host_active[host] = host_active.get(host, 0) + 1
+                    running[executor.submit(self._timed_fetch, url, feed_timeout, validators[url])] = (i, host)
+                    pending.remove(i)
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    # keep the order of data/feeds.json
+                    i, host = running.pop(future)
+                    host_active[host] -= 1
+                    results[i] = future.result()
 
-        for feed in self.feeds:
-            result = self.fetch_feed(feed['url'])
-            if result:
+        for feed, result in zip(self.feeds, results):
+            if result and result['not_modified']:
+                not_modified_feeds += 1
+            elif result:
                 successful_feeds += 1
                 for entry in result['entries'][:max_articles_per_feed]:
                     article = {
@@ -81,13 +236,29 @@ class RSSReader:
                     }
                     all_articles.append(article)
 
-        self.logger.debug(f"Successfully fetched {len(all_articles)} articles from {successful_feeds}/{len(self.feeds)} feeds")
+        self.logger.debug(f"Successfully fetched {len(all_articles)} articles from {successful_feeds}/{len(self.feeds)} feeds"
+                          f" ({not_modified_feeds} not modified)")
+
+        if self.feed_latencies:
+            slowest = sorted(self.feed_latencies.items(), key=lambda x: x[1], reverse=True)[:5]
+            self.logger.info("Slowest feeds: " + ", ".join(f"{url} ({t:.2f}s)" for url, t in slowest))
 
         # Save to database if requested
         if save_to_db and all_articles:
             new_count = self.db.save_articles_batch(all_articles)
             self.logger.info(f"Database: {new_count} new articles saved")
 
+        # Remember validators only after the articles are stored; 304 feeds are left untouched
+        if save_to_db:
+            for feed, result in zip(self.feeds, results):
+                if result is None:
+                    old = validators[feed['url']]
+                    self.db.update_feed_status(feed['url'], old.get('etag'), old.get('last_modified'),
+                                               last_error='fetch failed')
+                elif not result['not_modified']:
+                    self.db.update_feed_status(feed['url'], result['etag'], result['last_modified'],
+                                               article_count=len(result['entries'][:max_articles_per_feed]))
+
         return all_articles
     
     def get_articles_from_db(self, limit: int = 50, category: str | None = None) -> List[Dict]:
@@ -98,6 +269,10 @@ class RSSReader:
         """Get database statistics"""
         return self.db.get_article_stats()
 
+    def get_feed_latencies(self) -> Dict[str, float]:
+        """Get per-feed latency (seconds) of the last fetch_all_feeds run"""
+        return dict(self.feed_latencies)
+
 # Simple unit test
 if __name__ == "__main__":
 
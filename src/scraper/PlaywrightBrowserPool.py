@@ -0,0 +1,250 @@
+"""
+Reusable browser pool for rendering many pages.
+
+Every call of PlaywrightRawScraper.request_by_browser starts Playwright, launches Chromium and tears both
+down again, which costs more than loading the page itself. BrowserPool keeps `size` browsers alive and
+renders up to `size` URLs at the same time.
+
+The sync Playwright API is bound to the thread that started it, so every browser lives in its own worker
+thread. A worker keeps one browser context and opens a fresh page per URL; the context is replaced after
+`pages_per_context` pages to keep its memory bounded. Jobs are handed to the workers through a queue, so
+the pool can be called from any thread.
+
+Each job names a scrape profile (see ScrapeProfile). Launch options such as slow_mo are per browser, so a
+worker keeps one browser per profile it has been asked for. Only one sync Playwright can run per thread, so
+a worker starts Playwright once and launches all its browsers from it. Request blocking is set up per page by a
+ResourceBlocker, whose report is merged into the result.
+
+Results follow the ScraperBase contract.
+"""
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Optional, Dict, List
+
+from playwright.sync_api import sync_playwright
+
+from src.scraper.ScraperBase import ScraperResult, ProxyConfig
+from src.scraper.PlaywrightRawScraper import BrowserManager, new_context_args
+from src.scraper.ResourceBlocker import ResourceBlocker
+from src.scraper.PlaywrightRenderedScraper import make_handler
+from src.scraper.ScrapeProfile import ScrapeProfile, get_profile
+
+
+class BrowserPool:
+    """Pool of long-lived browsers, one per worker thread"""
+
+    def __init__(
+        self,
+        size: int = 4,
+        headless: bool = True,
+        proxy: Optional[Dict[str, str]] = None,
+        pages_per_context: int = 50
+    ):
+        self.size = max(1, size)
+        self.headless = headless
+        self.proxy = proxy
+        self.pages_per_context = pages_per_context
+
+        self._jobs = queue.Queue()
+        self._workers: List[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def start(self):
+        with self._lock:
+            if self._workers:
+                return
+            for i in range(self.size):
+                worker = threading.Thread(target=self._work, name=f"browser-pool-{i}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def close(self):
+        with self._lock:
+            for _ in self._workers:
+                self._jobs.put(None)
+            for worker in self._workers:
+                worker.join()
+            self._workers = []
+
+    def submit(
+        self,
+        url: str,
+        handler: callable,
+        timeout_ms: Optional[int] = None,
+        profile: Optional[str | ScrapeProfile] = None
+    ) -> Future:
+        """
+        Queue a URL; handler(page, response) runs on a pooled page, like in request_by_browser.
+        :param timeout_ms: None for the timeout of the profile.
+        :param profile: Scrape profile name, None for the default profile.
+        :return: Future of the handler result, or of the exception when no browser page could be opened.
+        """
+        profile = get_profile(profile)
+        if timeout_ms is None:
+            timeout_ms = profile["timeout_ms"]
+
+        self.start()
+        future = Future()
+        self._jobs.put((url, handler, timeout_ms, profile, future))
+        return future
+
+    def fetch_content(
+        self,
+        url: str,
+        timeout_ms: Optional[int] = None,
+        proxy: Optional[ProxyConfig] = None,
+        profile: Optional[str] = None,
+        **kwargs
+    ) -> ScraperResult:
+        """
+        The same as base, rendered like PlaywrightRenderedScraper.
+        :param proxy: Ignored, the proxy is set per pool.
+        :param profile: Scrape profile name, None for the default profile.
+        """
+        return self._result(self._submit_rendered(url, timeout_ms, profile))
+
+    def fetch_contents(
+        self,
+        urls: List[str],
+        timeout_ms: Optional[int] = None,
+        profiles: Optional[str | List[Optional[str]]] = None
+    ) -> List[ScraperResult]:
+        """
+        Render all urls, up to `size` at a time.
+        :param profiles: One profile name for all urls, or one per url (None entries use the default).
+        :return: One ScraperResult per url, in the same order.
+        """
+        if profiles is None or isinstance(profiles, str):
+            profiles = [profiles] * len(urls)
+
+        futures = [self._submit_rendered(url, timeout_ms, profile) for url, profile in zip(urls, profiles)]
+        return [self._result(future) for future in futures]
+
+    def _submit_rendered(self, url: str, timeout_ms: Optional[int], profile: Optional[str]) -> Future:
+        """
+        Helper: submit with the rendered DOM handler. The effective timeout is resolved first, so that the
+        handler waits for the load state with the profile timeout as well.
+        """
+        profile = get_profile(profile)
+        if timeout_ms is None:
+            timeout_ms = profile["timeout_ms"]
+        return self.submit(url, make_handler(timeout_ms, profile), timeout_ms, profile)
+
+    @staticmethod
+    def _result(future: Future) -> ScraperResult:
+        """
+        Helper: wait for a job and turn a failed browser launch into an error result.
+        """
+        try:
+            return future.result()
+        except Exception as e:
+            return {'content': '', "errors": [str(e)]}
+
+    def _work(self):
+        # profile name -> {'manager': BrowserManager, 'context': BrowserContext | None, 'pages': int}
+        browsers: Dict[str, Dict] = {}
+        playwright = None
+
+        try:
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    break
+
+                url, handler, timeout_ms, profile, future = job
+                if not future.set_running_or_notify_cancel():
+                    continue
+
+                name = profile["name"]
+                try:
+                    if playwright is None:
+                        playwright = sync_playwright().start()
+                    if name not in browsers:
+                        browsers[name] = {
+                            'manager': BrowserManager(headless=self.headless, proxy=self.proxy, profile=profile,
+                                                      playwright=playwright),
+                            'context': None,
+                            'pages': 0
+                        }
+                    page = self._new_page(browsers[name], profile)
+                except Exception as e:
+                    # the browser is unusable, start from scratch on the next job
+                    print(f'BrowserPool cannot open a page: {str(e)}')
+                    future.set_exception(e)
+                    slot = browsers.pop(name, None)
+                    if slot is not None:
+                        self._close_slot(slot)
+                    continue
+
+                try:
+                    blocker = ResourceBlocker.from_profile(profile)
+                    blocker.attach(page)
+                    response = page.goto(url, timeout=timeout_ms, wait_until=profile["wait_until"])
+                    result = handler(page, response)
+                    if isinstance(result, dict):
+                        result.update(blocker.report())
+                except Exception as e:
+                    print(f'BrowserPool gets exception on {url}: {str(e)}')
+                    result = {'content': '', "errors": [str(e)]}
+                finally:
+                    try:
+                        page.close()
+                    except Exception as e:
+                        print(f"Page close exception: {e}")
+                future.set_result(result)
+        finally:
+            for slot in browsers.values():
+                self._close_slot(slot)
+            if playwright is not None:
+                try:
+                    playwright.stop()
+                except Exception as e:
+                    print(f"Playwright close exception: {e}")
+
+    def _new_page(self, slot: Dict, profile: ScrapeProfile):
+        manager = slot['manager']
+        if manager.browser is None:
+            manager.open()
+        if slot['context'] is None or slot['pages'] >= self.pages_per_context:
+            self._close_context(slot['context'])
+            slot['context'] = manager.browser.new_context(**new_context_args())
+            slot['pages'] = 0
+        slot['pages'] += 1
+        return slot['context'].new_page()
+
+    def _close_slot(self, slot: Dict):
+        self._close_context(slot['context'])
+        slot['context'] = None
+        slot['manager'].close()
+
+    @staticmethod
+    def _close_context(context):
+        if context is not None:
+            try:
+                context.close()
+            except Exception as e:
+                print(f"Context close exception: {e}")
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+
+def main():
+    urls = [
+        "https://machinelearningmastery.com/further-applications-with-context-vectors/",
+        "https://techblog.wikimedia.org/2025/11/21/unifying-mobile-and-desktop-domains/",
+    ]
+    with BrowserPool(size=2) as pool:
+        for url, result in zip(urls, pool.fetch_contents(urls, timeout_ms=20000)):
+            print(url, len(result['content']), result['errors'])
+
+
+if __name__ == "__main__":
+    main()
@@ -21,6 +21,8 @@ from playwright.sync_api import sync_playwright
 
 from src.scraper.ScraperBase import ScraperResult, ProxyConfig
 from src.scraper.ProxyFormatParser import to_playwright_format, parse_to_intermediate
+from src.scraper.ScrapeProfile import ScrapeProfile, get_profile
+from src.scraper.ResourceBlocker import ResourceBlocker
 
 DEFAULT_TIMEOUT_MS = 8000  # 8 seconds
 
@@ -48,10 +50,19 @@ class BrowserManager:
         self,
         headless: bool = True,
         proxy: Optional[Dict[str, str]] = None,
-        user_agents: Optional[List[str]] = None
+        user_agents: Optional[List[str]] = None,
+        profile: Optional[str | ScrapeProfile] = None,
+        playwright=None
     ):
-        self.playwright = None
+        """
+        :param playwright: A started Playwright to launch the browser from, None to start (and stop) one here.
+            Only one sync Playwright can run per thread, so a thread with several browsers must share one.
+        """
+        self.headless = headless
+        self.playwright = playwright
+        self._owns_playwright = playwright is None
         self.browser = None
+        self.profile = get_profile(profile)
 
         if proxy:
             proxy = to_playwright_format(parse_to_intermediate(proxy))
@@ -69,14 +80,18 @@ class BrowserManager:
         self.close()
 
     def open(self):
+        if self.browser:
+            return
         if not self.playwright:
             self.playwright = sync_playwright().start()
-            try:
-                options = self._prepare_launch_options(headless=True)
-                self.browser = self.playwright.chromium.launch(**options)
-            except Exception as e:
+        try:
+            options = self._prepare_launch_options(headless=self.headless)
+            self.browser = self.playwright.chromium.launch(**options)
+        except Exception as e:
+            if self._owns_playwright:
                 self.playwright.stop()
-                raise
+                self.playwright = None
+            raise
 
     def close(self):
         if self.browser:
@@ -84,11 +99,13 @@ class BrowserManager:
                 self.browser.close()
             except Exception as e:
                 print(f"Browser close exception: {e}")
-        if self.playwright:
+            self.browser = None
+        if self.playwright and self._owns_playwright:
             try:
                 self.playwright.stop()
             except Exception as e:
                 print(f"Playwright close exception: {e}")
+            self.playwright = None
 
     def _prepare_launch_options(self, headless: bool) -> Dict[str, Any]:
         options = {
@@ -97,7 +114,7 @@ class BrowserManager:
                 f'--lang=en-US',
             ],
             "headless": headless,
-            "slow_mo": random.randint(100, 500),  # 模拟人类操作间隔
+            "slow_mo": random.randint(*self.profile["slow_mo_ms"]),
         }
 
         if self.proxy:
@@ -121,22 +138,11 @@ class BrowserManager:
             raise ValueError(f"Invalid proxy format: {self.proxy['server']}")
 
 
-def request_by_browser(
-    url: str,
-    handler: callable,
-    timeout: int = DEFAULT_TIMEOUT_MS,
-    proxy: Optional[Dict[str, str]] = None,
-    **kwargs
-):
+def new_context_args() -> Dict[str, Any]:
     """
-    Request by headless browser. Handle request result by callable.
-    :param url: The request url.
-    :param handler:
-    :param timeout:
-    :param proxy:
-    :return:
+    Browser context settings shared by all Playwright scrapers.
     """
-    context_args = {
+    return {
         "user_agent": random.choice(DEFAULT_USER_AGENTS),
         "viewport": {"width": 1366, "height": 768},
         "locale": "en-US",
@@ -148,12 +154,40 @@ def request_by_browser(
         }
     }
 
-    with BrowserManager(headless=True, proxy=proxy) as browser:
+
+def request_by_browser(
+    url: str,
+    handler: callable,
+    timeout: Optional[int] = DEFAULT_TIMEOUT_MS,
+    proxy: Optional[Dict[str, str]] = None,
+    profile: Optional[str | ScrapeProfile] = None,
+    **kwargs
+):
+    """
+    Request by headless browser. Handle request result by callable.
+    :param url: The request url.
+    :param handler:
+    :param timeout: None for the timeout of the profile.
+    :param proxy:
+    :param profile: Scrape profile name, see ScrapeProfile. Default "throughput".
+    :return: The handler result. Dict results get the ResourceBlocker report merged in.
+    """
+    profile = get_profile(profile)
+    if timeout is None:
+        timeout = profile["timeout_ms"]
+    context_args = new_context_args()
+
+    with BrowserManager(headless=True, proxy=proxy, profile=profile) as browser:
         with browser.new_context(**context_args) as context:
             with context.new_page() as page:
+                blocker = ResourceBlocker.from_profile(profile)
+                blocker.attach(page)
                 try:
-                    response = page.goto(url, timeout=timeout, wait_until="domcontentloaded")
-                    return handler(page, response)
+                    response = page.goto(url, timeout=timeout, wait_until=profile["wait_until"])
+                    result = handler(page, response)
+                    if isinstance(result, dict):
+                        result.update(blocker.report())
+                    return result
                 except Exception as e:
                     print(f'request_by_browser gets exception: {str(e)}')
                     # print(traceback.format_exc())
@@ -164,6 +198,7 @@ def fetch_content(
     url: str,
     timeout_ms: Optional[int] = DEFAULT_TIMEOUT_MS,
     proxy: Optional[ProxyConfig] = None,
+    profile: Optional[str] = None,
     **kwargs
 ) -> ScraperResult:
     """
@@ -171,6 +206,7 @@ def fetch_content(
     :param url: The same as base.
     :param timeout_ms: The same as base.
     :param proxy: Format: The same as base.
+    :param profile: Scrape profile name, see ScrapeProfile.
     :return: The same as base.
     """
     try:
@@ -182,7 +218,7 @@ def fetch_content(
             raw_content = response.text()
             return {'content': raw_content, "errors": ''}
 
-        result = request_by_browser(url, handler, timeout_ms, proxy)
+        result = request_by_browser(url, handler, timeout_ms, proxy, profile)
         return result
     except Exception as e:
         traceback.print_exc()
@@ -9,40 +9,60 @@ import traceback
 from typing import Optional
 from src.scraper.ScraperBase import ScraperResult, ProxyConfig
 from src.scraper.PlaywrightRawScraper import request_by_browser
+from src.scraper.ScrapeProfile import ScrapeProfile, get_profile
+
+
+def make_handler(timeout_ms: int, profile: Optional[str | ScrapeProfile] = None) -> callable:
+    """
+    Build the page handler that returns the rendered DOM.
+    Shared with PlaywrightBrowserPool, which calls it on pooled pages.
+    :param timeout_ms: Timeout of the load state wait.
+    :param profile: Scrape profile, decides which load state to wait for.
+    :return: handler(page, response) -> ScraperResult
+    """
+    wait_for = get_profile(profile)["wait_for"]
+
+    def handler(page, response):
+        if not response:
+            return {'content': '', "errors": 'No response'}
+        if response.status >= 400:
+            return {'content': '', "errors": f'HTTP response: {response.status}'}
+
+        try:
+            # page.wait_for_load_state('load', timeout=self.timeout)
+            if wait_for:
+                page.wait_for_load_state(wait_for, timeout=timeout_ms)
+            # page.wait_for_load_state('networkidle', timeout=self.timeout)
+        except Exception as e:
+            print(f'Rendered scraper gets error: {str(e)}')
+        finally:
+            page_content = page.content()
+            return {'content': page_content, "errors": []}
+
+    return handler
 
 
 def fetch_content(
     url: str,
-    timeout_ms: int,
+    timeout_ms: Optional[int],
     proxy: Optional[ProxyConfig] = None,
+    profile: Optional[str] = None,
     **kwargs
 ) -> ScraperResult:
     """
     The same as base.
     :param url: The same as base.
-    :param timeout_ms: The same as base.
+    :param timeout_ms: The same as base. None for the timeout of the profile.
     :param proxy: Format: The same as base.
+    :param profile: Scrape profile name, "throughput" (default) or "stealth", see ScrapeProfile.
     :return: The same as base.
     """
 
     try:
-        def handler(page, response):
-            if not response:
-                return {'content': '', "errors": 'No response'}
-            if response.status >= 400:
-                return {'content': '', "errors": f'HTTP response: {response.status}'}
-
-            try:
-                # page.wait_for_load_state('load', timeout=self.timeout)
-                page.wait_for_load_state('domcontentloaded', timeout=timeout_ms)
-                # page.wait_for_load_state('networkidle', timeout=self.timeout)
-            except Exception as e:
-                print(f'Rendered scraper gets error: {str(e)}')
-            finally:
-                page_content = page.content()
-                return {'content': page_content, "errors": []}
-
-        result = request_by_browser(url, handler, timeout_ms, proxy)
+        profile = get_profile(profile)
+        if timeout_ms is None:
+            timeout_ms = profile["timeout_ms"]
+        result = request_by_browser(url, make_handler(timeout_ms, profile), timeout_ms, proxy, profile)
         return result
     except Exception as e:
         print(traceback.format_exc())
@@ -0,0 +1,220 @@
+"""
+Declaration of modification:
+    * ported from .legacy/scraper/rq_sc.py
+    * one pooled keep-alive session per thread, decompression left to requests/urllib3
+    * check_content_quality: fixed the main content selector, parses HTML by default
+"""
+
+"""
+Plain HTTP scraper. Much cheaper than a headless browser and good enough for server-rendered pages;
+check_content_quality tells whether the result can be used or a browser is needed.
+"""
+import random
+import threading
+from typing import Optional, Tuple, List
+
+import requests
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup
+
+from src.scraper.ScraperBase import ScraperResult, ProxyConfig
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+POOL_MAXSIZE = 16  # keep-alive connections per host and session
+
+
+class RequestsScraper:
+    """Keep-alive HTTP scraper, one pooled session per thread"""
+
+    def __init__(self, proxies: Optional[dict] = None):
+        self.proxies = proxies or {}
+        self._local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_MAXSIZE, pool_maxsize=POOL_MAXSIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.proxies = self.proxies
+            session.headers.update(self._init_headers())
+            self._local.session = session
+        return session
+
+    def _init_headers(self) -> dict:
+        """动态生成浏览器级请求头"""
+        return {
+            'User-Agent': self._random_user_agent(),
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+            # br is only decoded when the brotli package is installed
+            'Accept-Encoding': 'gzip, deflate, br' if brotli else 'gzip, deflate',
+            'Accept-Language': 'en-US,en;q=0.9',
+            'Cache-Control': 'no-cache',
+            'Connection': 'keep-alive',
+            'Pragma': 'no-cache',
+            'Referer': 'https://www.google.com/',
+            'Sec-Fetch-Dest': 'document',
+            'Sec-Fetch-Mode': 'navigate',
+            'Sec-Fetch-Site': 'same-origin',
+            'Upgrade-Insecure-Requests': '1'
+        }
+
+    def _random_user_agent(self):
+        """生成随机现代浏览器UA"""
+        chrome_versions = [
+            (122, 0, 6261), (121, 0, 6167), (120, 0, 6099),
+            (119, 0, 6045), (118, 0, 5993)
+        ]
+        version = random.choice(chrome_versions)
+        return f"Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{version[0]}.0.{version[1]}.{version[2]} Safari/537.36"
+
+    def fetch(self, url: str, timeout: float = 15) -> Tuple[Optional[str], List[str]]:
+        """
+        :return: (html or None, errors)
+        """
+        try:
+            response = self.session.get(url, timeout=timeout, allow_redirects=True)
+            response.raise_for_status()
+
+            content_type = response.headers.get('Content-Type', '')
+            if content_type and 'html' not in content_type and 'xml' not in content_type:
+                return None, [f'Unsupported content type: {content_type}']
+
+            if not response.encoding or response.encoding.lower() == 'iso-8859-1':
+                # requests falls back to latin-1 when the header has no charset
+                response.encoding = response.apparent_encoding
+            return response.text, []
+        except requests.exceptions.RequestException as e:
+            return None, [f'请求失败: {str(e)}']
+        except Exception as e:
+            return None, [f'意外错误: {str(e)}']
+
+
+def check_content_quality(html: str, format: str = 'html.parser', target_keywords=None):
+    """
+    网页内容质量评估系统
+    返回：tuple (is_valid, score, issues)
+    evaluate if a page is static -> is_valid == True
+    """
+    soup = BeautifulSoup(html, format)
+    report = {'score': 100, 'issues': []}
+
+    # 基础结构检测（网页6/7的完整性标准）
+    # if the content is dynamic, body will not be detected
+    if not soup.find('body') or not soup.find('html'):
+        report['issues'].append('Missing essential HTML tags')
+        report['score'] -= 40
+
+    # 主要内容容器检测（网页3/7的架构建议）
+    main_content = soup.select_one('main, div#content, article, div.container')
+    if not main_content:
+        report['issues'].append('Missing main content container')
+        report['score'] -= 30
+
+    # 数据密度分析（网页6的内容丰富性标准）
+    text_length = len(soup.get_text(strip=True))
+    tag_count = len(soup.find_all())
+    if tag_count > 0:
+        text_ratio = text_length / tag_count
+        if text_ratio < 0.3:  # 文本/标签比阈值
+            report['issues'].append('Low text density (possible ads/spam)')
+            report['score'] -= 25
+
+    # 反爬机制检测（网页3/5的异常识别）
+    anti_scraping_phrases = [
+        'enable javascript', 'access denied',
+        'cloudflare security', 'captcha'
+    ]
+    page_text = soup.get_text().lower()
+    if any(phrase in page_text for phrase in anti_scraping_phrases):
+        report['issues'].append('Anti-scraping mechanism detected')
+        report['score'] -= 50
+
+    # 动态内容检测（网页1/3的SPA识别）
+    if soup.find('noscript') or soup.find('div', class_='loading'):
+        report['issues'].append('Dynamic content placeholders found')
+        report['score'] -= 20
+
+    # 关键词覆盖检测（网页6/7的相关性标准）
+    if target_keywords:
+        matched_keywords = sum(
+            1 for kw in target_keywords if kw.lower() in page_text
+        )
+        coverage = matched_keywords / len(target_keywords)
+        if coverage < 0.6:
+            report['issues'].append(f'Low keyword coverage ({coverage:.0%})')
+            report['score'] -= 15 * (1 - coverage)
+
+    # 最终结果判定
+    is_valid = (
+            report['score'] >= 70
+            and 'Anti-scraping mechanism detected' not in report['issues']
+    )
+
+    return is_valid, max(report['score'], 0), report['issues']
+
+
+# proxy -> scraper, so that every caller with the same proxy shares the pooled sessions
+_scrapers = {}
+_scrapers_lock = threading.Lock()
+
+
+def get_scraper(proxy: Optional[ProxyConfig] = None) -> RequestsScraper:
+    key = tuple(sorted((proxy or {}).items()))
+    with _scrapers_lock:
+        if key not in _scrapers:
+            _scrapers[key] = RequestsScraper(proxy)
+        return _scrapers[key]
+
+
+def fetch_content(
+    url: str,
+    timeout_ms: int,
+    proxy: Optional[ProxyConfig] = None,
+    format: str = 'html.parser',
+    **kwargs
+) -> ScraperResult:
+    """
+    The same as base.
+    :param url: The same as base.
+    :param timeout_ms: The same as base.
+    :param proxy: Format: The same as base.
+    :param format: BeautifulSoup parser used by the quality check.
+    :return: The same as base, plus 'valid' and 'score' of check_content_quality when content was fetched.
+    """
+    html_content, errors = get_scraper(proxy).fetch(url, timeout_ms / 1000)
+    if html_content:
+        is_valid, score, issues = check_content_quality(html_content, format)
+        return {
+            'content': html_content,
+            'errors': issues,
+            'valid': is_valid,
+            'score': score,
+        }
+    else:
+        return {
+            'content': '',
+            'errors': errors,
+        }
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+
+def main():
+    # an example static page
+    result = fetch_content("https://www3.pioneer.com/argentina/PETWS/test.html", 30000)
+
+    if result['content']:
+        print(f'Valid : {result["valid"]}')
+        print(f'Score : {result["score"]}')
+    print(f'Errors : {result["errors"]}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Request interception for rendered scraping.
+
+The rendered scraper only needs the DOM, so images, fonts, media and third-party trackers are aborted
+before they are downloaded. The blocker also keeps per-page numbers:
+- blocked_requests / blocked_by_type: what was aborted
+- bytes_loaded:                       sum of Content-Length of the responses that were downloaded
+- bytes_saved_estimate:               blocked requests priced at a typical size for their type
+
+Aborted requests never reach the server, so their real size is unknown; bytes_saved_estimate is an
+order-of-magnitude figure to compare configurations, not an exact measurement.
+"""
+from fnmatch import fnmatch
+from typing import Dict, List, Optional
+
+# Rough typical response size per resource type, used for bytes_saved_estimate
+TYPICAL_BYTES_PER_TYPE = {
+    "image": 50_000,
+    "media": 250_000,
+    "font": 25_000,
+    "script": 25_000,
+    "stylesheet": 10_000,
+}
+TYPICAL_BYTES_OTHER = 5_000
+
+# Third-party analytics / ads / tracking scripts that never carry article content
+TRACKER_URL_PATTERNS = [
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*googlesyndication.com*",
+    "*doubleclick.net*",
+    "*facebook.net*",
+    "*connect.facebook.com*",
+    "*hotjar.com*",
+    "*segment.io*",
+    "*scorecardresearch.com*",
+    "*quantserve.com*",
+    "*adservice.google.*",
+    "*amazon-adsystem.com*",
+    "*taboola.com*",
+    "*outbrain.com*",
+]
+
+
+class ResourceBlocker:
+    """Abort unwanted requests of one page and count what was skipped"""
+
+    def __init__(self, resource_types: Optional[List[str]] = None, url_patterns: Optional[List[str]] = None):
+        self.resource_types = set(resource_types or [])
+        self.url_patterns = list(url_patterns or [])
+
+        self.blocked_by_type: Dict[str, int] = {}
+        self.bytes_loaded = 0
+
+    @classmethod
+    def from_profile(cls, profile: Dict) -> "ResourceBlocker":
+        return cls(profile.get("block_resource_types"), profile.get("block_url_patterns"))
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.resource_types or self.url_patterns)
+
+    def attach(self, page):
+        """
+        Start intercepting the requests of `page`. Call before page.goto.
+        """
+        page.on("response", self._on_response)
+        if self.enabled:
+            page.route("**/*", self._on_route)
+
+    def should_block(self, resource_type: str, url: str) -> bool:
+        if resource_type in self.resource_types:
+            return True
+        return any(fnmatch(url, pattern) for pattern in self.url_patterns)
+
+    def report(self) -> Dict:
+        blocked = sum(self.blocked_by_type.values())
+        saved = sum(
+            TYPICAL_BYTES_PER_TYPE.get(resource_type, TYPICAL_BYTES_OTHER) * count
+            for resource_type, count in self.blocked_by_type.items()
+        )
+        return {
+            "blocked_requests": blocked,
+            "blocked_by_type": dict(self.blocked_by_type),
+            "bytes_loaded": self.bytes_loaded,
+            "bytes_saved_estimate": saved,
+        }
+
+    def _on_route(self, route):
+        request = route.request
+        if self.should_block(request.resource_type, request.url):
+            self.blocked_by_type[request.resource_type] = self.blocked_by_type.get(request.resource_type, 0) + 1
+            route.abort()
+        else:
+            route.continue_()
+
+    def _on_response(self, response):
+        try:
+            self.bytes_loaded += int(response.headers.get("content-length", 0))
+        except (TypeError, ValueError):
+            pass
@@ -0,0 +1,58 @@
+"""
+On-disk cache of scraped HTML.
+
+Every article URL is scraped again on each run although its page rarely changes. ScrapeCache keeps the HTML
+of successful scrapes in `cache_dir`, one file per URL named after the SHA-256 of the URL, so a repeat run
+reads the page from disk instead of going to the network or the browser.
+
+- ttl_seconds: entries older than this are misses and get scraped again
+- max_bytes:   when the cache grows past this, the least recently used entries are removed
+
+Storage, TTL and eviction are those of DiskCache (src/utils/disk_cache.py), which MarkdownConverter uses too.
+
+stats() reports hits, misses, evictions and the cache size.
+"""
+import hashlib
+from typing import Dict, Optional
+
+from src.utils.disk_cache import DiskCache
+
+DEFAULT_CACHE_DIR = 'data/cache/html'
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+
+
+class ScrapeCache:
+    """URL-keyed HTML cache with TTL and LRU eviction"""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+
+        self._cache = DiskCache(cache_dir, '.html', ttl_seconds, max_bytes)
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def get(self, url: str) -> Optional[str]:
+        """
+        :return: The cached HTML of url, None when it is not cached or expired.
+        """
+        return self._cache.get(self.key(url))
+
+    def put(self, url: str, html: str):
+        """
+        Store the HTML of url, then evict least recently used entries while the cache is over max_bytes.
+        """
+        if not html:
+            return
+        self._cache.put(self.key(url), html)
+
+    def stats(self) -> Dict:
+        return self._cache.stats()
+
+    def clear(self):
+        self._cache.clear()
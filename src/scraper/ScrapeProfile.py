@@ -0,0 +1,87 @@
+"""
+Named scraping profiles.
+
+A profile bundles everything that trades speed against looking like a human visitor:
+- slow_mo_ms:           (min, max) random delay Playwright adds to every browser operation
+- wait_until:           load state page.goto waits for
+- wait_for:             extra load state the rendered scraper waits for, None to read the DOM right away
+- block_resource_types: Playwright resource types that are aborted instead of downloaded
+- block_url_patterns:   fnmatch patterns of request URLs that are aborted (see ResourceBlocker)
+- timeout_ms:           default timeout when the caller does not give one
+
+"throughput" is the default: no human-like delays, heavy resources and trackers are aborted. "stealth" is the
+historical behaviour (random slow_mo, full page load) and is opt-in for sites that push back on scrapers.
+More profiles can be added with register_profile, e.g. from the "scrape.profiles" section of config.json.
+"""
+from typing import TypedDict, Tuple, List, Optional
+
+from src.scraper.ResourceBlocker import TRACKER_URL_PATTERNS
+
+
+class ScrapeProfile(TypedDict):
+    name: str
+    slow_mo_ms: Tuple[int, int]
+    wait_until: str
+    wait_for: Optional[str]
+    block_resource_types: List[str]
+    block_url_patterns: List[str]
+    timeout_ms: int
+
+
+SCRAPE_PROFILES = {
+    "stealth": {
+        "name": "stealth",
+        "slow_mo_ms": (100, 500),  # 模拟人类操作间隔
+        "wait_until": "domcontentloaded",
+        "wait_for": "domcontentloaded",
+        "block_resource_types": [],
+        "block_url_patterns": [],
+        "timeout_ms": 20000,
+    },
+    "throughput": {
+        "name": "throughput",
+        "slow_mo_ms": (0, 0),
+        "wait_until": "domcontentloaded",
+        "wait_for": None,
+        "block_resource_types": ["image", "media", "font"],
+        "block_url_patterns": TRACKER_URL_PATTERNS,
+        "timeout_ms": 10000,
+    },
+}
+
+DEFAULT_PROFILE = "throughput"
+
+
+def get_profile(profile: Optional[str | ScrapeProfile] = None) -> ScrapeProfile:
+    """
+    Resolve a profile name (or an already resolved profile) to its settings.
+    :param profile: Profile name, profile dict or None for the default profile.
+    :return: The profile settings.
+    """
+    if profile is None:
+        return SCRAPE_PROFILES[DEFAULT_PROFILE]
+    if isinstance(profile, dict):
+        return profile
+    if profile not in SCRAPE_PROFILES:
+        raise ValueError(f"Unknown scrape profile: {profile} (known: {', '.join(SCRAPE_PROFILES)})")
+    return SCRAPE_PROFILES[profile]
+
+
+def register_profile(name: str, base: str = DEFAULT_PROFILE, **overrides) -> ScrapeProfile:
+    """
+    Add a profile derived from an existing one.
+    :param name: Name of the new profile.
+    :param base: Profile to start from.
+    :param overrides: Profile fields to change, e.g. block_resource_types=["image"].
+    :return: The new profile.
+    """
+    unknown = set(overrides) - set(ScrapeProfile.__annotations__)
+    if unknown:
+        raise ValueError(f"Unknown scrape profile fields: {sorted(unknown)}")
+
+    profile = dict(get_profile(base), **overrides)
+    if "slow_mo_ms" in overrides:
+        profile["slow_mo_ms"] = tuple(profile["slow_mo_ms"])
+    profile["name"] = name
+    SCRAPE_PROFILES[name] = profile
+    return profile
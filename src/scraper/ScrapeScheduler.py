@@ -0,0 +1,237 @@
+"""
+Scheduler for scrape jobs that spreads the load over domains.
+
+Articles arrive sorted by feed, so a plain worker pool sends long runs of requests to the same host while
+the other hosts sit idle. DomainScheduler keeps one queue per domain and hands jobs to the workers
+round-robin across domains, so every worker stays busy as long as any domain may be contacted.
+
+A domain may be contacted when
+- its token bucket has a token:  `rate_per_domain` requests per second, bursts of up to `burst`
+- it has fewer than `per_domain_limit` requests in flight
+- the Crawl-delay of its robots.txt has passed (the bucket is slowed down to one request per delay)
+
+The buckets live in the scheduler, so one scheduler shared by several run() calls (e.g. the HTTP and the
+browser tier of TieredScraper) applies one limit per domain.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+import requests
+
+
+class TokenBucket:
+    """Token bucket, refilled continuously at `rate` tokens per second"""
+
+    def __init__(self, rate: float, burst: int):
+        if rate <= 0:
+            raise ValueError(f"Token bucket rate must be positive: {rate}")
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+
+    def wait_time(self, now: float) -> float:
+        """
+        :return: Seconds until a token is available, 0 if one is available now.
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class DomainScheduler:
+    """Round-robin scheduler with per-domain rate limits"""
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        rate_per_domain: float = 1.0,
+        burst: int = 3,
+        per_domain_limit: int = 2,
+        respect_robots: bool = True,
+        robots_timeout: float = 5.0,
+        user_agent: str = '*'
+    ):
+        """
+        :param max_workers: Jobs running at the same time over all domains.
+        :param rate_per_domain: Requests per second to one domain.
+        :param burst: Requests one domain may get at once after being idle.
+        :param per_domain_limit: Requests in flight to one domain.
+        :param respect_robots: Read Crawl-delay from robots.txt of every domain.
+        :param robots_timeout: Timeout of the robots.txt request in seconds.
+        :param user_agent: User agent the Crawl-delay is looked up for.
+        """
+        if rate_per_domain <= 0:
+            raise ValueError(f"rate_per_domain must be positive: {rate_per_domain}")
+        self.max_workers = max(1, max_workers)
+        self.rate_per_domain = rate_per_domain
+        self.burst = burst
+        self.per_domain_limit = max(1, per_domain_limit)
+        self.respect_robots = respect_robots
+        self.robots_timeout = robots_timeout
+        self.user_agent = user_agent
+
+        self._cond = threading.Condition()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._crawl_delays: Dict[str, Optional[float]] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._requests: Dict[str, int] = {}
+
+    def run(self, urls: List[str], fetch: Callable[[int, str], object],
+            max_workers: Optional[int] = None) -> List:
+        """
+        Run fetch(index, url) for every url.
+        :param fetch: Called from the worker threads. An exception becomes the error result
+            {'content': '', 'errors': [...]} of its url, like a failed scrape.
+        :param max_workers: Override of the scheduler's max_workers for this run.
+        :return: One fetch result per url, in the same order.
+        """
+        results = [None] * len(urls)
+        if not urls:
+            return results
+
+        queues: Dict[str, deque] = {}
+        for i, url in enumerate(urls):
+            queues.setdefault(self.domain(url), deque()).append(i)
+        self._load_crawl_delays(list(queues))
+
+        state = {'queues': queues, 'order': deque(queues), 'pending': len(urls)}
+        workers = min(max_workers or self.max_workers, len(urls))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for _ in range(workers):
+                executor.submit(self._work, state, urls, fetch, results)
+        return results
+
+    def stats(self) -> Dict[str, Dict]:
+        """
+        Per domain: requests started so far and the Crawl-delay found in robots.txt (None when there is none).
+        """
+        with self._cond:
+            return {
+                domain: {'requests': count, 'crawl_delay': self._crawl_delays.get(domain)}
+                for domain, count in self._requests.items()
+            }
+
+    @staticmethod
+    def domain(url: str) -> str:
+        return (urlparse(url).hostname or '').lower()
+
+    def _work(self, state: Dict, urls: List[str], fetch: Callable, results: List):
+        while True:
+            with self._cond:
+                job = self._next_job(state)
+                if job is None:
+                    return
+                i, domain = job
+
+            try:
+                results[i] = fetch(i, urls[i])
+            except Exception as e:
+                print(f'DomainScheduler gets exception on {urls[i]}: {str(e)}')
+                results[i] = {'content': '', 'errors': [str(e)]}
+            finally:
+                with self._cond:
+                    self._in_flight[domain] -= 1
+                    self._cond.notify_all()
+
+    def _next_job(self, state: Dict):
+        """
+        Helper: wait for the next domain that may be contacted and take its first job. Called with the lock held.
+        :return: (url index, domain), None when no jobs are left.
+        """
+        order: deque = state['order']
+        while state['pending']:
+            now = time.monotonic()
+            wait = None
+            for _ in range(len(order)):
+                domain = order[0]
+                order.rotate(-1)
+                queue = state['queues'][domain]
+                if not queue or self._in_flight.get(domain, 0) >= self.per_domain_limit:
+                    continue
+
+                bucket_wait = self._bucket(domain).wait_time(now)
+                if bucket_wait > 0:
+                    wait = bucket_wait if wait is None else min(wait, bucket_wait)
+                    continue
+
+                self._bucket(domain).take()
+                self._in_flight[domain] = self._in_flight.get(domain, 0) + 1
+                self._requests[domain] = self._requests.get(domain, 0) + 1
+                state['pending'] -= 1
+                return queue.popleft(), domain
+
+            # every domain with jobs is busy or out of tokens: sleep until a token is due or a job finishes
+            self._cond.wait(timeout=wait)
+        return None
+
+    def _bucket(self, domain: str) -> TokenBucket:
+        if domain not in self._buckets:
+            delay = self._crawl_delays.get(domain)
+            if delay and delay > 0:
+                rate = min(self.rate_per_domain, 1 / delay)
+                self._buckets[domain] = TokenBucket(rate, 1)
+            else:
+                self._buckets[domain] = TokenBucket(self.rate_per_domain, self.burst)
+        return self._buckets[domain]
+
+    def _load_crawl_delays(self, domains: List[str]):
+        """
+        Helper: read robots.txt of the domains not seen before, concurrently
+        """
+        with self._cond:
+            missing = [domain for domain in domains if domain not in self._crawl_delays]
+        if not self.respect_robots or not missing:
+            with self._cond:
+                for domain in missing:
+                    self._crawl_delays[domain] = None
+            return
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(missing))) as executor:
+            delays = list(executor.map(self._read_crawl_delay, missing))
+        with self._cond:
+            for domain, delay in zip(missing, delays):
+                self._crawl_delays[domain] = delay
+
+    def _read_crawl_delay(self, domain: str) -> Optional[float]:
+        for scheme in ('https', 'http'):
+            try:
+                response = requests.get(f'{scheme}://{domain}/robots.txt', timeout=self.robots_timeout)
+            except requests.exceptions.RequestException:
+                continue
+            if response.status_code != 200:
+                return None
+
+            parser = RobotFileParser()
+            parser.parse(response.text.splitlines())
+            delay = parser.crawl_delay(self.user_agent)
+            return float(delay) if delay else None
+        return None
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+
+def main():
+    urls = [
+        "https://machinelearningmastery.com/further-applications-with-context-vectors/",
+        "https://machinelearningmastery.com/",
+        "https://techblog.wikimedia.org/2025/11/21/unifying-mobile-and-desktop-domains/",
+    ]
+    scheduler = DomainScheduler(max_workers=2)
+    results = scheduler.run(urls, lambda i, url: print(f'{time.monotonic():.2f} {url}') or url)
+    print(results)
+    print(scheduler.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Tiered scraper: plain HTTP first, headless browser only when needed.
+
+Most article pages are server-rendered. Each URL is first fetched with the pooled keep-alive HTTP client
+(RequestsScraper); if check_content_quality accepts the page it is used as is, otherwise the URL is
+escalated to the browser tier (a BrowserPool, or PlaywrightRenderedScraper when no pool is given).
+
+Both tiers run their URLs through a DomainScheduler, which interleaves domains and applies one rate limit
+per domain across the tiers.
+
+With a ScrapeCache, cached pages are returned without any request and successful scrapes are stored.
+
+stats() reports how often each tier produced the result and how long each tier took. Both tiers are timed
+per URL, from the start of the request to its result, so their average seconds per attempt compare.
+Results follow the ScraperBase contract, with an extra 'tier' field ('cache', 'http' or 'browser').
+"""
+import threading
+import time
+from typing import Optional, Dict, List
+
+import src.scraper.RequestsScraper as http_scraper
+import src.scraper.PlaywrightRenderedScraper as rendered_scraper
+from src.scraper.ScraperBase import ScraperResult, ProxyConfig
+from src.scraper.ScrapeScheduler import DomainScheduler
+from src.scraper.ScrapeCache import ScrapeCache
+
+TIERS = ('http', 'browser')
+
+
+class TieredScraper:
+    def __init__(self, browser_pool=None, http_workers: int = 8, http_timeout_ms: int = 10000,
+                 scheduler: Optional[DomainScheduler] = None, cache: Optional[ScrapeCache] = None):
+        """
+        :param browser_pool: BrowserPool for the browser tier, None for one-shot PlaywrightRenderedScraper calls.
+        :param http_workers: Concurrent requests of the HTTP tier in fetch_contents.
+        :param http_timeout_ms: Timeout of the HTTP tier, kept short because the browser is the fallback.
+        :param scheduler: Per-domain rate limits, None for a DomainScheduler with default limits.
+        :param cache: Cache of scraped pages, None to always scrape.
+        """
+        self.browser_pool = browser_pool
+        self.http_workers = max(1, http_workers)
+        self.http_timeout_ms = http_timeout_ms
+        self.scheduler = scheduler or DomainScheduler(max_workers=self.http_workers)
+        self.cache = cache
+
+        self._lock = threading.Lock()
+        self._stats = {tier: {'attempts': 0, 'wins': 0, 'seconds': 0.0} for tier in TIERS}
+
+    def fetch_content(
+        self,
+        url: str,
+        timeout_ms: Optional[int] = None,
+        proxy: Optional[ProxyConfig] = None,
+        profile: Optional[str] = None,
+        **kwargs
+    ) -> ScraperResult:
+        """
+        The same as base.
+        :param timeout_ms: Timeout of the browser tier. None for the timeout of the profile.
+        :param profile: Scrape profile of the browser tier.
+        """
+        return self.fetch_contents([url], timeout_ms, proxy, [profile])[0]
+
+    def fetch_contents(
+        self,
+        urls: List[str],
+        timeout_ms: Optional[int] = None,
+        proxy: Optional[ProxyConfig] = None,
+        profiles: Optional[str | List[Optional[str]]] = None
+    ) -> List[ScraperResult]:
+        """
+        Fetch all urls: the HTTP tier runs concurrently, the pages it rejects then go to the browser tier together.
+        Within each tier the scheduler decides the order, round-robin over domains.
+        :param profiles: Scrape profile of the browser tier, one for all urls or one per url.
+        :return: One ScraperResult per url, in the same order.
+        """
+        if profiles is None or isinstance(profiles, str):
+            profiles = [profiles] * len(urls)
+
+        results = [self._fetch_cache(url) for url in urls]
+        missing = [i for i, result in enumerate(results) if result is None]
+
+        http_results = self.scheduler.run(
+            [urls[i] for i in missing], lambda j, url: self._fetch_http(url, proxy), self.http_workers
+        )
+        escalated = []
+        for i, result in zip(missing, http_results):
+            results[i] = result
+            # None is a page the quality check rejected, a result without content a request that raised
+            if result is None or not result['content']:
+                escalated.append(i)
+
+        if escalated:
+            browser_results = self._fetch_browser(
+                [urls[i] for i in escalated], timeout_ms, proxy, [profiles[i] for i in escalated]
+            )
+            for i, result in zip(escalated, browser_results):
+                results[i] = result
+
+        if self.cache is not None:
+            for i in missing:
+                if results[i]['content']:
+                    self.cache.put(urls[i], results[i]['content'])
+        return results
+
+    def stats(self) -> Dict:
+        """
+        Per tier: attempts, wins (results produced by the tier), total and average seconds per attempt,
+        and the share of all results the tier won.
+        """
+        with self._lock:
+            stats = {tier: dict(values) for tier, values in self._stats.items()}
+
+        total_wins = sum(values['wins'] for values in stats.values())
+        for values in stats.values():
+            values['avg_seconds'] = round(values['seconds'] / values['attempts'], 3) if values['attempts'] else 0.0
+            values['seconds'] = round(values['seconds'], 3)
+            values['win_rate'] = round(values['wins'] / total_wins, 3) if total_wins else 0.0
+        return stats
+
+    def _record(self, tier: str, seconds: float, wins: int = 0):
+        with self._lock:
+            self._stats[tier]['attempts'] += 1
+            self._stats[tier]['wins'] += wins
+            self._stats[tier]['seconds'] += seconds
+
+    def _fetch_cache(self, url: str) -> Optional[ScraperResult]:
+        if self.cache is None:
+            return None
+        html = self.cache.get(url)
+        if html is None:
+            return None
+        return {'content': html, 'errors': [], 'tier': 'cache'}
+
+    def _fetch_http(self, url: str, proxy: Optional[ProxyConfig]) -> Optional[ScraperResult]:
+        """
+        :return: The result when the page passes the quality check, None to escalate.
+        """
+        start = time.monotonic()
+        result = http_scraper.fetch_content(url, self.http_timeout_ms, proxy)
+        accepted = bool(result['content']) and result.get('valid', False)
+        self._record('http', time.monotonic() - start, wins=int(accepted))
+
+        if not accepted:
+            return None
+        result['tier'] = 'http'
+        return result
+
+    def _fetch_browser(self, urls: List[str], timeout_ms: Optional[int], proxy: Optional[ProxyConfig],
+                       profiles: List[Optional[str]]) -> List[ScraperResult]:
+        if self.browser_pool is not None:
+            fetch = lambda i, url: self.browser_pool.fetch_content(url, timeout_ms, profile=profiles[i])
+            workers = self.browser_pool.size
+        else:
+            # one browser per call, so one at a time
+            fetch = lambda i, url: rendered_scraper.fetch_content(url, timeout_ms, proxy, profiles[i])
+            workers = 1
+
+        def fetch_timed(i: int, url: str) -> ScraperResult:
+            # timed per URL like the HTTP tier, so that avg_seconds compares across tiers
+            start = time.monotonic()
+            result = fetch(i, url)
+            result['tier'] = 'browser'
+            self._record('browser', time.monotonic() - start, wins=int(bool(result['content'])))
+            return result
+
+        results = self.scheduler.run(urls, fetch_timed, workers)
+        for result in results:
+            # results of fetches that raised come from the scheduler
+            result.setdefault('tier', 'browser')
+        return results
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+
+def main():
+    scraper = TieredScraper()
+    result = scraper.fetch_content("https://techblog.wikimedia.org/2025/11/21/unifying-mobile-and-desktop-domains/")
+    print(result['tier'], len(result['content']), result['errors'])
+    print(scraper.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Hash-keyed text cache on disk, shared by ScrapeCache (HTML) and MarkdownConverter (Markdown).
+
+One file per entry in `cache_dir`, named `<key><suffix>`, where the key is a hex digest the caller computes.
+- ttl_seconds: entries older than this are misses and are removed
+- max_bytes:   when the cache grows past this, the least recently used entries are removed
+
+The file times carry the metadata: mtime is when the entry was stored, atime when it was last read
+(set explicitly, so it does not depend on how the filesystem is mounted). A new instance picks up the
+entries of the previous ones from the directory.
+
+stats() reports hits, misses, expired entries, stores, evictions and the cache size.
+"""
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+
+class DiskCache:
+    """Text files keyed by hash, with TTL and LRU eviction"""
+
+    def __init__(self, cache_dir: str, suffix: str, ttl_seconds: float, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.suffix = suffix
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'expired': 0, 'stores': 0, 'evictions': 0}
+        # key -> {'size': bytes, 'stored': mtime, 'used': atime}
+        self._entries: Dict[str, Dict] = {}
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_entries()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        :return: The cached text, None when it is not cached or expired.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters['misses'] += 1
+                return None
+            if now - entry['stored'] > self.ttl_seconds:
+                self._counters['misses'] += 1
+                self._counters['expired'] += 1
+                self._remove(key)
+                return None
+
+            try:
+                with open(self._path(key), 'r', encoding='utf-8') as f:
+                    text = f.read()
+                os.utime(self._path(key), (now, entry['stored']))
+            except OSError:
+                self._counters['misses'] += 1
+                self._entries.pop(key, None)
+                return None
+
+            entry['used'] = now
+            self._counters['hits'] += 1
+            return text
+
+    def put(self, key: str, text: str):
+        """
+        Store the text, then evict least recently used entries while the cache is over max_bytes.
+        """
+        data = text.encode('utf-8')
+        now = time.time()
+
+        with self._lock:
+            path = self._path(key)
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+            self._entries[key] = {'size': len(data), 'stored': now, 'used': now}
+            self._counters['stores'] += 1
+            self._evict()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = sum(entry['size'] for entry in self._entries.values())
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        return stats
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + self.suffix)
+
+    def _load_entries(self):
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith(self.suffix):
+                    continue
+                stat = entry.stat()
+                self._entries[entry.name[:-len(self.suffix)]] = {
+                    'size': stat.st_size,
+                    'stored': stat.st_mtime,
+                    'used': stat.st_atime,
+                }
+
+    def _evict(self):
+        """
+        Helper: drop least recently used entries until the cache fits. Called with the lock held.
+        """
+        total = sum(entry['size'] for entry in self._entries.values())
+        if total <= self.max_bytes:
+            return
+        for key in sorted(self._entries, key=lambda k: self._entries[k]['used']):
+            if total <= self.max_bytes:
+                break
+            total -= self._entries[key]['size']
+            self._remove(key)
+            self._counters['evictions'] += 1
+
+    def _remove(self, key: str):
+        self._entries.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,102 @@
+import sys
+import os
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.md_converter import MarkdownConverter, H2MWorker, DEFAULT_H2M_BINARY, html_to_markdown
+from src.content_extractor import ContentExtractor
+
+PAGE = """<html><head><title>T</title><script>track()</script></head><body>
+<h2>Title <em>here</em></h2>
+<p>Some <strong>bold</strong> text with a <a href="https://example.com">link</a>.</p>
+<ul><li>one</li><li>two<ul><li>nested</li></ul></li></ul>
+<pre><code class="language-python">def f():
+    return 1
+</code></pre>
+</body></html>"""
+
+
+def test_html_to_markdown():
+    markdown = html_to_markdown(PAGE)
+
+    assert '## Title *here*' in markdown
+    assert 'Some **bold** text with a [link](https://example.com).' in markdown
+    assert '- one\n- two\n  - nested' in markdown
+    assert '```python\ndef f():\n    return 1\n```' in markdown
+    assert 'track()' not in markdown
+
+
+def test_converter_skips_unchanged_documents(tmp_path):
+    converter = MarkdownConverter(cache_dir=str(tmp_path), workers=2)
+    changed = PAGE.replace('bold', 'strong')
+
+    first = converter.convert_many([PAGE, changed])
+    assert converter.stats()['converted'] == 2
+
+    # a later run: same HTML is read back, only the new document is converted
+    converter = MarkdownConverter(cache_dir=str(tmp_path), workers=2)
+    second = converter.convert_many([PAGE, changed, '<p>new</p>'])
+    assert second[:2] == first
+    assert second[2] == 'new\n'
+    assert converter.stats()['converted'] == 1 and converter.stats()['cached'] == 2
+
+
+
+
+def test_converter_cache_is_per_backend_and_bounded(tmp_path):
+    assert MarkdownConverter.key(PAGE, 'python') != MarkdownConverter.key(PAGE, 'h2m')
+
+    documents = [f'<p>document {i}</p>' for i in range(5)]
+    converter = MarkdownConverter(cache_dir=str(tmp_path), workers=1, max_bytes=40)
+    converter.convert_many(documents)
+    stats = converter.stats()
+    assert stats['evictions'] >= 1 and stats['bytes'] <= 40
+    assert len(list(tmp_path.iterdir())) == stats['entries']
+
+    # the newest document survives eviction, the oldest is converted again
+    converter = MarkdownConverter(cache_dir=str(tmp_path), workers=1)
+    converter.convert_many([documents[-1], documents[0]])
+    assert converter.stats()['cached'] == 1 and converter.stats()['converted'] == 1
+
+    # expired entries are converted again
+    converter = MarkdownConverter(cache_dir=str(tmp_path), workers=1, ttl_seconds=-1)
+    converter.convert_many(documents[-1:])
+    assert converter.stats()['converted'] == 1 and converter.stats()['cached'] == 0
+@pytest.mark.skipif(not os.path.exists(DEFAULT_H2M_BINARY), reason='h2m is not built (cd h2m && go build -o bin/h2m)')
+def test_h2m_stream_worker():
+    with H2MWorker(workers=2) as worker:
+        results = worker.convert_many([PAGE, '<p>second</p>'] * 10)
+        assert len(results) == 20
+        assert all(error is None for _, error in results)
+        assert 'second' in results[1][0] and 'bold' in results[0][0]
+
+        # the process keeps serving after a batch
+        assert 'again' in worker.convert_many(['<p>again</p>'])[0][0]
+
+
+def test_extractor_keeps_article_body():
+    paragraph = '<p>' + 'Query plans, indexes and statistics decide how fast a query runs. ' * 4 + '</p>'
+    page = f"""<html><head><title>Query planning</title></head><body>
+    <header class="site-header"><a href="/">Blog</a></header>
+    <div id="cookie-banner">We use cookies, to measure, to personalise, to advertise. Accept all cookies.</div>
+    <div class="layout">
+      <div class="post-content"><h2>Intro</h2>{paragraph}{paragraph}<pre>EXPLAIN SELECT 1</pre></div>
+      <div class="sidebar"><p>Popular posts, trending topics, archives, tags, and more links.</p></div>
+    </div>
+    <section id="comments"><p>Great post, thanks, I learned a lot, keep writing, please.</p></section>
+    <footer>Copyright 2025, all rights reserved.</footer>
+    </body></html>"""
+
+    extractor = ContentExtractor(workers=1)
+    body = extractor.extract(page)
+
+    assert body.startswith('<h1>Query planning</h1>')
+    assert 'Intro' in body and 'EXPLAIN SELECT 1' in body
+    for boilerplate in ('cookies', 'Popular posts', 'Great post', 'Copyright', 'Blog'):
+        assert boilerplate not in body
+
+    stats = extractor.stats()
+    assert stats['documents'] == 1
+    assert stats['output_chars'] == len(body) < stats['input_chars']
@@ -0,0 +1,161 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.database import DBManager
+from src.content_processor import ContentProcessor
+from src.md_writer import MDWriter
+
+
+def make_db(tmp_path, count=2000):
+    db = DBManager(str(tmp_path / "test.db"))
+    db.save_articles_batch([
+        {
+            'title': f'Article {i}',
+            'link': f'https://example.com/{i}',
+            'source': f'Source {i % 20}',
+            'category': f'category-{i % 5}',
+            'summary': 'summary'
+        }
+        for i in range(count)
+    ])
+    conn = db._connect()
+    with conn:
+        conn.execute("UPDATE articles SET created_at = datetime('2024-01-01', '+' || (id % 90) || ' days')")
+    conn.execute('ANALYZE')
+    return db
+
+
+def query_plans(db, call):
+    """Run `call` and return the EXPLAIN QUERY PLAN details of every SELECT it issued on articles"""
+    conn = db._connect()
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        call()
+    finally:
+        conn.set_trace_callback(None)
+
+    plans = []
+    for sql in statements:
+        if sql.lstrip().upper().startswith('SELECT') and 'articles' in sql:
+            details = [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql)]
+            plans.append((sql, details))
+    assert plans, "no query on articles was issued"
+    return plans
+
+
+def assert_no_full_scan(plans):
+    for sql, details in plans:
+        for detail in details:
+            # "SCAN articles USING (COVERING) INDEX ..." walks an index in order, a bare "SCAN articles" reads the table
+            assert detail.strip() != 'SCAN articles', f"full table scan:\n{sql}\n{details}"
+            assert 'TEMP B-TREE FOR ORDER BY' not in detail, f"sort without index:\n{sql}\n{details}"
+
+
+def assert_index_search(plans):
+    """Filtered queries must seek into an index, not walk the whole of one"""
+    assert_no_full_scan(plans)
+    for sql, details in plans:
+        for detail in details:
+            if 'articles' in detail:
+                assert detail.strip().startswith('SEARCH articles'), f"no index range:\n{sql}\n{details}"
+
+
+def test_date_range_queries_use_index(tmp_path):
+    db = make_db(tmp_path)
+
+    assert_index_search(query_plans(db, lambda: db.get_articles_by_date_range('2024-02-01', '2024-02-10')))
+    assert_index_search(query_plans(db, lambda: list(db.iter_articles('2024-02-01', '2024-02-10', chunk_size=50))))
+
+
+def test_recent_and_category_queries_use_index(tmp_path):
+    db = make_db(tmp_path)
+
+    assert_no_full_scan(query_plans(db, lambda: db.get_recent_articles(limit=10)))
+    assert_index_search(query_plans(db, lambda: db.get_recent_articles(limit=10, category='category-3')))
+    assert_index_search(query_plans(
+        db, lambda: list(db.iter_articles('2024-02-01', '2024-02-10', category='category-3', chunk_size=50))
+    ))
+
+
+def test_date_range_matches_date_function(tmp_path):
+    db = make_db(tmp_path)
+
+    expected = db._connect().execute(
+        "SELECT COUNT(*) FROM articles WHERE DATE(created_at) BETWEEN '2024-02-01' AND '2024-02-10'"
+    ).fetchone()[0]
+
+    assert len(db.get_articles_by_date_range('2024-02-01', '2024-02-10')) == expected
+    assert sum(1 for _ in db.iter_articles('2024-02-01', '2024-02-10', chunk_size=7)) == expected
+    assert sum(db.count_articles_by_category('2024-02-01', '2024-02-10').values()) == expected
+
+    # malformed dates are logged and give no rows, as before the range queries were rewritten
+    for start, end in (('2024-02-01', '2024-02-31'), ('not a date', '2024-02-10')):
+        assert db.get_articles_by_date_range(start, end) == []
+        assert list(db.iter_articles(start, end)) == []
+        assert db.count_articles_by_category(start, end) == {}
+
+
+
+
+def test_chunked_iteration_feeds_processor_and_digest(tmp_path):
+    db = make_db(tmp_path, count=300)
+
+    # many rows share a created_at: the keyset must neither skip nor repeat them across chunk boundaries
+    chunks = list(db.iter_article_chunks('2024-02-01', '2024-02-10', chunk_size=7,
+                                          columns=['id', 'created_at', 'title']))
+    rows = [row for chunk in chunks for row in chunk]
+    assert all(len(chunk) == 7 for chunk in chunks[:-1]) and 0 < len(chunks[-1]) <= 7
+    assert len({row['id'] for row in rows}) == len(rows)
+    assert len(rows) == sum(db.count_articles_by_category('2024-02-01', '2024-02-10').values())
+    keys = [(row['created_at'], row['id']) for row in rows]
+    assert keys == sorted(keys, reverse=True)
+
+    processed = list(ContentProcessor().iter_process_articles(
+        db.iter_articles('2024-02-01', '2024-02-10', chunk_size=7), include_keywords=['Article 1'], max_age_hours=0
+    ))
+    assert processed and all(article['title'].startswith('Article 1') for article in processed)
+
+    path = MDWriter(output_dir=str(tmp_path / 'out'), db=db).write_digest_for_date_range(
+        '2024-02-01', '2024-02-10', filename='digest.md', chunk_size=7
+    )
+    with open(path, encoding='utf-8') as f:
+        digest = f.read()
+    assert f"**Article Count**: {len(rows)}" in digest
+    assert digest.count('**Link**') == len(rows)
+def test_article_stats_follow_inserts_and_deletes(tmp_path):
+    db = make_db(tmp_path, count=500)
+
+    conn = db._connect()
+    with conn:
+        conn.execute("DELETE FROM articles WHERE category = 'category-1' OR id % 7 = 0")
+
+    stats = db.get_article_stats()
+    assert stats['total_articles'] == conn.execute('SELECT COUNT(*) FROM articles').fetchone()[0]
+    assert 'category-1' not in stats['by_category']
+    assert stats['by_source'] == dict(conn.execute('SELECT source, COUNT(*) FROM articles GROUP BY source'))
+
+    with conn:
+        conn.execute("UPDATE article_stats SET count = count + 42")
+    assert db.rebuild_article_stats()
+    assert db.get_article_stats() == stats
+
+
+def test_cleanup_deletes_in_batches_and_frees_pages(tmp_path):
+    db = make_db(tmp_path, count=3000)
+    assert db.get_auto_vacuum_mode() == 'incremental'
+
+    conn = db._connect()
+    with conn:
+        conn.execute("UPDATE articles SET created_at = datetime('now', '-60 days') WHERE id <= 2000")
+        conn.execute("UPDATE articles SET created_at = datetime('now') WHERE id > 2000")
+
+    assert db.cleanup_old_articles(days_old=30, batch_size=300, pause=0) == 2000
+
+    report = db.last_cleanup_report
+    assert report['deleted'] == 2000
+    assert report['batches'] == 7
+    assert report['pages_freed'] > 0
+    assert db.get_article_stats()['total_articles'] == 1000
@@ -0,0 +1,502 @@
+import sys
+import os
+import hashlib
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import src.prompt
+from src.database import DBManager
+from src.llm_scorer import LLMScorer, RATE_KEYS, split_into_chunks, estimate_tokens, extract_json, validate_result
+
+
+def make_answer(title='Database internals', text='database part', rate=2, **fields):
+    answer = {
+        "UUID": None,
+        "EVENT_TITLE": title,
+        "EVENT_BRIEF": f"{title} brief",
+        "EVENT_TEXT": text,
+        "RATE": {key: rate for key in RATE_KEYS},
+    }
+    answer.update(fields)
+    return answer
+
+
+class FakeCompletions:
+    """Answers like the model: a ```json block, rating chunks that mention 'database' higher"""
+
+    def __init__(self, broken_first=False):
+        self.prompts = []
+        self.systems = []
+        self.lock = threading.Lock()
+        self.broken_first = broken_first
+
+    def create(self, model, messages, **kwargs):
+        prompt = messages[-1]['content']
+        with self.lock:
+            self.prompts.append(prompt)
+            # the provider caches a prefix it has seen before
+            cached = 80 if messages[0] in self.systems else 0
+            self.systems.append(messages[0])
+        if 'Document ID' in prompt:
+            # batch request: one answer per document, none for documents that say 'skip me'
+            answer = {}
+            for part in prompt.split('Document ID: ')[1:]:
+                doc_id, content = part.split('\n', 1)
+                if 'skip me' not in content:
+                    answer[doc_id] = make_answer(title=f"Batched {content.split(chr(10))[1]}")
+        elif 'Document Content' in prompt:
+            part = prompt.split('Document Content')[1]
+            strong = 'database' in part
+            answer = make_answer(
+                title="Database internals" if strong else "Other part",
+                text="database part" if strong else "other part",
+                PEOPLE=["Alice"] if strong else ["Alice", "Bob"],
+            )
+            answer["RATE"].update({"性能优化": 8 if strong else 3, "内容准确率": 8 if strong else 6})
+            if self.broken_first and len(self.prompts) == 1:
+                del answer["RATE"]
+        else:
+            # repair request: the broken answer comes back fixed
+            answer = make_answer(title="Repaired")
+        content = "```json\n" + json.dumps(answer, ensure_ascii=False) + "\n```"
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=100, completion_tokens=10,
+                                  prompt_tokens_details=SimpleNamespace(cached_tokens=cached))
+        )
+
+
+def make_scorer(max_doc_tokens, cache=None, broken_first=False):
+    completions = FakeCompletions(broken_first)
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return LLMScorer(client=client, max_doc_tokens=max_doc_tokens, cache=cache), completions
+
+
+def test_split_into_chunks_respects_budget():
+    text = '\n\n'.join(f'Paragraph {i}. ' + 'word ' * 150 for i in range(20))
+    chunks = split_into_chunks(text, 500)
+
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 500 for chunk in chunks)
+    assert '\n\n'.join(chunks) == text
+    assert split_into_chunks('short', 500) == ['short']
+
+
+def test_long_document_is_scored_map_reduce(tmp_path):
+    doc = tmp_path / 'doc.md'
+    doc.write_text('database ' * 150 + '\n\n' + 'other ' * 250, encoding='utf-8')
+
+    scorer, completions = make_scorer(max_doc_tokens=400)
+    output = scorer.score(str(doc))
+    result = json.loads(output)
+
+    assert len(completions.prompts) == 2
+    assert result["RATE"]["性能优化"] == 8 and result["RATE"]["内容准确率"] == 7
+    assert result["EVENT_TITLE"] == "Database internals"
+    assert result["EVENT_TEXT"] == "database part\n\nother part"
+    assert result["PEOPLE"] == ["Alice", "Bob"]
+
+    usage = scorer.usage[str(doc)]
+    assert usage['chunks'] == 2 and usage['total_tokens'] == 220
+
+    # the rubric is one stable system prefix, so the second request hits the provider's prompt cache
+    assert completions.systems[0] == completions.systems[1]
+    assert completions.systems[0] == {"role": "system", "content": src.prompt.ANALYSIS_PROMPT.strip()}
+    assert all(src.prompt.ANALYSIS_PROMPT.strip() not in prompt for prompt in completions.prompts)
+    assert usage['cached_prompt_tokens'] == 80
+    assert [call['cached_prompt_tokens'] for call in usage['calls']] in ([0, 80], [80, 0])
+    stats = scorer.prompt_cache_stats()
+    assert stats['calls'] == 2 and stats['prompt_tokens'] == 200 and stats['cached_share'] == 0.4
+
+
+def test_short_document_takes_one_call(tmp_path):
+    doc = tmp_path / 'doc.md'
+    doc.write_text('a short database note', encoding='utf-8')
+
+    scorer, completions = make_scorer(max_doc_tokens=400)
+    scorer.score(str(doc))
+
+    assert len(completions.prompts) == 1
+    assert scorer.usage[str(doc)]['chunks'] == 1
+
+
+def test_concurrency_bounds_chunk_requests(tmp_path):
+    paths = []
+    for i in range(4):
+        doc = tmp_path / f'doc{i}.md'
+        doc.write_text('\n\n'.join(f'database part {k} ' + 'word ' * 150 for k in range(4)), encoding='utf-8')
+        paths.append(str(doc))
+
+    completions = FakeCompletions()
+    state = {'active': 0, 'max_active': 0}
+    create = completions.create
+
+    def slow_create(*args, **kwargs):
+        with completions.lock:
+            state['active'] += 1
+            state['max_active'] = max(state['max_active'], state['active'])
+        try:
+            time.sleep(0.02)
+            return create(*args, **kwargs)
+        finally:
+            with completions.lock:
+                state['active'] -= 1
+
+    completions.create = slow_create
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    scorer = LLMScorer(client=client, max_doc_tokens=200, chunk_workers=4)
+    results = scorer.score_many(paths, concurrency=2)
+
+    # four documents of four chunks each, never more than two requests in flight
+    assert all(results.values())
+    assert len(completions.prompts) == 16
+    assert state['max_active'] == 2
+
+
+def test_short_documents_are_scored_in_batches(tmp_path):
+    paths = []
+    for i, text in enumerate(['first note', 'second note, skip me', 'third note', 'long ' * 400]):
+        doc = tmp_path / f'doc{i}.md'
+        doc.write_text(text, encoding='utf-8')
+        paths.append(str(doc))
+
+    scorer, completions = make_scorer(max_doc_tokens=4000)
+    outputs = scorer.score_many(paths, concurrency=1, batch_tokens=200)
+
+    # one batch of the three short notes, the one missing from its answer on its own, the long document on its own
+    assert len(completions.prompts) == 3
+    assert json.loads(outputs[paths[0]])["EVENT_TITLE"] == "Batched first note"
+    assert json.loads(outputs[paths[2]])["EVENT_TITLE"] == "Batched third note"
+    assert json.loads(outputs[paths[1]])["EVENT_TITLE"] == "Other part"
+    assert scorer.usage[paths[0]]['batched'] and not scorer.usage[paths[1]]['batched']
+    assert scorer.batch_usage[0]['documents'] == 3 and scorer.batch_usage[0]['answered'] == 2
+    assert scorer.failures == {}
+
+
+def test_extract_json_tolerates_wrapping():
+    answer = make_answer()
+    body = json.dumps(answer, ensure_ascii=False)
+
+    assert extract_json("```json\n" + body + "\n```") == answer
+    assert extract_json("Here is the result:\n" + body + "\nHope this helps {:}") == answer
+    assert extract_json(body[:-1] + ",}") == answer
+    assert extract_json("no json here") is None
+    # a fence inside a string value does not end the answer
+    snippet = make_answer(text="Run:\n```bash\nmake test\n```\ndone")
+    assert extract_json("```json\n" + json.dumps(snippet) + "\n```") == snippet
+
+    assert validate_result(dict(answer)) == []
+    assert validate_result({"UUID": "x"}) == []
+    assert validate_result({}) != []
+    bad = make_answer(rate="7")
+    bad["RATE"]["技术创新"] = 11
+    del bad["EVENT_TEXT"]
+    assert validate_result(bad) == ['EVENT_TEXT must be a non-empty string', 'RATE.技术创新 is 11, must be from 0 to 10']
+    assert bad["RATE"]["系统架构"] == 7
+
+
+def test_invalid_answer_is_repaired(tmp_path):
+    doc = tmp_path / 'doc.md'
+    doc.write_text('a database note', encoding='utf-8')
+
+    scorer, completions = make_scorer(max_doc_tokens=400, broken_first=True)
+    result = json.loads(scorer.score(str(doc)))
+
+    assert result["EVENT_TITLE"] == "Repaired"
+    assert len(completions.prompts) == 2
+    # the repair request carries the broken answer, not the document
+    assert 'RATE must be an object' in completions.prompts[1]
+    assert src.prompt.ANALYSIS_PROMPT not in completions.prompts[1]
+    assert scorer.usage[str(doc)]['repairs'] == 1
+
+
+def test_cached_answers_are_reused_until_prompt_changes(tmp_path, monkeypatch):
+    db = DBManager(str(tmp_path / 'test.db'))
+    doc = tmp_path / 'doc.md'
+    doc.write_text('a database note', encoding='utf-8')
+
+    scorer, completions = make_scorer(max_doc_tokens=400, cache=db)
+    first = scorer.score(str(doc))
+    second = scorer.score(str(doc))
+    assert second == first
+    assert len(completions.prompts) == 1
+    assert scorer.usage[str(doc)]['cached'] is True
+    assert scorer.cache_stats() == {'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+
+    # a new prompt version misses, and --stale drops the answers of the old one
+    old_prompt_hash = scorer.prompt_hash
+    monkeypatch.setattr(src.prompt, 'ANALYSIS_PROMPT', src.prompt.ANALYSIS_PROMPT + '\n# v2')
+    scorer, completions = make_scorer(max_doc_tokens=400, cache=db)
+    scorer.score(str(doc))
+    assert len(completions.prompts) == 1
+
+    assert db.invalidate_llm_cache(keep_prompt_hash=scorer.prompt_hash) == 1
+    stats = db.get_llm_cache_stats()
+    assert stats['entries'] == 1 and stats['hits'] == 0
+    assert all(group['prompt_hash'] != old_prompt_hash for group in stats['by_model_prompt'])
+
+
+def test_invalid_cached_answer_is_not_counted_as_hit(tmp_path):
+    db = DBManager(str(tmp_path / 'test.db'))
+    doc = tmp_path / 'doc.md'
+    doc.write_text('a database note', encoding='utf-8')
+
+    scorer, completions = make_scorer(max_doc_tokens=400, cache=db)
+    content_hash = hashlib.sha256('a database note'.encode('utf-8')).hexdigest()
+    db.save_llm_result(content_hash, scorer.prompt_hash, scorer.model, '{"EVENT_TITLE": "no rate"}')
+
+    scorer.score(str(doc))
+    assert len(completions.prompts) == 1
+    assert db.get_llm_cache_stats()['hits'] == 0
+
+    scorer.score(str(doc))
+    assert len(completions.prompts) == 1
+    assert db.get_llm_cache_stats()['hits'] == 1
+    assert scorer.cache_stats()['hits'] == 1
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    """/v1/chat/completions of an OpenAI compatible API, with failure modes chosen by the document text"""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        prompt = body['messages'][-1]['content']
+        server = self.server
+
+        with server.lock:
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            server.calls[prompt[-20:]] = server.calls.get(prompt[-20:], 0) + 1
+            attempt = server.calls[prompt[-20:]]
+        try:
+            if 'FLAKY' in prompt and attempt == 1:
+                return self._reply(429, {'error': {'message': 'rate limited'}}, {'Retry-After': '0'})
+            if 'BROKEN' in prompt and attempt == 1:
+                return self._reply(503, {'error': {'message': 'overloaded'}})
+            time.sleep(2 if 'SLOW' in prompt else 0.2)
+            self._reply(200, {
+                'id': 'chatcmpl-1', 'object': 'chat.completion', 'created': 0, 'model': body['model'],
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': json.dumps(make_answer())}}],
+                'usage': {'prompt_tokens': 50, 'completion_tokens': 5, 'total_tokens': 55},
+            })
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def _reply(self, status, payload, headers=None):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        try:
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+def start_mock_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MockOpenAIHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.active = server.max_active = 0
+    server.calls = {}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_score_many_against_mock_server(tmp_path):
+    server = start_mock_server()
+    texts = ['doc one', 'doc two FLAKY', 'doc three BROKEN', 'doc four', 'doc five', 'doc six', 'doc seven SLOW']
+    paths = []
+    for i, text in enumerate(texts):
+        path = tmp_path / f'{i}.md'
+        path.write_text(text, encoding='utf-8')
+        paths.append(str(path))
+
+    try:
+        scorer = LLMScorer(api_key='test', base_url=f'http://127.0.0.1:{server.server_port}/v1',
+                           backoff_base=0.01, timeout=10)
+        start = time.monotonic()
+        results = scorer.score_many(paths, concurrency=3, deadline_s=1.0)
+        elapsed = time.monotonic() - start
+    finally:
+        server.shutdown()
+
+    # six 0.2s requests three at a time, plus two retries; the slow one is cut off by the deadline
+    assert server.max_active == 3
+    assert elapsed < 1.6
+    assert all(results[path] for path in paths[:-1])
+    assert results[paths[-1]] is None and paths[-1] in scorer.failures
+
+    assert scorer.usage[paths[1]]['retries'] == 1 and scorer.usage[paths[2]]['retries'] == 1
+    assert scorer.usage[paths[0]]['total_tokens'] == 55
+
+
+class MockBatchHandler(MockOpenAIHandler):
+    """/v1/files and /v1/batches of an OpenAI compatible API; a batch is done after three status checks"""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        server = self.server
+        if self.path == '/v1/chat/completions':
+            server.online_calls += 1
+            return self._reply(200, {
+                'id': 'chatcmpl-1', 'object': 'chat.completion', 'created': 0, 'model': 'm',
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': json.dumps(make_answer(title='Online'))}}],
+                'usage': {'prompt_tokens': 50, 'completion_tokens': 5, 'total_tokens': 55},
+            })
+        if self.path == '/v1/files':
+            # the JSONL lines of the multipart upload
+            server.files.append([json.loads(line) for line in body.splitlines() if line.startswith(b'{"custom_id"')])
+            return self._reply(200, {'id': f'file-{len(server.files)}', 'object': 'file', 'bytes': len(body),
+                                     'created_at': 0, 'filename': 'requests.jsonl', 'purpose': 'batch',
+                                     'status': 'processed'})
+        if self.path == '/v1/batches':
+            request = json.loads(body)
+            server.batches.append({'id': f'batch-{len(server.batches) + 1}', 'object': 'batch',
+                                   'endpoint': request['endpoint'], 'input_file_id': request['input_file_id'],
+                                   'completion_window': '24h', 'created_at': 0, 'status': 'validating',
+                                   'checks': 0})
+            return self._reply(200, server.batches[-1])
+        self._reply(404, {'error': {'message': 'not found'}})
+
+    def do_GET(self):
+        server = self.server
+        if self.path.startswith('/v1/batches/'):
+            batch = next(batch for batch in server.batches if batch['id'] == self.path.rsplit('/', 1)[1])
+            batch['checks'] += 1
+            if batch['checks'] >= 3:
+                batch.update(status='completed', output_file_id='file-out')
+            else:
+                batch['status'] = 'in_progress'
+            return self._reply(200, batch)
+        if self.path == '/v1/files/file-out/content':
+            lines = []
+            for request in server.files[-1]:
+                content = request['body']['messages'][-1]['content']
+                if 'skip me' in content:
+                    lines.append({'custom_id': request['custom_id'], 'response': None,
+                                  'error': {'code': 'server_error', 'message': 'failed'}})
+                    continue
+                answer = make_answer(title='Batched', text=content.splitlines()[-1][:20])
+                lines.append({'custom_id': request['custom_id'], 'error': None, 'response': {
+                    'status_code': 200,
+                    'body': {'choices': [{'message': {'role': 'assistant', 'content': json.dumps(answer)}}],
+                             'usage': {'prompt_tokens': 60, 'completion_tokens': 6,
+                                       'prompt_tokens_details': {'cached_tokens': 40}}},
+                }})
+            data = '\n'.join(json.dumps(line) for line in lines).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        self._reply(404, {'error': {'message': 'not found'}})
+
+
+def test_offline_batch_resumes_after_interruption(tmp_path):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MockBatchHandler)
+    server.daemon_threads = True
+    server.files, server.batches, server.online_calls = [], [], 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    paths = []
+    for i, text in enumerate(['first note', 'second note, skip me', 'database ' * 150 + '\n\n' + 'other ' * 250]):
+        path = tmp_path / f'{i}.md'
+        path.write_text(text, encoding='utf-8')
+        paths.append(str(path))
+    json_dir, job_dir = str(tmp_path / 'json'), str(tmp_path / 'batch')
+    db = DBManager(str(tmp_path / 'test.db'))
+
+    def make_offline_scorer(model):
+        return LLMScorer(api_key='test', base_url=f'http://127.0.0.1:{server.server_port}/v1', max_doc_tokens=400,
+                         model=model, cache=db)
+
+    try:
+        # the first run gives up waiting: the job stays on disk
+        results = make_offline_scorer('model-a').score_offline(paths, json_dir, job_dir, poll_interval=0.01,
+                                                               max_wait_s=0)
+        assert results == {path: None for path in paths}
+        assert os.path.exists(os.path.join(job_dir, 'state.json'))
+
+        # the markdown inputs are cleaned up meanwhile, and the model is changed
+        for path in paths:
+            os.remove(path)
+
+        # the next run collects the same batch instead of submitting again
+        scorer = make_offline_scorer('model-b')
+        results = scorer.score_offline(paths, json_dir, job_dir, poll_interval=0.01, fallback_deadline_s=10)
+    finally:
+        server.shutdown()
+
+    assert len(server.files) == 1 and len(server.batches) == 1
+    assert len(server.files[0]) == 4  # the long document in two parts
+    assert json.loads(results[paths[0]])["EVENT_TITLE"] == "Batched"
+    assert json.loads(results[paths[2]])["EVENT_TEXT"].count('\n\n') == 1
+    # the request that failed in the batch is scored online
+    assert json.loads(results[paths[1]])["EVENT_TITLE"] == "Online" and server.online_calls == 1
+    assert sorted(os.listdir(json_dir)) == ['0.json', '1.json', '2.json']
+    assert not os.path.exists(os.path.join(job_dir, 'state.json'))
+    assert not os.path.exists(os.path.join(job_dir, 'documents'))
+    assert paths[1] not in scorer.failures
+    # batch answers are cached for the model they were made with, the online fallback for the current one
+    groups = {group['model']: group['entries'] for group in db.get_llm_cache_stats()['by_model_prompt']}
+    assert groups == {'model-a': 2, 'model-b': 1}
+    assert scorer.usage[paths[2]]['offline'] and scorer.usage[paths[2]]['cached_prompt_tokens'] == 80
+
+
+class JsonModeHandler(MockOpenAIHandler):
+    """Rejects response_format when the server says so, and documents that are too long"""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.requests.append(body)
+        if 'TOO LONG' in body['messages'][-1]['content']:
+            return self._reply(400, {'error': {'message': "This model's maximum context length is 65536 tokens"}})
+        if self.server.reject_json and 'response_format' in body:
+            return self._reply(400, {'error': {'message': "response_format json_object is not supported"}})
+        self._reply(200, {
+            'id': 'chatcmpl-1', 'object': 'chat.completion', 'created': 0, 'model': body['model'],
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': json.dumps(make_answer())}}],
+            'usage': {'prompt_tokens': 50, 'completion_tokens': 5, 'total_tokens': 55},
+        })
+
+
+def test_json_mode_falls_back_only_when_rejected(tmp_path):
+    paths = []
+    for i, text in enumerate(['TOO LONG doc', 'doc one', 'doc two']):
+        path = tmp_path / f'{i}.md'
+        path.write_text(text, encoding='utf-8')
+        paths.append(str(path))
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), JsonModeHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        for reject_json in (False, True):
+            server.reject_json, server.requests = reject_json, []
+            scorer = LLMScorer(api_key='test', base_url=f'http://127.0.0.1:{server.server_port}/v1')
+            results = scorer.score_many(paths, concurrency=1)
+
+            assert results[paths[0]] is None and 'BadRequestError' in scorer.failures[paths[0]]
+            assert results[paths[1]] and results[paths[2]]
+            # a context length error keeps JSON mode, a rejected response_format turns it off
+            assert scorer.json_mode is not reject_json
+            assert ('response_format' in server.requests[-1]) is not reject_json
+    finally:
+        server.shutdown()
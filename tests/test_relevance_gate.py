@@ -0,0 +1,62 @@
+import sys
+import os
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.database import DBManager
+from src.relevance_gate import RelevanceGate, evaluate
+
+TECH = ['database', 'compiler', 'kernel', 'rust', 'python', 'latency', 'gpu', 'cache', '数据库', '性能优化']
+OTHER = ['celebrity', 'football', 'recipe', 'fashion', 'travel', 'election', 'movie', 'weather', '明星', '旅游']
+
+
+def make_articles(count, seed=1):
+    rng = random.Random(seed)
+    articles = []
+    for i in range(count):
+        relevant = i % 3 == 0
+        words = rng.sample(TECH if relevant else OTHER, 3) + rng.sample(TECH + OTHER, 1)
+        articles.append({
+            'title': f'{words[0]} {words[1]} news {i}',
+            'link': f'https://example.com/{i}',
+            'source': 'Example',
+            'category': 'tech',
+            'summary': f'<p>About {words[2]} and {words[3]}</p>',
+            'score': 70 if relevant else 20,
+        })
+    return articles
+
+
+def test_gate_learns_from_past_scores_and_reports_precision(tmp_path):
+    db = DBManager(str(tmp_path / "test.db"))
+    articles = make_articles(300)
+    db.save_articles_batch(articles)
+    hashes = [db.calculate_article_hash(article) for article in articles]
+    db.save_article_scores([(h, article['score']) for h, article in zip(hashes, articles)])
+
+    gate = RelevanceGate.train(db.get_article_scores(), min_recall=0.95)
+    assert gate.metrics['recall'] >= 0.9
+    assert gate.metrics['pass_rate'] < 0.6
+
+    gate.save(str(tmp_path / "gate.json"))
+    gate = RelevanceGate.load(str(tmp_path / "gate.json"))
+    new_articles = make_articles(60, seed=2)
+    decisions = gate.decide(new_articles, audit_rate=0.5, rng=random.Random(0))
+    assert sum(d['passed'] for d in decisions) < 40
+    kept = [d['passed'] for a, d in zip(new_articles, decisions) if a['score'] > 50]
+    assert sum(kept) / len(kept) >= 0.9
+
+    # what a run stores: the decisions, then the scores of every article that went through
+    rows = [
+        {'gate_probability': d['probability'], 'gate_passed': d['passed'], 'audited': d['audited'],
+         'score': a['score'] if d['passed'] or d['audited'] else None}
+        for a, d in zip(new_articles, decisions)
+    ]
+    report = evaluate(rows)
+    assert report['precision'] > 0.8
+    assert report['audit_miss_rate'] < 0.2
+    assert report['estimated_recall'] > 0.8
+    assert report['llm_calls_saved'] == report['rejected'] - sum(d['audited'] for d in decisions)
+
+    assert RelevanceGate.load(str(tmp_path / "missing.json")).decide(new_articles)[0]['passed']
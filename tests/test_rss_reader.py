@@ -0,0 +1,203 @@
+import sys
+import os
+import gzip
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.database import DBManager
+from src.rss_reader import RSSReader
+
+FEED = """<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0"><channel><title>{name}</title><link>https://example.com/</link><description>d</description>
+<item><title>{name} first</title><link>https://example.com/{name}/1</link><description>one</description></item>
+<item><title>{name} second</title><link>https://example.com/{name}/2</link><description>two</description></item>
+</channel></rss>"""
+
+
+class FeedHandler(BaseHTTPRequestHandler):
+    """RSS feeds with an ETag; /slow-* answer after a delay, /stall sends half a body and hangs, /trickle sends
+    its body one byte at a time"""
+    delay = 0.3
+    lock = threading.Lock()
+    active = {}
+    max_active = {}
+    arrivals = []
+    conditional = []
+
+    def do_GET(self):
+        host = self.headers['Host'].split(':')[0]
+        with self.lock:
+            self.active[host] = self.active.get(host, 0) + 1
+            self.max_active[host] = max(self.max_active.get(host, 0), self.active[host])
+            self.arrivals.append(host)
+        try:
+            self._answer()
+        finally:
+            with self.lock:
+                self.active[host] -= 1
+
+    def _answer(self):
+        name = self.path.strip('/')
+        etag = f'"{name}-v1"'
+        if self.headers.get('If-None-Match') == etag:
+            self.conditional.append(name)
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        body = FEED.format(name=name).encode('utf-8')
+        if name == 'stall':
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body[:100])
+            self.wfile.flush()
+            time.sleep(3)
+            return
+        if name == 'trickle':
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            try:
+                for i in range(len(body)):
+                    self.wfile.write(body[i:i + 1])
+                    self.wfile.flush()
+                    time.sleep(0.05)
+            except OSError:
+                pass
+            return
+        if name.startswith('slow'):
+            time.sleep(self.delay)
+
+        if name == 'gzip':
+            body = gzip.compress(body)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/rss+xml')
+        if name == 'gzip':
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FeedHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_reader(tmp_path, urls):
+    feeds_file = tmp_path / 'feeds.json'
+    feeds_file.write_text(json.dumps({'feeds': [
+        {'name': f'feed-{i}', 'url': url, 'category': 'tech'} for i, url in enumerate(urls)
+    ]}), encoding='utf-8')
+    return RSSReader(str(feeds_file), db=DBManager(str(tmp_path / 'test.db')))
+
+
+def test_feeds_are_fetched_concurrently_under_host_cap(tmp_path):
+    FeedHandler.max_active.clear()
+    FeedHandler.arrivals.clear()
+    server = start_server()
+    port = server.server_port
+    try:
+        # three slow feeds on one host, one on another: the cap of 1 serializes the first host only
+        urls = [f'http://127.0.0.1:{port}/slow-{i}' for i in range(3)] + [f'http://localhost:{port}/slow-x']
+        reader = make_reader(tmp_path, urls)
+        start = time.monotonic()
+        articles = reader.fetch_all_feeds(save_to_db=True, max_workers=2, per_host_limit=1)
+        elapsed = time.monotonic() - start
+    finally:
+        server.shutdown()
+
+    assert len(articles) == 8
+    assert FeedHandler.max_active['127.0.0.1'] == 1
+    # the second worker is not parked on the busy host, it takes the other host's feed right away
+    assert sorted(FeedHandler.arrivals[:2]) == ['127.0.0.1', 'localhost']
+    assert 3 * FeedHandler.delay <= elapsed < 4 * FeedHandler.delay
+    latencies = reader.get_feed_latencies()
+    assert set(latencies) == set(urls)
+    assert all(latency >= FeedHandler.delay for latency in latencies.values())
+    # every feed lands in the database in one batch
+    assert len(reader.db.get_recent_articles(limit=100)) == 8
+
+
+def test_feed_body_is_read_within_its_deadline(tmp_path):
+    server = start_server()
+    base = f'http://127.0.0.1:{server.server_port}'
+    try:
+        reader = make_reader(tmp_path, [])
+        start = time.monotonic()
+        # the server hangs for 3s after half the body; the read timeout ends the fetch long before that
+        stalled = reader.fetch_feed(f'{base}/stall', timeout=2, read_timeout=0.3)
+        stalled_elapsed = time.monotonic() - start
+
+        gzipped = reader.fetch_feed(f'{base}/gzip')
+
+        # a long read timeout is cut down to the time left
+        start = time.monotonic()
+        stalled_late = reader.fetch_feed(f'{base}/stall', timeout=0.5, read_timeout=5)
+        stalled_late_elapsed = time.monotonic() - start
+
+        # every read gets a byte within the read timeout, only the deadline stops the fetch
+        start = time.monotonic()
+        trickled = reader.fetch_feed(f'{base}/trickle', timeout=0.5, read_timeout=5)
+        trickled_elapsed = time.monotonic() - start
+    finally:
+        server.shutdown()
+
+    assert stalled is None and stalled_elapsed < 1
+    assert stalled_late is None and stalled_late_elapsed < 1
+    assert trickled is None and trickled_elapsed < 1
+    assert [entry['title'] for entry in gzipped['entries']] == ['gzip first', 'gzip second']
+
+
+def test_conditional_get_skips_unchanged_feeds(tmp_path):
+    FeedHandler.conditional.clear()
+    server = start_server()
+    url = f'http://127.0.0.1:{server.server_port}/news'
+    try:
+        reader = make_reader(tmp_path, [url])
+        first = reader.fetch_all_feeds(save_to_db=True)
+        assert reader.db.get_feed_validators(url) == {'etag': '"news-v1"', 'last_modified': None}
+
+        second = reader.fetch_all_feeds(save_to_db=True)
+        # without the database the validators are not used
+        third = reader.fetch_all_feeds(save_to_db=False)
+    finally:
+        server.shutdown()
+
+    assert len(first) == 2
+    assert second == [] and FeedHandler.conditional == ['news']
+    assert len(third) == 2
+
+    # the 304 left the stored feed status as it was
+    conn = reader.db._connect()
+    assert conn.execute('SELECT article_count, last_error FROM feed_status WHERE feed_url = ?',
+                        (url,)).fetchone() == (2, None)
+
+
+def test_connection_is_per_thread_with_wal(tmp_path):
+    db = DBManager(str(tmp_path / 'test.db'))
+    conn = db._connect()
+    # DBManagers of the same file share the thread's connection
+    assert DBManager(str(tmp_path / 'test.db'))._connect() is conn
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert conn.execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(db._connect()))
+    thread.start()
+    thread.join()
+    assert other[0] is not conn
+
+    db.close()
+    assert db._connect() is not conn
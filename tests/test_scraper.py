@@ -0,0 +1,367 @@
+import sys
+import os
+import threading
+import time
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.scraper.TieredScraper import TieredScraper
+from src.scraper.ScrapeScheduler import DomainScheduler
+from src.scraper.ScrapeCache import ScrapeCache
+from src.scraper import PlaywrightBrowserPool as browser_pool_module
+from src.scraper import PlaywrightRawScraper as raw_scraper_module
+from src.scraper import RequestsScraper as http_scraper_module
+from src.scraper.PlaywrightBrowserPool import BrowserPool
+from src.scraper.ResourceBlocker import ResourceBlocker, TYPICAL_BYTES_PER_TYPE, TYPICAL_BYTES_OTHER
+from src.scraper.ScrapeProfile import SCRAPE_PROFILES, get_profile, register_profile
+
+ARTICLE_PAGE = """<html><head><title>Article</title></head><body>
+<nav><a href="/">Home</a></nav>
+<main><article><h1>Server rendered</h1>
+<p>This page is rendered on the server and carries the whole article text in its HTML.</p>
+<p>A plain HTTP request is enough to read it, no browser is needed.</p>
+</article></main>
+</body></html>"""
+
+APP_SHELL_PAGE = """<html><head><title>App</title></head><body>
+<noscript>You need to enable JavaScript to run this app.</noscript>
+<div id="root" class="loading"></div>
+</body></html>"""
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = (ARTICLE_PAGE if self.path == '/article' else APP_SHELL_PAGE).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeBrowserPool:
+    size = 2
+
+    def __init__(self):
+        self.urls = []
+
+    def fetch_content(self, url, timeout_ms=None, proxy=None, profile=None):
+        self.urls.append(url)
+        return {'content': f'<html>rendered {url}</html>', 'errors': []}
+
+
+def test_tiered_scraper_escalates_only_rejected_pages():
+    server = HTTPServer(('127.0.0.1', 0), PageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+
+    try:
+        pool = FakeBrowserPool()
+        scraper = TieredScraper(browser_pool=pool)
+        results = scraper.fetch_contents([f'{base}/article', f'{base}/app'])
+    finally:
+        server.shutdown()
+
+    assert results[0]['tier'] == 'http'
+    assert 'Server rendered' in results[0]['content']
+    assert results[1]['tier'] == 'browser'
+    assert pool.urls == [f'{base}/app']
+
+    stats = scraper.stats()
+    assert stats['http']['attempts'] == 2 and stats['http']['wins'] == 1
+    assert stats['browser']['attempts'] == 1 and stats['browser']['wins'] == 1
+    assert stats['http']['win_rate'] == 0.5
+
+
+
+
+class SlowBrowserPool(FakeBrowserPool):
+    def fetch_content(self, url, timeout_ms=None, proxy=None, profile=None):
+        time.sleep(0.1)
+        return super().fetch_content(url, timeout_ms, proxy, profile)
+
+
+def test_tiered_scraper_times_browser_tier_per_url():
+    pool = SlowBrowserPool()
+    scheduler = DomainScheduler(rate_per_domain=100, respect_robots=False)
+    scraper = TieredScraper(browser_pool=pool, scheduler=scheduler)
+
+    # unreachable hosts: both pages go to the browser tier and render in parallel
+    scraper.fetch_contents(['http://127.0.0.1:9/a', 'http://127.0.0.2:9/b'])
+
+    browser = scraper.stats()['browser']
+    assert browser['attempts'] == 2 and browser['wins'] == 2
+    # the sum of the per-URL times, not the wall time of the batch
+    assert browser['seconds'] >= 0.2
+    assert 0.1 <= browser['avg_seconds'] < 0.5
+def test_domain_scheduler_interleaves_and_rate_limits():
+    urls = [f'https://{host}.example/{i}' for host, n in (('a', 3), ('b', 2), ('c', 1)) for i in range(n)]
+    scheduler = DomainScheduler(max_workers=1, rate_per_domain=20, burst=1, respect_robots=False)
+
+    started = []
+    start = time.monotonic()
+    results = scheduler.run(urls, lambda i, url: started.append(url) or i)
+    elapsed = time.monotonic() - start
+
+    assert results == list(range(len(urls)))
+    assert [DomainScheduler.domain(url)[0] for url in started] == ['a', 'b', 'c', 'a', 'b', 'a']
+    # three requests to a.example at 20/s with no burst need at least two refill intervals
+    assert elapsed >= 2 / 20 - 0.01
+    assert scheduler.stats()['a.example'] == {'requests': 3, 'crawl_delay': None}
+
+
+
+
+def test_domain_scheduler_rejects_bad_rate_and_survives_failing_fetches(monkeypatch):
+    for rate in (0, -1):
+        with pytest.raises(ValueError):
+            DomainScheduler(rate_per_domain=rate)
+
+    def fetch(i, url):
+        if url.endswith('/boom'):
+            raise RuntimeError('boom')
+        return {'content': url, 'errors': []}
+
+    scheduler = DomainScheduler(max_workers=1, rate_per_domain=100, respect_robots=False)
+    urls = ['https://a.example/boom', 'https://a.example/1', 'https://b.example/boom', 'https://b.example/2']
+    results = scheduler.run(urls, fetch)
+    assert results[0] == {'content': '', 'errors': ['boom']} and results[2]['errors'] == ['boom']
+    assert results[1]['content'] == urls[1] and results[3]['content'] == urls[3]
+
+    # an HTTP fetch that raises is escalated; a browser fetch that raises is an error result
+    monkeypatch.setattr(http_scraper_module, 'fetch_content', lambda *args: fetch(0, 'https://a.example/boom'))
+    pool = FakeBrowserPool()
+    monkeypatch.setattr(pool, 'fetch_content', lambda url, *args, **kwargs: fetch(0, url))
+    scraper = TieredScraper(browser_pool=pool, scheduler=scheduler)
+    escalated, failed = scraper.fetch_contents(['https://c.example/ok', 'https://c.example/boom'])
+    assert escalated == {'content': 'https://c.example/ok', 'errors': [], 'tier': 'browser'}
+    assert failed == {'content': '', 'errors': ['boom'], 'tier': 'browser'}
+def test_scrape_cache_skips_repeat_scrapes_and_evicts_lru(tmp_path):
+    cache = ScrapeCache(str(tmp_path), ttl_seconds=60, max_bytes=55)
+    pool = FakeBrowserPool()
+    scraper = TieredScraper(browser_pool=pool, cache=cache,
+                            scheduler=DomainScheduler(rate_per_domain=100, respect_robots=False))
+
+    # unreachable host: the HTTP tier fails and the fake browser renders the page
+    first = scraper.fetch_content('http://127.0.0.1:9/a')
+    second = scraper.fetch_content('http://127.0.0.1:9/a')
+    assert first['tier'] == 'browser' and second['tier'] == 'cache'
+    assert second['content'] == first['content']
+    assert pool.urls == ['http://127.0.0.1:9/a']
+
+    # a new instance sees the files of the previous one
+    assert ScrapeCache(str(tmp_path)).get('http://127.0.0.1:9/a') == first['content']
+
+    cache.put('b', 'x' * 10)
+    cache.get('http://127.0.0.1:9/a')
+    cache.put('c', 'y' * 10)
+    assert cache.get('b') is None
+
+    stats = cache.stats()
+    assert stats['hits'] == 2 and stats['evictions'] >= 1
+    assert stats['bytes'] <= 55
+
+
+class FakeResponse:
+    status = 200
+
+
+class FakePage:
+    def __init__(self, browser):
+        self.browser = browser
+
+    def on(self, event, callback):
+        pass
+
+    def route(self, pattern, callback):
+        pass
+
+    def goto(self, url, timeout=None, wait_until=None):
+        if 'broken' in url:
+            raise RuntimeError('navigation failed')
+        self.url = url
+        return FakeResponse()
+
+    def wait_for_load_state(self, state, timeout=None):
+        self.browser.load_timeouts.append(timeout)
+
+    def content(self):
+        return f'<html>{self.url}</html>'
+
+    def close(self):
+        pass
+
+
+class FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+
+    def new_page(self):
+        return FakePage(self.browser)
+
+    def close(self):
+        pass
+
+
+class FakeBrowser:
+    def __init__(self, options):
+        self.slow_mo = options['slow_mo']
+        self.load_timeouts = []
+        self.closed = False
+
+    def new_context(self, **kwargs):
+        return FakeContext(self)
+
+    def close(self):
+        self.closed = True
+
+
+class FakePlaywright:
+    """sync_playwright() stand-in that, like the real one, refuses a second start on the same thread"""
+    lock = threading.Lock()
+    running_threads = set()
+    starts = 0
+    browsers = []
+
+    def start(self):
+        with self.lock:
+            if threading.get_ident() in FakePlaywright.running_threads:
+                raise RuntimeError('It looks like you are using Playwright Sync API inside the asyncio loop.')
+            FakePlaywright.running_threads.add(threading.get_ident())
+            FakePlaywright.starts += 1
+        self.thread = threading.get_ident()
+        self.chromium = self
+        return self
+
+    def launch(self, **options):
+        if options['slow_mo'] == 7:
+            raise RuntimeError('launch failed')
+        browser = FakeBrowser(options)
+        FakePlaywright.browsers.append(browser)
+        return browser
+
+    def stop(self):
+        with self.lock:
+            FakePlaywright.running_threads.discard(self.thread)
+
+
+def test_browser_pool_mixes_profiles_reports_errors_and_shuts_down(monkeypatch):
+    FakePlaywright.starts, FakePlaywright.browsers = 0, []
+    monkeypatch.setattr(browser_pool_module, 'sync_playwright', FakePlaywright)
+    monkeypatch.setattr(raw_scraper_module, 'sync_playwright', FakePlaywright)
+    unlaunchable = dict(get_profile('stealth'), name='unlaunchable', slow_mo_ms=(7, 7))
+
+    with BrowserPool(size=1) as pool:
+        # one worker serves both profiles, each with its own browser on the worker's Playwright
+        results = pool.fetch_contents(['https://a.example/1', 'https://b.example/broken', 'https://a.example/2'],
+                                      profiles=['throughput', 'stealth', 'stealth'])
+        failed = pool.submit('https://c.example/', lambda page, response: None, profile=unlaunchable)
+        assert isinstance(failed.exception(timeout=5), RuntimeError)
+        again = pool.fetch_content('https://a.example/3')
+        workers = list(pool._workers)
+
+    assert results[0]['content'] == '<html>https://a.example/1</html>' and results[0]['errors'] == []
+    assert results[1]['content'] == '' and 'navigation failed' in results[1]['errors'][0]
+    assert results[2]['content'] == '<html>https://a.example/2</html>'
+    assert again['content'] == '<html>https://a.example/3</html>'
+
+    assert FakePlaywright.starts == 1 and not FakePlaywright.running_threads
+    throughput, stealth = FakePlaywright.browsers
+    assert throughput.slow_mo == 0 and 100 <= stealth.slow_mo <= 500
+    # the stealth profile waits for the load state with its own timeout
+    assert throughput.load_timeouts == [] and stealth.load_timeouts == [20000]
+    assert throughput.closed and stealth.closed
+    assert not any(worker.is_alive() for worker in workers)
+
+
+def chromium_installed():
+    with raw_scraper_module.sync_playwright() as playwright:
+        return os.path.exists(playwright.chromium.executable_path)
+
+
+@pytest.mark.skipif(not chromium_installed(), reason='Chromium is not installed (playwright install chromium)')
+def test_browser_pool_renders_with_two_profiles_on_one_worker():
+    server = HTTPServer(('127.0.0.1', 0), PageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}/article'
+    try:
+        with BrowserPool(size=1) as pool:
+            results = pool.fetch_contents([url, url], profiles=['throughput', 'stealth'])
+    finally:
+        server.shutdown()
+
+    for result in results:
+        assert result['errors'] == [] and 'Server rendered' in result['content']
+
+
+def test_scrape_profiles_default_to_throughput_and_accept_overrides():
+    assert get_profile()['name'] == 'throughput'
+    assert get_profile()['slow_mo_ms'] == (0, 0)
+    assert get_profile('stealth')['slow_mo_ms'] == (100, 500)
+    assert get_profile(get_profile('stealth')) is get_profile('stealth')
+    with pytest.raises(ValueError):
+        get_profile('missing')
+
+    try:
+        profile = register_profile('no-fonts', block_resource_types=['font'], slow_mo_ms=[10, 20])
+        assert get_profile('no-fonts') is profile
+        assert profile['name'] == 'no-fonts' and profile['slow_mo_ms'] == (10, 20)
+        assert profile['block_resource_types'] == ['font']
+        # the rest comes from the default profile, which stays untouched
+        assert profile['wait_for'] is None and profile['timeout_ms'] == get_profile()['timeout_ms']
+        assert get_profile()['block_resource_types'] == ['image', 'media', 'font']
+        assert register_profile('slow', base='stealth', timeout_ms=5000)['slow_mo_ms'] == (100, 500)
+        with pytest.raises(ValueError):
+            register_profile('bad', slowmo=1)
+    finally:
+        for name in ('no-fonts', 'slow', 'bad'):
+            SCRAPE_PROFILES.pop(name, None)
+
+
+class FakeRoute:
+    def __init__(self, resource_type, url):
+        self.request = type('Request', (), {'resource_type': resource_type, 'url': url})()
+        self.outcome = None
+
+    def abort(self):
+        self.outcome = 'abort'
+
+    def continue_(self):
+        self.outcome = 'continue'
+
+
+def test_resource_blocker_matches_types_and_patterns_and_reports_estimate():
+    blocker = ResourceBlocker.from_profile(get_profile('throughput'))
+    assert blocker.enabled
+    assert blocker.should_block('image', 'https://example.com/a.png')
+    assert blocker.should_block('script', 'https://www.googletagmanager.com/gtm.js')
+    assert not blocker.should_block('script', 'https://example.com/app.js')
+    assert not blocker.should_block('document', 'https://example.com/post')
+    assert not ResourceBlocker.from_profile(get_profile('stealth')).enabled
+
+    routes = [FakeRoute('image', 'https://example.com/a.png'), FakeRoute('font', 'https://example.com/f.woff'),
+              FakeRoute('script', 'https://connect.facebook.com/sdk.js'), FakeRoute('document', 'https://example.com/')]
+    for route in routes:
+        blocker._on_route(route)
+    assert [route.outcome for route in routes] == ['abort', 'abort', 'abort', 'continue']
+
+    for length in ('1200', None, 'bogus'):
+        headers = {} if length is None else {'content-length': length}
+        blocker._on_response(type('Response', (), {'headers': headers})())
+
+    report = blocker.report()
+    assert report['blocked_requests'] == 3
+    assert report['blocked_by_type'] == {'image': 1, 'font': 1, 'script': 1}
+    assert report['bytes_loaded'] == 1200
+    assert report['bytes_saved_estimate'] == sum(TYPICAL_BYTES_PER_TYPE[t] for t in ('image', 'font', 'script'))
+
+    # types without a typical size are priced at TYPICAL_BYTES_OTHER
+    pattern_only = ResourceBlocker(url_patterns=['*ads.example/*'])
+    pattern_only._on_route(FakeRoute('ping', 'https://ads.example/x'))
+    assert pattern_only.report()['bytes_saved_estimate'] == TYPICAL_BYTES_OTHER